@@ -0,0 +1,72 @@
+"""
+Порівняння інкрементальної аналітики тестів з перерахунком з нуля.
+
+Запуск:
+    python -m benchmarks.analytics --submissions 1000000 --questions 20
+"""
+import argparse
+import json
+import time
+import numpy as np
+from core.stats.analytics import TestItemStats, recompute
+
+
+def generate(submissions: int, questions: int, seed: int):
+    """Синтетичні спроби: правильність залежить від 'вміння' студента та складності питання."""
+    rng = np.random.default_rng(seed)
+    ability = rng.normal(0, 1, submissions)
+    hardness = rng.normal(0, 1, questions)
+    probability = 1 / (1 + np.exp(hardness[None, :] - ability[:, None]))
+    correct = (rng.random((submissions, questions)) < probability).astype(np.int64)
+    scores = correct.sum(axis=1) / questions * 100
+    return scores, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=1_000_000)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--probes', type=int, default=10_000,
+                        help='скільки нових спроб додати інкрементально для виміру затримки')
+    args = parser.parse_args()
+
+    scores, correct = generate(args.submissions, args.questions, args.seed)
+    question_ids = list(range(1, args.questions + 1))
+
+    started = time.perf_counter()
+    full = recompute(1, 100, question_ids, scores, correct)
+    full.item_indices()
+    recompute_seconds = time.perf_counter() - started
+
+    incremental = TestItemStats(1, 100, question_ids)
+    started = time.perf_counter()
+    for score, mask in zip(scores, correct):
+        incremental.add(float(score), mask)
+    ingest_seconds = time.perf_counter() - started
+
+    # Ціна ще однієї спроби: O(питань) проти повного перерахунку історії
+    probe_scores, probe_correct = generate(args.probes, args.questions, args.seed + 1)
+    started = time.perf_counter()
+    for score, mask in zip(probe_scores, probe_correct):
+        incremental.add(float(score), mask)
+    incremental_seconds = (time.perf_counter() - started) / args.probes
+
+    expected = recompute(1, 100, question_ids,
+                         np.concatenate([scores, probe_scores]),
+                         np.concatenate([correct, probe_correct]))
+    assert np.array_equal(expected.histogram, incremental.histogram)
+    assert np.allclose(expected.item_indices()[1], incremental.item_indices()[1], equal_nan=True)
+
+    print(json.dumps({
+        'submissions': args.submissions,
+        'questions': args.questions,
+        'recompute_seconds': round(recompute_seconds, 4),
+        'incremental_ingest_seconds': round(ingest_seconds, 4),
+        'incremental_per_submission_us': round(incremental_seconds * 1e6, 3),
+        'speedup_per_new_submission': round(recompute_seconds / incremental_seconds, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Гаряча резервна копія під навантаженням: вплив на p99 запитів і час знімка.
+
+На згенерованому наборі даних (--scale строк test_results) кожен сценарій
+проганяється тричі: без копії, під час безперервних знімків кроками по
+--pages сторінок з паузою --sleep (як у фоновому завданні db_backup) і під
+час знімків одним кроком (pages=-1, вся БД за раз). Знімки йдуть один за
+одним без перерви - найгірший випадок. Для кожного режиму - p50/p99 і
+помилки запитів сценарію, кількість знімків, їхній час (копія/стиснення),
+кількість звітів прогресу та ступінь стиснення.
+
+Запуск:
+    python -m benchmarks.backup --scale 100000 --requests 2000
+    python -m benchmarks.backup --scale 100000 --pages 64 --sleep 0.005 --scenarios submit
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+SCENARIOS = ('test_view', 'submit', 'lesson_view')
+
+
+async def backup_loop(stop: asyncio.Event, directory: str, pages: int, sleep: float) -> dict:
+    """Знімати копії одну за одною, поки не закінчиться сценарій."""
+    from core.database.backup import create_backup
+    reports = []
+
+    async def report(progress, message):
+        reports.append(progress)
+
+    runs = []
+    while not stop.is_set():
+        runs.append(await create_backup(report, directory, keep=1, pages=pages, sleep=sleep))
+    files = [f for run in runs for f in run['files']]
+    return {
+        'snapshots': len(runs),
+        'seconds_avg': round(sum(run['seconds'] for run in runs) / len(runs), 3) if runs else 0.0,
+        'copy_s_avg': round(sum(f['copy_s'] for f in files) / len(files), 3) if files else 0.0,
+        'compress_s_avg': round(sum(f['compress_s'] for f in files) / len(files), 3) if files else 0.0,
+        'pages': files[-1]['pages'] if files else 0,
+        'compression_ratio': round(files[-1]['bytes'] / files[-1]['compressed_bytes'], 2) if files else 0.0,
+        'progress_reports': len(reports),
+    }
+
+
+def tolerant(request):
+    """Виняток запиту (напр. database is locked) рахується помилкою, а не зупиняє бенчмарк."""
+    class Failed:
+        status_code = 599
+
+    async def wrapped(client, i):
+        try:
+            return await request(client, i)
+        except Exception:
+            return Failed()
+    return wrapped
+
+
+async def benchmark(args, counts: dict, directory: str) -> dict:
+    import httpx
+    import main
+    from benchmarks.run import Scenarios, run_scenario
+
+    scenarios = Scenarios(counts, args.seed)
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        await scenarios.prepare()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for name in args.scenarios:
+                request = tolerant(getattr(scenarios, name))
+                await run_scenario(client, request, args.warmup, args.concurrency)
+                results[name] = {'no_backup': await run_scenario(client, request, args.requests, args.concurrency)}
+                for mode, pages, sleep in (('stepped', args.pages, args.sleep), ('single_step', -1, 0.0)):
+                    stop = asyncio.Event()
+                    backups = asyncio.create_task(backup_loop(stop, directory, pages, sleep))
+                    await asyncio.sleep(0)
+                    latency = await run_scenario(client, request, args.requests, args.concurrency)
+                    stop.set()
+                    results[name][mode] = {**latency, 'backup': await backups}
+                print(f'{name:12s} {json.dumps(results[name])}', flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=100_000, help='кількість строк test_results')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=1000, help='запитів на сценарій і режим')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=256, help='сторінок за крок backup API')
+    parser.add_argument('--sleep', type=float, default=0.05, help='пауза між кроками, секунди')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    path = os.path.join(workdir, 'bench.db')
+    # Змінні середовища мають бути задані до імпорту core.database.db
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{path}'
+    os.environ.pop('RESULTS_DATABASE_PATH', None)
+    os.environ.setdefault('STATS_DASHBOARD', 'off')
+    os.environ['BACKUP_INTERVAL'] = '0'
+    for scope in ('LEARN', 'TEACHER'):
+        os.environ[f'RATE_LIMIT_{scope}'] = 'off'
+
+    from benchmarks.dataset import generate
+    started = time.perf_counter()
+    counts = generate(path, args.scale, args.seed)
+    print(f'dataset: {counts} in {time.perf_counter() - started:.1f}s, {os.path.getsize(path) >> 20} MB', flush=True)
+
+    results = asyncio.run(benchmark(args, counts, os.path.join(workdir, 'backups')))
+    print(json.dumps({'scale': args.scale, 'pages': args.pages, 'sleep': args.sleep, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Вибірка питань спроби: індекс QuestionBank проти ORDER BY RANDOM() по таблиці.
+
+Будує в тимчасовій SQLite банк з --questions питань (три рівні складності) і
+порівнює час однієї вибірки --sample питань: SQL-варіант (сортування всього
+банку на кожну спробу, без стратифікації) та QuestionBank.draw (O(N) від
+розміру спроби). Також виводить час побудови індексу та його розмір.
+
+Запуск:
+    python -m benchmarks.bank --questions 50000 --sample 30
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+from core.exam.bank import QuestionBank
+
+LEVELS = ('beginner', 'intermediate', 'advanced')
+
+
+class _Test:
+    id = 1
+    course_id = 1
+    max_score = 100
+
+    def __init__(self, sample_size: int):
+        self.sample_size = sample_size
+
+
+def per_call(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=50_000)
+    parser.add_argument('--sample', type=int, default=30)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bank.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE questions (id INTEGER PRIMARY KEY, text TEXT, test_id INTEGER, difficulty TEXT)')
+    connection.execute('CREATE INDEX ix_questions_test_id ON questions (test_id)')
+    levels = rng.choice(len(LEVELS), args.questions, p=[0.5, 0.3, 0.2])
+    connection.executemany('INSERT INTO questions VALUES (?, ?, 1, ?)',
+                           ((i, f'Question {i}', LEVELS[lv]) for i, lv in enumerate(levels, start=1)))
+    connection.commit()
+
+    query = 'SELECT id FROM questions WHERE test_id = 1 ORDER BY RANDOM() LIMIT ?'
+    sql_seconds = per_call(lambda: connection.execute(query, (args.sample,)).fetchall(), args.calls)
+
+    started = time.perf_counter()
+    rows = connection.execute('SELECT id, difficulty FROM questions WHERE test_id = 1').fetchall()
+    bank = QuestionBank(_Test(args.sample), rows)
+    build_seconds = time.perf_counter() - started
+    seeds = iter(rng.integers(0, 2**63, args.calls * 2).tolist())
+    bank.draw(next(seeds))
+    draw_seconds = per_call(lambda: bank.draw(next(seeds)), args.calls)
+    connection.close()
+
+    print(json.dumps({
+        'questions': args.questions,
+        'sample': args.sample,
+        'order_by_random_ms': round(sql_seconds * 1e3, 3),
+        'bank_draw_ms': round(draw_seconds * 1e3, 3),
+        'speedup': round(sql_seconds / draw_seconds, 1),
+        'index_build_ms': round(build_seconds * 1e3, 1),
+        'index_bytes': int(bank.ids.nbytes + bank.offsets.nbytes),
+        'strata': bank.summary()['strata'],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
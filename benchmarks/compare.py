@@ -0,0 +1,42 @@
+"""
+Порівняння двох JSON-звітів benchmarks.run (наприклад, до і після коміту).
+
+Запуск:
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+
+METRICS = ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')
+
+
+def delta(old: float, new: float) -> str:
+    if not old:
+        return '    n/a'
+    return f'{(new - old) / old * 100:+7.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline['meta']['commit']} scale={baseline['meta']['scale']}")
+    print(f"candidate {candidate['meta']['commit']} scale={candidate['meta']['scale']}")
+    print(f"{'scenario':22s}" + ''.join(f'{m:>32s}' for m in METRICS))
+    for name, old in baseline['results'].items():
+        new = candidate['results'].get(name)
+        if new is None or 'requests' not in old:
+            continue
+        cells = [f'{old[m]:.1f} -> {new[m]:.1f} {delta(old[m], new[m])}' for m in METRICS]
+        print(f'{name:22s}' + ''.join(f'{c:>32s}' for c in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Генератор синтетичного набору даних зі швидким bulk-load.
+
+Дані пишуться напряму через sqlite3.executemany пакетами в одній транзакції
+(без ORM-функцій db_func), з вимкненим журналом на час завантаження та
+відкладеним створенням індексів. Результат повністю детермінований від seed.
+
+Запуск:
+    python -m benchmarks.dataset --db bench.db --scale 1000000
+    python -m benchmarks.dataset --db learning-big.db --users 300000 --lessons 200000 \\
+        --resources 200000 --courses 20000 --results 10000000 --answers
+"""
+import argparse
+import os
+import sqlite3
+import time
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+from core.database.db import Base, RESULTS_SCHEMA
+import core.database.models  # noqa: F401 - реєстрація моделей у Base.metadata
+from core.utils.security import pwd_context
+
+PASSWORD = 'password'
+LEVELS = ('beginner', 'intermediate', 'advanced')
+QUESTIONS_PER_TEST = 10
+OPTIONS_PER_QUESTION = 4
+TESTS_PER_COURSE = 2
+RESOURCES_PER_COURSE = 5
+CHUNK = 200_000
+
+
+def sizes(scale: int) -> dict[str, int]:
+    """Кількість строк по таблицях для масштабу scale (= кількість test_results)."""
+    return {
+        'users': max(scale // 10, 10),
+        'lessons': max(scale // 10, 10),
+        'resources': max(scale // 100, 10),
+        'courses': max(scale // 1000, 2),
+        'test_results': scale,
+    }
+
+
+def _sql_engine(path: str):
+    # Усі таблиці (і каталог, і результати) в одному файлі
+    return create_engine(f'sqlite:///{path}', execution_options={'schema_translate_map': {RESULTS_SCHEMA: None}})
+
+
+def create_tables(path: str):
+    """Створити таблиці без вторинних індексів - вони будуються після завантаження."""
+    engine = _sql_engine(path)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            conn.execute(CreateTable(table))
+    engine.dispose()
+
+
+def create_indexes(path: str):
+    engine = _sql_engine(path)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index))
+    engine.dispose()
+
+
+def _chunks(total: int, chunk: int = CHUNK):
+    for start in range(0, total, chunk):
+        yield start, min(start + chunk, total)
+
+
+class Loader:
+    """Послідовне завантаження таблиць з окремим детермінованим генератором для кожної."""
+
+    def __init__(self, connection: sqlite3.Connection, counts: dict, seed: int, answers: bool, log):
+        self.connection = connection
+        self.counts = counts
+        self.answers = answers
+        self.log = log
+        streams = np.random.SeedSequence(seed).spawn(4)
+        self.rng_catalogue, self.rng_options, self.rng_results, self.rng_answers = (
+            np.random.default_rng(s) for s in streams
+        )
+
+    def insert(self, table: str, columns: tuple[str, ...], rows):
+        sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+        self.connection.executemany(sql, rows)
+
+    def timed(self, name: str, rows: int, load):
+        started = time.perf_counter()
+        load()
+        seconds = time.perf_counter() - started
+        self.log(f'{name:18s} {rows:>11,d} rows {seconds:7.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)')
+
+    def users(self):
+        hashed = pwd_context.hash(PASSWORD)  # bcrypt один раз на всіх користувачів
+        roles = {1: 'teacher', 2: 'admin'}
+        self.insert('users', ('id', 'username', 'role', 'hashed_password'),
+                    ((i, f'user{i}', roles.get(i, 'student'), hashed) for i in range(1, self.counts['users'] + 1)))
+
+    def lessons(self):
+        self.insert('lessons', ('id', 'title', 'difficulty', 'content'),
+                    ((i, f'Lesson {i}', LEVELS[i % 3], f'Content of lesson {i}')
+                     for i in range(1, self.counts['lessons'] + 1)))
+
+    def resources(self):
+        self.insert('resources', ('id', 'type', 'title', 'difficulty', 'description', 'code', 'question', 'answer'),
+                    ((i, 'CodeExample', f'Resource {i}', LEVELS[i % 3], 'Example', f'print({i})', None, None)
+                     if i % 2 else
+                     (i, 'Quiz', f'Resource {i}', LEVELS[i % 3], None, None, f'{i} + 1?', str(i + 1))
+                     for i in range(1, self.counts['resources'] + 1)))
+
+    def courses(self):
+        total, resources = self.counts['courses'], self.counts['resources']
+        self.insert('courses', ('id', 'title'), ((i, f'Course {i}') for i in range(1, total + 1)))
+        # Кожен курс - RESOURCES_PER_COURSE послідовних ресурсів з випадкового місця
+        starts = self.rng_catalogue.integers(0, resources, total)
+        offsets = np.arange(min(RESOURCES_PER_COURSE, resources))
+        resource_ids = (starts[:, None] + offsets[None, :]) % resources + 1
+        course_ids = np.repeat(np.arange(1, total + 1), len(offsets))
+        self.insert('course_resources', ('course_id', 'resource_id'),
+                    zip(course_ids.tolist(), resource_ids.ravel().tolist()))
+
+    def tests(self):
+        tests = self.counts['tests']
+        self.insert('tests', ('id', 'title', 'description', 'max_score', 'course_id'),
+                    ((t, f'Test {t}', None, 100, (t - 1) // TESTS_PER_COURSE + 1) for t in range(1, tests + 1)))
+        questions = tests * QUESTIONS_PER_TEST
+        self.insert('questions', ('id', 'text', 'test_id'),
+                    ((q, f'Question {q}', (q - 1) // QUESTIONS_PER_TEST + 1) for q in range(1, questions + 1)))
+        # Індекс правильного варіанту для кожного питання (0..OPTIONS_PER_QUESTION-1)
+        self.correct_option = self.rng_options.integers(0, OPTIONS_PER_QUESTION, questions)
+        for start, end in _chunks(questions):
+            q = np.repeat(np.arange(start, end), OPTIONS_PER_QUESTION)
+            k = np.tile(np.arange(OPTIONS_PER_QUESTION), end - start)
+            option_ids = q * OPTIONS_PER_QUESTION + k + 1
+            is_correct = k == self.correct_option[q]
+            self.insert('answer_options', ('id', 'text', 'is_correct', 'question_id'),
+                        zip(option_ids.tolist(), (f'Option {x}' for x in k.tolist()),
+                            is_correct.tolist(), (q + 1).tolist()))
+
+    def results(self):
+        tests, users = self.counts['tests'], self.counts['users']
+        for start, end in _chunks(self.counts['test_results']):
+            n = end - start
+            ids = np.arange(start + 1, end + 1)
+            user_ids = self.rng_results.integers(3, users + 1, n) if users >= 3 else np.ones(n, dtype=np.int64)
+            test_ids = self.rng_results.integers(1, tests + 1, n)
+            # Обрані варіанти визначають і бал, і (за потреби) строки test_answers
+            question_ids = (test_ids[:, None] - 1) * QUESTIONS_PER_TEST + np.arange(QUESTIONS_PER_TEST)[None, :]
+            selected = self.rng_answers.integers(0, OPTIONS_PER_QUESTION, (n, QUESTIONS_PER_TEST))
+            correct = selected == self.correct_option[question_ids]
+            scores = correct.sum(axis=1) * 100 / QUESTIONS_PER_TEST
+            self.insert('test_results', ('id', 'user_id', 'test_id', 'score'),
+                        zip(ids.tolist(), user_ids.tolist(), test_ids.tolist(), scores.tolist()))
+            if self.answers:
+                answer_ids = (ids[:, None] - 1) * QUESTIONS_PER_TEST + np.arange(1, QUESTIONS_PER_TEST + 1)[None, :]
+                option_ids = question_ids * OPTIONS_PER_QUESTION + selected + 1
+                self.insert('test_answers', ('id', 'result_id', 'question_id', 'selected_option_id', 'is_correct'),
+                            zip(answer_ids.ravel().tolist(), np.repeat(ids, QUESTIONS_PER_TEST).tolist(),
+                                (question_ids + 1).ravel().tolist(), option_ids.ravel().tolist(),
+                                correct.ravel().tolist()))
+
+    def progress(self):
+        self.connection.execute(
+            'INSERT INTO student_progress (user_id, course_id, test_id, best_score, attempts, last_result_id) '
+            'SELECT r.user_id, t.course_id, r.test_id, MAX(r.score), COUNT(r.id), MAX(r.id) '
+            'FROM test_results r JOIN tests t ON t.id = r.test_id '
+            'GROUP BY r.user_id, t.course_id, r.test_id'
+        )
+        self.insert('statistics', ('id', 'lessons_created', 'resources_created', 'courses_built',
+                                   'lessons_cloned', 'users'),
+                    [(1, self.counts['lessons'], self.counts['resources'], self.counts['courses'], 0,
+                      self.counts['users'])])
+
+
+def generate(path: str, scale: int = None, seed: int = 42, counts: dict = None,
+             answers: bool = False, log=lambda message: None) -> dict[str, int]:
+    """
+    Створити новий SQLite-файл і заповнити його синтетичними даними.
+
+    Args:
+        path: шлях до файлу БД (не повинен існувати)
+        scale: масштаб для sizes(), якщо counts не задано
+        seed: seed генератора - однаковий seed дає ідентичний файл
+        counts: явна кількість строк {'users', 'lessons', 'resources', 'courses', 'test_results'}
+        answers: також згенерувати test_answers (QUESTIONS_PER_TEST строк на результат)
+        log: функція для виводу прогресу
+
+    Returns:
+        dict[str, int]: Кількість строк по основних таблицях
+    """
+    counts = dict(counts or sizes(scale))
+    counts['tests'] = counts['courses'] * TESTS_PER_COURSE
+    if os.path.exists(path):
+        raise FileExistsError(f'{path} already exists')
+
+    create_tables(path)
+    connection = sqlite3.connect(path, isolation_level=None)
+    # Файл новий, тому на час завантаження журнал та fsync не потрібні
+    connection.execute('PRAGMA journal_mode=OFF')
+    connection.execute('PRAGMA synchronous=OFF')
+    connection.execute('PRAGMA cache_size=-262144')
+    connection.execute('PRAGMA temp_store=MEMORY')
+    connection.execute('PRAGMA locking_mode=EXCLUSIVE')
+
+    loader = Loader(connection, counts, seed, answers, log)
+    connection.execute('BEGIN')
+    loader.timed('users', counts['users'], loader.users)
+    loader.timed('lessons', counts['lessons'], loader.lessons)
+    loader.timed('resources', counts['resources'], loader.resources)
+    loader.timed('courses', counts['courses'], loader.courses)
+    loader.timed('tests', counts['tests'] * (1 + QUESTIONS_PER_TEST * (1 + OPTIONS_PER_QUESTION)), loader.tests)
+    rows = counts['test_results'] * (QUESTIONS_PER_TEST + 1 if answers else 1)
+    loader.timed('test_results', rows, loader.results)
+    connection.execute('COMMIT')
+    connection.close()
+
+    started = time.perf_counter()
+    create_indexes(path)
+    log(f'{"indexes":18s} {time.perf_counter() - started:19.1f}s')
+
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute('BEGIN')
+    loader = Loader(connection, counts, seed, answers, log)
+    loader.timed('student_progress', counts['test_results'], loader.progress)
+    connection.execute('COMMIT')
+    connection.execute('PRAGMA analysis_limit=1000')
+    connection.execute('ANALYZE')
+    connection.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='шлях до нового файлу БД')
+    parser.add_argument('--scale', type=int, default=100_000,
+                        help='кількість test_results; решта таблиць пропорційно (якщо не задані явно)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--lessons', type=int)
+    parser.add_argument('--resources', type=int)
+    parser.add_argument('--courses', type=int)
+    parser.add_argument('--results', type=int, help='кількість test_results')
+    parser.add_argument('--answers', action='store_true', help='згенерувати також test_answers')
+    parser.add_argument('--force', action='store_true', help='перезаписати наявний файл')
+    args = parser.parse_args()
+
+    counts = sizes(args.results or args.scale)
+    for name in ('users', 'lessons', 'resources', 'courses'):
+        if getattr(args, name):
+            counts[name] = getattr(args, name)
+    if args.force:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    started = time.perf_counter()
+    counts = generate(args.db, seed=args.seed, counts=counts, answers=args.answers, log=print)
+    print(f'done: {counts} in {time.perf_counter() - started:.1f}s -> {args.db}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Проходження тесту через HTTP, HTTP з autosave чернеток та WebSocket-сесію.
+
+N студентів одночасно відкривають один тест, відповідають на кожне питання
+і здають його. HTTP: GET тесту + POST /course/test/submit з усіма
+відповідями (кожен запит - окрема перевірка JWT і пошук користувача).
+Autosave: PUT кожної відповіді в чернетку та POST .../draft/submit без тіла.
+WebSocket: одне з'єднання, відповіді окремими повідомленнями, submit.
+Відкриття тесту та відповіді йдуть одночасно для всіх студентів, а здачі
+обмежені --concurrency в усіх режимах (SQLite має одного writer'а).
+Для кожного режиму виводяться кількість HTTP-запитів/повідомлень, SQL-запитів
+(усього та на запис, включно з фоновим flush чернеток) на студента та час. Застосунок працює в тому ж процесі (ASGI напряму).
+
+Запуск:
+    python -m benchmarks.exam --students 1000 --scale 10000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+class AsgiWebSocket:
+    """Мінімальний WebSocket-клієнт поверх ASGI-застосунку (без мережі)."""
+
+    def __init__(self, app, path: str, query: str = ''):
+        self.app = app
+        self.scope = {
+            'type': 'websocket', 'asgi': {'version': '3.0'}, 'scheme': 'ws', 'http_version': '1.1',
+            'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query.encode(),
+            'headers': [], 'client': ('bench', 0), 'server': ('bench', 80), 'subprotocols': [],
+        }
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        self.task = None
+
+    async def _next(self) -> dict:
+        # Якщо обробник впав з винятком, не чекати на повідомлення вічно
+        message = asyncio.ensure_future(self.outbox.get())
+        await asyncio.wait({message, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not message.done():
+            message.cancel()
+            self.task.result()
+            return {'type': 'websocket.close'}
+        return message.result()
+
+    async def connect(self) -> bool:
+        self.task = asyncio.create_task(self.app(self.scope, self.inbox.get, self.outbox.put))
+        await self.inbox.put({'type': 'websocket.connect'})
+        return (await self._next())['type'] == 'websocket.accept'
+
+    async def send(self, data: dict):
+        await self.inbox.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive(self) -> dict:
+        message = await self._next()
+        if message['type'] != 'websocket.send':
+            return {'type': 'closed', 'code': message.get('code')}
+        return json.loads(message['text'])
+
+    async def close(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+class QueryCounter:
+    def __init__(self, *engines):
+        from sqlalchemy import event
+        self.count = 0
+        self.writes = 0
+        for engine in {engine.sync_engine for engine in engines}:
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, *args):
+        self.count += 1
+        if statement.lstrip().split(' ', 1)[0] in ('INSERT', 'UPDATE', 'DELETE'):
+            self.writes += 1
+
+
+def choose(test: dict) -> list[dict]:
+    return [{'question_id': q['id'], 'selected_option_id': q['options'][0]['id']} for q in test['questions']]
+
+
+async def http_student(client, headers: dict, user_id: int, path: str, slots) -> tuple[int, bool]:
+    response = await client.get(path, headers=headers)
+    test = response.json()
+    async with slots:
+        response = await client.post('/learn/course/test/submit', headers=headers, json={
+            'test_id': test['id'], 'user_id': user_id, 'answers': choose(test)
+        })
+    return 2, response.status_code == 200
+
+
+async def autosave_student(client, headers: dict, path: str, slots) -> tuple[int, bool]:
+    test = (await client.get(path, headers=headers)).json()
+    draft = f'/learn/course/test/{test["id"]}/draft'
+    for answer in choose(test):
+        await client.put(draft, headers=headers, json=answer)
+    async with slots:
+        response = await client.post(f'{draft}/submit', headers=headers)
+    return len(test['questions']) + 2, response.status_code == 200
+
+
+async def ws_student(app, token: str, path: str, slots) -> tuple[int, bool]:
+    socket = AsgiWebSocket(app, path + '/ws', f'token={token}')
+    if not await socket.connect():
+        return 0, False
+    test = (await socket.receive())['test']
+    messages = 0
+    for answer in choose(test):
+        await socket.send({'type': 'answer', **answer})
+        await socket.receive()
+        messages += 1
+    async with slots:
+        await socket.send({'type': 'submit'})
+        ok = (await socket.receive())['type'] == 'result'
+    await socket.close()
+    return messages + 1, ok
+
+
+async def benchmark(args) -> dict:
+    import httpx
+    import main
+    from core.database.db import engine, results_engine
+    from core.utils.auth import create_access_token
+
+    counter = QueryCounter(engine, results_engine)
+    path = '/learn/course/1/test/1'
+    # Здача - запис у SQLite з одним writer'ом: обмежуємо кількість одночасних submit
+    slots = asyncio.Semaphore(args.concurrency)
+    report = {}
+    async with main.app.router.lifespan_context(main.app):
+        tokens = {uid: await create_access_token({'sub': f'user{uid}'}) for uid in range(3, args.students + 3)}
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            modes = {
+                'http': lambda uid: http_student(client, {'Authorization': f'Bearer {tokens[uid]}'}, uid, path, slots),
+                'autosave': lambda uid: autosave_student(client, {'Authorization': f'Bearer {tokens[uid]}'}, path, slots),
+                'websocket': lambda uid: ws_student(main.app, tokens[uid], path, slots),
+            }
+            for mode, student in modes.items():
+                counter.count = counter.writes = 0
+                started = time.perf_counter()
+                outcomes = await asyncio.gather(*(student(uid) for uid in tokens))
+                elapsed = time.perf_counter() - started
+                await main.app.state.exam_sessions.flush()  # фоновий запис чернеток теж рахується
+                report[mode] = {
+                    'students': args.students,
+                    'failed': sum(1 for _, ok in outcomes if not ok),
+                    'http_requests': sum(n for n, _ in outcomes) if mode != 'websocket' else len(outcomes),
+                    'ws_messages': sum(n for n, _ in outcomes) if mode == 'websocket' else 0,
+                    'sql_per_student': round(counter.count / args.students, 2),
+                    'sql_writes_per_student': round(counter.writes / args.students, 2),
+                    'seconds': round(elapsed, 3),
+                }
+                print(f'{mode:10s} {json.dumps(report[mode])}', flush=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--scale', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--concurrency', type=int, default=10, help='одночасних submit')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{path}'
+    os.environ.pop('RESULTS_DATABASE_PATH', None)
+    os.environ.setdefault('STATS_DASHBOARD', 'off')
+    for scope in ('LEARN', 'TEACHER'):
+        os.environ[f'RATE_LIMIT_{scope}'] = 'off'
+
+    from benchmarks.dataset import generate
+    counts = generate(path, max(args.scale, (args.students + 2) * 10), args.seed)
+    args.students = min(args.students, counts['users'] - 2)
+    asyncio.run(benchmark(args))
+
+
+if __name__ == '__main__':
+    main()
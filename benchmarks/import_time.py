@@ -0,0 +1,81 @@
+"""
+Перевірка бюджету часу імпорту `main`.
+
+Вимірює `import main` у свіжому інтерпретаторі (кілька разів, береться медіана)
+і завершується з кодом 1, якщо бюджет перевищено. Показує модулі, що імпортуються
+найдовше, щоб було видно, хто саме зламав холодний старт.
+
+Запуск:
+    python -m benchmarks.import_time --budget 2.0
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модулі, які не повинні потрапляти в `import main` (завантажуються ліниво)
+FORBIDDEN = ('dash', 'plotly')
+
+PROBE = '''
+import sys, time
+started = time.perf_counter()
+import main
+print(time.perf_counter() - started)
+print(','.join(m for m in {forbidden!r} if m in sys.modules))
+'''
+
+
+def measure() -> tuple[float, list[str]]:
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(forbidden=FORBIDDEN)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(output[-2]), [m for m in output[-1].split(',') if m]
+
+
+def slowest_imports(limit: int) -> list[tuple[int, str]]:
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:  # модулі, які імпортує безпосередньо main
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET', '2.0')),
+                        help='максимальний час імпорту в секундах')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    seconds = statistics.median(r[0] for r in runs)
+    leaked = sorted({m for _, modules in runs for m in modules})
+
+    print(f'import main: {seconds:.3f}s (budget {args.budget:.3f}s)')
+    for cumulative, name in slowest_imports(5):
+        print(f'  {cumulative / 1e6:7.3f}s  {name}')
+
+    failed = False
+    if leaked:
+        print(f'FAIL: eager import of {", ".join(leaked)}')
+        failed = True
+    if seconds > args.budget:
+        print('FAIL: import time budget exceeded')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Накладні витрати token bucket ліміту на запит.
+
+Міряє acquire() окремо (тепла множина відер, переповнення max_buckets з
+витісненням). Вплив на затримку роутерів показує benchmarks.run з --rate-limit
+у порівнянні з прогоном без нього (python -m benchmarks.compare).
+
+Запуск:
+    python -m benchmarks.ratelimit --users 100000 --calls 1000000
+"""
+import argparse
+import json
+import time
+import numpy as np
+from core.utils.ratelimit import TokenBucketLimiter
+
+
+def measure(limiter: TokenBucketLimiter, keys: list[int]) -> float:
+    acquire = limiter.acquire
+    started = time.perf_counter()
+    for key in keys:
+        acquire(key)
+    return (time.perf_counter() - started) / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--calls', type=int, default=1_000_000)
+    parser.add_argument('--max-buckets', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    keys = np.random.default_rng(args.seed).integers(0, args.users, args.calls).tolist()
+
+    # Усі відра вміщуються в пам'ять - тільки поповнення та списання токена
+    warm = TokenBucketLimiter(rate=1.0, burst=10**9, max_buckets=args.users)
+    measure(warm, keys)
+    warm_seconds = measure(warm, keys)
+
+    # Відер більше, ніж max_buckets - кожен новий ключ витісняє найстаріше відро
+    bounded = TokenBucketLimiter(rate=1.0, burst=10, max_buckets=args.max_buckets)
+    bounded_seconds = measure(bounded, keys)
+
+    print(json.dumps({
+        'users': args.users,
+        'calls': args.calls,
+        'acquire_ns': round(warm_seconds * 1e9, 1),
+        'acquire_with_eviction_ns': round(bounded_seconds * 1e9, 1),
+        'buckets_after': len(bounded.buckets),
+        'max_buckets': args.max_buckets,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
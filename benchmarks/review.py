@@ -0,0 +1,93 @@
+"""
+Інтервальне повторення: пам'ять колод ReviewDeck та затримка next/review.
+
+Завантажує (ReviewDeck.load) --users колод по --cards карток із випадковими
+due (разом users*cards пар студент-Quiz), міряє пам'ять через tracemalloc,
+далі --calls разів бере випадкову колоду, наступну картку (next) та оцінює її (review, просіювання
+купи) - p50/p99. Для порівняння - та сама кількість карток у словниках
+{resource_id: (due, interval, ease, reps, lapses)} з heapq.
+
+Запуск:
+    python -m benchmarks.review --users 10000 --cards 200
+"""
+import argparse
+import heapq
+import json
+import time
+import tracemalloc
+from array import array
+import numpy as np
+from core.exam.review import ReviewDeck, ReviewScheduler, DAY
+
+
+def percentile_us(samples: list[float], p: float) -> float:
+    return round(float(np.percentile(samples, p)) * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--cards', type=int, default=200)
+    parser.add_argument('--calls', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    now = int(time.time())
+    dues = (now + rng.integers(-30 * DAY, 30 * DAY, (args.users, args.cards))).tolist()
+    grades = rng.integers(0, 6, args.calls).tolist()
+    picks = rng.integers(0, args.users, args.calls).tolist()
+
+    scheduler = ReviewScheduler()
+    scheduler.quiz_ids = array('i', range(1, args.cards + 1))
+    tracemalloc.start()
+    started = time.perf_counter()
+    decks = []
+    for user_id, row in enumerate(dues):
+        deck = ReviewDeck(user_id)
+        deck.load([(resource_id, due, 1.0, 2.5, 1, 0) for resource_id, due in enumerate(row, 1)])
+        decks.append(deck)
+    build_seconds = time.perf_counter() - started
+    deck_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    next_latencies, review_latencies = [], []
+    for user, grade in zip(picks, grades):
+        deck = decks[user]
+        started = time.perf_counter()
+        resource_id, _, _ = scheduler.next(deck, now)
+        next_latencies.append(time.perf_counter() - started)
+        if resource_id is None:
+            resource_id = deck.resources[deck.peek()[1]]
+        started = time.perf_counter()
+        scheduler.review(deck, resource_id, grade, now)
+        review_latencies.append(time.perf_counter() - started)
+    del decks
+
+    tracemalloc.start()
+    dicts = []
+    for row in dues:
+        cards = {resource_id: (due, 1.0, 2.5, 1, 0) for resource_id, due in enumerate(row, 1)}
+        heap = [(due, resource_id) for resource_id, due in cards.items()]
+        heapq.heapify(heap)
+        dicts.append((cards, heap))
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    pairs = args.users * args.cards
+    print(json.dumps({
+        'users': args.users,
+        'cards_per_user': args.cards,
+        'pairs': pairs,
+        'build_s': round(build_seconds, 2),
+        'deck_bytes_per_card': round(deck_bytes / pairs, 1),
+        'dict_heapq_bytes_per_card': round(dict_bytes / pairs, 1),
+        'next_p50_us': percentile_us(next_latencies, 50),
+        'next_p99_us': percentile_us(next_latencies, 99),
+        'review_p50_us': percentile_us(review_latencies, 50),
+        'review_p99_us': percentile_us(review_latencies, 99),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
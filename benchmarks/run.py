@@ -0,0 +1,249 @@
+"""
+Бенчмарк роутерів API на детермінованому наборі даних.
+
+Застосунок FastAPI запускається в цьому ж процесі (разом з lifespan), запити
+йдуть через httpx.ASGITransport - без мережі та окремого сервера. Для кожного
+сценарію виводиться пропускна здатність та p50/p95/p99 затримки; повний звіт
+зберігається в JSON для порівняння між комітами (python -m benchmarks.compare).
+
+Запуск:
+    python -m benchmarks.run --scale 10000 --requests 500 --concurrency 10
+    python -m benchmarks.run --scale 1000000 --scenarios test_view submit
+    python -m benchmarks.run --backend threadpool --scenarios lesson_view courses test_view
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Scenarios:
+    """Запити кожного сценарію; i - порядковий номер запиту (для унікальних назв тощо)."""
+
+    def __init__(self, counts: dict, seed: int):
+        import random
+        from core.utils.auth import create_access_token
+        from benchmarks.dataset import PASSWORD, QUESTIONS_PER_TEST, OPTIONS_PER_QUESTION
+
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.password = PASSWORD
+        self.questions_per_test = QUESTIONS_PER_TEST
+        self.options_per_question = OPTIONS_PER_QUESTION
+        self.create_access_token = create_access_token
+        self.student = {}
+        self.teacher = {}
+
+    async def prepare(self):
+        async def bearer(username):
+            token = await self.create_access_token({'sub': username})
+            return {'Authorization': f'Bearer {token}'}
+        self.student = await bearer('user3')
+        self.teacher = await bearer('user1')
+
+    def _test(self):
+        test_id = self.rng.randint(1, self.counts['tests'])
+        course_id = (test_id - 1) // 2 + 1
+        return course_id, test_id
+
+    async def login(self, client, i):
+        user = f'user{self.rng.randint(3, self.counts["users"])}'
+        return await client.post('/auth/login', data={'username': user, 'password': self.password})
+
+    async def lesson_view(self, client, i):
+        lesson_id = self.rng.randint(1, self.counts['lessons'])
+        return await client.get(f'/learn/lesson/id/{lesson_id}', headers=self.student)
+
+    async def courses(self, client, i):
+        return await client.get('/learn/courses/', headers=self.student)
+
+    async def resources_by_level(self, client, i):
+        level = ('beginner', 'intermediate', 'advanced')[i % 3]
+        return await client.get(f'/learn/resource/{level}', headers=self.student)
+
+    async def test_view(self, client, i):
+        course_id, test_id = self._test()
+        return await client.get(f'/learn/course/{course_id}/test/{test_id}', headers=self.student)
+
+    async def exam_open(self, client, i):
+        # Усі студенти одночасно відкривають один і той самий тест
+        return await client.get('/learn/course/1/test/1', headers=self.student)
+
+    async def submit(self, client, i):
+        _, test_id = self._test()
+        first_question = (test_id - 1) * self.questions_per_test + 1
+        answers = []
+        for question_id in range(first_question, first_question + self.questions_per_test):
+            option = (question_id - 1) * self.options_per_question + 1 + self.rng.randrange(self.options_per_question)
+            answers.append({'question_id': question_id, 'selected_option_id': option})
+        return await client.post('/learn/course/test/submit', headers=self.student,
+                                 json={'test_id': test_id, 'user_id': 3, 'answers': answers})
+
+    async def teacher_create(self, client, i):
+        return await client.post('/teacher/lesson/', headers=self.teacher, json={
+            'title': f'Bench lesson {time.time_ns()}-{i}', 'difficulty': 'beginner', 'content': 'Benchmark'
+        })
+
+    async def teacher_clone(self, client, i):
+        source = f'Lesson {self.rng.randint(1, self.counts["lessons"])}'
+        return await client.post(f'/teacher/lesson/title/{source}/clone',
+                                 params={'new_title': f'{source} copy {time.time_ns()}-{i}'},
+                                 headers=self.teacher)
+
+    async def teacher_create_test(self, client, i):
+        course_id = self.rng.randint(1, self.counts['courses'])
+        return await client.post('/teacher/test', headers=self.teacher, json={
+            'title': f'Bench test {i}', 'max_score': 100, 'course_id': course_id,
+            'questions': [
+                {'text': f'Q{q}', 'options': [{'text': f'O{k}', 'is_correct': k == 0} for k in range(4)]}
+                for q in range(self.questions_per_test)
+            ]
+        })
+
+
+SCENARIOS = ('login', 'lesson_view', 'courses', 'resources_by_level', 'test_view', 'exam_open', 'submit',
+             'teacher_create', 'teacher_clone', 'teacher_create_test')
+
+
+async def run_scenario(client, request, total: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await request(client, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def benchmark(args, counts: dict) -> dict:
+    import httpx
+    import main
+    from core.utils.singleflight import flights
+
+    scenarios = Scenarios(counts, args.seed)
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        await scenarios.prepare()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for name in args.scenarios:
+                request = getattr(scenarios, name)
+                total = args.requests if name != 'login' else min(args.requests, args.login_requests)
+                await run_scenario(client, request, min(args.warmup, total), args.concurrency)
+                results[name] = await run_scenario(client, request, total, args.concurrency)
+                print(f'{name:22s} {json.dumps(results[name])}', flush=True)
+        results['startup'] = main.app.state.startup.report()
+        results['coalescing'] = flights.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10_000, help='кількість строк test_results (1k..1M)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=500, help='запитів на сценарій')
+    parser.add_argument('--login-requests', type=int, default=50,
+                        help='ліміт для login (bcrypt навмисно повільний)')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--db', help='готовий файл БД (інакше генерується у тимчасовій теці)')
+    parser.add_argument('--rate-limit', action='store_true',
+                        help='увімкнути ліміти запису з недосяжно великим бюджетом (накладні витрати лімітера)')
+    parser.add_argument('--backend', choices=('aiosqlite', 'threadpool'), default='aiosqlite',
+                        help='backend читання db_func (DB_BACKEND)')
+    parser.add_argument('--output', help='шлях до JSON-звіту (за замовчуванням benchmarks/results/)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    path = args.db or os.path.join(workdir, 'bench.db')
+    # Змінні середовища мають бути задані до імпорту core.database.db
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{path}'
+    os.environ.pop('RESULTS_DATABASE_PATH', None)
+    os.environ.setdefault('STATS_DASHBOARD', 'off')
+    os.environ['DB_BACKEND'] = args.backend
+    # Усі сценарії йдуть від одного користувача, тому реальні ліміти відхиляли б запити
+    for scope in ('LEARN', 'TEACHER'):
+        os.environ[f'RATE_LIMIT_{scope}'] = '1000000/1000000000' if args.rate_limit else 'off'
+
+    from benchmarks.dataset import generate, sizes, TESTS_PER_COURSE
+    if args.db:
+        counts = sizes(args.scale)
+        counts['tests'] = counts['courses'] * TESTS_PER_COURSE
+    else:
+        started = time.perf_counter()
+        counts = generate(path, args.scale, args.seed)
+        print(f'dataset: {counts} in {time.perf_counter() - started:.1f}s', flush=True)
+
+    results = asyncio.run(benchmark(args, counts))
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'scale': args.scale,
+            'seed': args.seed,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'rate_limit': args.rate_limit,
+            'backend': args.backend,
+            'dataset': counts,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'{report["meta"]["timestamp"].replace(":", "")}-{report["meta"]["commit"]}-{args.scale}.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'saved {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Пошук списування: core.exam.similarity.detect на синтетичному тесті.
+
+Генерує --submissions спроб тесту з --questions питань по 4 варіанти
+(складність і привабливість хибних варіантів різні для кожного питання,
+студенти відповідають незалежно) та підкладає --copies пар, де друга спроба
+скопійована з першої з заміною --noise частки відповідей. Виводить час,
+кількість пар-кандидатів після хешування, скільки підкладених пар знайдено та скільки
+позначено зайвих. --brute N додатково звіряє результат з повним перебором
+перших N спроб. --bank N робить тест банком з N питань, з яких кожна спроба
+отримує --questions випадкових (скопійована спроба - ті самі питання, що й
+оригінал). peak_mb - пік пам'яті detect за tracemalloc.
+
+false_flagged - позначені пари, яких не підкладали (випадкові збіги). З --check
+бенчмарк прогоняє --seeds наборів і завершується з кодом 1, якщо на незалежних
+даних позначено більше --max-false пар: регресійна перевірка хибних спрацювань
+(легкі питання та великий розкид здібностей дають мало очікуваних збігів, де
+нормальне наближення завищувало значущість).
+
+Запуск:
+    python -m benchmarks.similarity --submissions 30000 --questions 40
+    python -m benchmarks.similarity --submissions 30000 --questions 40 --bank 5000
+    python -m benchmarks.similarity --submissions 3000 --copies 0 --p-correct 0.6 0.95 --ability 1.5 --seeds 3 --check
+"""
+import sys
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+from core.exam.similarity import answer_vectors, compare, detect
+
+OPTIONS = 4
+
+
+def synthesize(rng, submissions: int, questions: int, copies: int, noise: float, bank: int = 0,
+               p_correct=(0.4, 0.9), ability_sd: float = 1.0):
+    bank = max(bank, questions)
+    p_correct = rng.uniform(*p_correct, bank)
+    distractors = rng.dirichlet(np.ones(OPTIONS - 1) * 0.7, bank)
+    # Питання кожної спроби (номери в банку); без --bank - усі питання тесту
+    drawn = np.argsort(rng.random((submissions, bank)), axis=1)[:, :questions] if bank > questions \
+        else np.tile(np.arange(questions), (submissions, 1))
+    ability = rng.normal(0, ability_sd, submissions)
+    chance = 1 / (1 + np.exp(-(np.log(p_correct / (1 - p_correct))[drawn] + ability[:, None])))
+    right = rng.random((submissions, questions)) < chance
+    cumulative = np.cumsum(distractors, axis=1)[drawn]
+    wrong_choice = 1 + (rng.random((submissions, questions))[..., None] > cumulative).sum(axis=2)
+    wrong_choice = np.minimum(wrong_choice, OPTIONS - 1)
+    choice = np.where(right, 0, wrong_choice)
+    sources = rng.choice(submissions, copies * 2, replace=False)
+    pairs = sources.reshape(-1, 2)
+    drawn[pairs[:, 1]] = drawn[pairs[:, 0]]
+    for src, dst in pairs:
+        changed = rng.random(questions) < noise
+        choice[dst] = np.where(changed, choice[dst], choice[src])
+    option_ids = drawn * OPTIONS + choice + 1
+    result_ids = np.arange(1, submissions + 1)
+    answers = np.stack([
+        np.repeat(result_ids, questions),
+        (drawn + 1).ravel(),
+        option_ids.ravel(),
+        (choice == 0).ravel().astype(np.int64),
+    ], axis=1)
+    return result_ids, result_ids.copy(), answers, {tuple(sorted(p)) for p in pairs.tolist()}
+
+
+def brute(result_ids, user_ids, answers, n, min_shared, max_p):
+    """O(n²) звірка: ті самі критерії, що й detect, але для всіх пар, а не лише кандидатів."""
+    report = detect(result_ids[:n], user_ids[:n], answers[answers[:, 0] <= result_ids[n - 1]], min_shared, max_p)
+    vectors = answer_vectors(result_ids[:n], answers[answers[:, 0] <= result_ids[n - 1]])
+    a, b = np.triu_indices(n, 1)
+    shared, _, p = compare(vectors, a, b)
+    flagged = (shared >= min_shared) & (p <= report['max_p'])
+    expected = set(zip(a[flagged].tolist(), b[flagged].tolist()))
+    found = set(zip(report['a'].tolist(), report['b'].tolist()))
+    return {'brute_pairs': len(expected), 'found_pairs': len(found), 'recall': round(len(found & expected) / max(len(expected), 1), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=30_000)
+    parser.add_argument('--questions', type=int, default=40)
+    parser.add_argument('--copies', type=int, default=50)
+    parser.add_argument('--noise', type=float, default=0.1)
+    parser.add_argument('--min-shared', type=int, default=3)
+    parser.add_argument('--max-p', type=float, default=None, help='за замовчуванням - threshold(submissions)')
+    parser.add_argument('--bank', type=int, default=0, help='питань у банку (0 - звичайний тест)')
+    parser.add_argument('--p-correct', type=float, nargs=2, default=(0.4, 0.9), metavar=('LO', 'HI'))
+    parser.add_argument('--ability', type=float, default=1.0, help='стандартне відхилення здібностей студентів')
+    parser.add_argument('--brute', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--seeds', type=int, default=1, help='кількість наборів (seed, seed + 1, ...)')
+    parser.add_argument('--check', action='store_true', help='код 1, якщо false_flagged > --max-false')
+    parser.add_argument('--max-false', type=int, default=0)
+    args = parser.parse_args()
+
+    runs = [run(args, seed) for seed in range(args.seed, args.seed + args.seeds)]
+    print(json.dumps(runs[0] if len(runs) == 1 else runs, indent=2))
+    if args.check and any(output['false_flagged'] > args.max_false for output in runs):
+        sys.exit(1)
+
+
+def run(args, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    result_ids, user_ids, answers, planted = synthesize(rng, args.submissions, args.questions, args.copies,
+                                                        args.noise, args.bank, args.p_correct, args.ability)
+    started = time.perf_counter()
+    report = detect(result_ids, user_ids, answers, args.min_shared, args.max_p)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    detect(result_ids, user_ids, answers, args.min_shared, args.max_p)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    found = set(zip(report['a'].tolist(), report['b'].tolist()))
+    output = {
+        'seed': seed,
+        'submissions': args.submissions,
+        'questions': args.questions,
+        'bank': args.bank,
+        'detect_ms': round(seconds * 1e3, 1),
+        'peak_mb': round(peak / 2**20, 1),
+        'max_p': float(f"{report['max_p']:.3g}"),
+        'candidates': report['candidates'],
+        'all_pairs': args.submissions * (args.submissions - 1) // 2,
+        'flagged': len(found),
+        'planted': len(planted),
+        'planted_found': len(found & planted),
+        'false_flagged': len(found - planted),
+    }
+    if args.brute:
+        output.update(brute(result_ids, user_ids, answers, args.brute, args.min_shared, args.max_p))
+    return output
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Автодоповнення /learn/suggest: префіксний індекс SuggestIndex проти LIKE у SQLite.
+
+Генерує --titles синтетичних назв (слова з обмеженого словника, 2-7 слів),
+будує індекс і міряє затримку top-K для випадкових префіксів 1-8 символів
+(p50/p99), додавання назви в дельту та злиття дельти. Для порівняння -
+запит LIKE 'q%' OR LIKE '% q%' по тій самій таблиці (повний перегляд,
+лише --sql-calls викликів).
+
+Запуск:
+    python -m benchmarks.suggest --titles 1000000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+from core.search.suggest import SuggestIndex, KINDS, DELTA_LIMIT
+
+SYLLABLES = ('ко', 'да', 'py', 'th', 'on', 'ге', 'не', 'ра', 'то', 'ри', 'as', 'yn', 'ci', 'о', 'ті', 'ва')
+
+
+def vocabulary(rng, size: int) -> list[str]:
+    return [''.join(rng.choice(SYLLABLES, rng.integers(2, 6))) for _ in range(size)]
+
+
+def percentile_ms(samples: list[float], p: float) -> float:
+    return round(float(np.percentile(samples, p)) * 1e3, 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=1_000_000)
+    parser.add_argument('--words', type=int, default=50_000, help='розмір словника')
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--sql-calls', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    words = vocabulary(rng, args.words)
+    lengths = rng.integers(2, 8, args.titles)
+    picks = rng.integers(0, len(words), int(lengths.sum()))
+    titles, offset = [], 0
+    for n in lengths:
+        titles.append(' '.join(words[i] for i in picks[offset:offset + n]).capitalize())
+        offset += n
+    kinds = rng.integers(0, len(KINDS), args.titles)
+
+    index = SuggestIndex()
+    started = time.perf_counter()
+    index.build((KINDS[k], i, title) for i, (k, title) in enumerate(zip(kinds, titles)))
+    build_seconds = time.perf_counter() - started
+
+    queries = [words[i][:n] for i, n in zip(rng.integers(0, len(words), args.calls), rng.integers(1, 9, args.calls))]
+    latencies, found = [], 0
+    for query in queries:
+        started = time.perf_counter()
+        found += len(index.suggest(query, args.limit))
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(DELTA_LIMIT // 3):
+        index.add('lesson', args.titles + i, titles[i])
+    add_seconds = (time.perf_counter() - started) / (DELTA_LIMIT // 3)
+    delta_latencies = []
+    for query in queries[:1000]:
+        started = time.perf_counter()
+        index.suggest(query, args.limit)
+        delta_latencies.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    index._merge()
+    merge_seconds = time.perf_counter() - started
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'titles.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE titles (id INTEGER PRIMARY KEY, title TEXT)')
+    connection.executemany('INSERT INTO titles VALUES (?, ?)', enumerate(titles))
+    connection.commit()
+    sql_latencies = []
+    for query in queries[:args.sql_calls]:
+        started = time.perf_counter()
+        connection.execute('SELECT id, title FROM titles WHERE title LIKE ? OR title LIKE ? LIMIT ?',
+                           (f'{query}%', f'% {query}%', args.limit)).fetchall()
+        sql_latencies.append(time.perf_counter() - started)
+    connection.close()
+
+    print(json.dumps({
+        'titles': args.titles,
+        'limit': args.limit,
+        'build_s': round(build_seconds, 2),
+        'index_bytes': index.stats()['bytes'],
+        'keys': index.stats()['keys'],
+        'suggest_p50_ms': percentile_ms(latencies, 50),
+        'suggest_p99_ms': percentile_ms(latencies, 99),
+        'suggest_with_delta_p99_ms': percentile_ms(delta_latencies, 99),
+        'mean_results': round(found / len(queries), 2),
+        'add_us': round(add_seconds * 1e6, 1),
+        'merge_ms': round(merge_seconds * 1e3, 1),
+        'sql_like_p50_ms': percentile_ms(sql_latencies, 50),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
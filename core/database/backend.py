@@ -0,0 +1,113 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from core.database.db import DATABASE_URL, engine, _on_connect
+from core.database.metrics import EngineMetrics
+
+# 'aiosqlite' - читання через сесію запиту (кожен запит до SQLite - перехід у потік aiosqlite);
+# 'threadpool' - пул синхронних sqlite3-з'єднань, уся функція читання - один виклик у пулі потоків
+DB_BACKEND = os.getenv('DB_BACKEND', 'aiosqlite')
+# Потоки (і з'єднання) пулу для DB_BACKEND=threadpool
+DB_THREADS = int(os.getenv('DB_THREADS', '4'))
+
+
+class AiosqliteBackend:
+    """Синхронна функція виконується в greenlet сесії запиту (AsyncSession.run_sync)."""
+    name = 'aiosqlite'
+
+    def __init__(self):
+        self.calls = 0
+
+    async def run(self, db: AsyncSession, fn: Callable, *args):
+        self.calls += 1
+        return await db.run_sync(fn, *args)
+
+    def stats(self) -> dict:
+        return {'backend': self.name, 'calls': self.calls}
+
+    def close(self):
+        pass
+
+
+class ThreadPoolBackend:
+    """
+    Пул синхронних sqlite3-з'єднань.
+
+    Функція читання разом з усіма своїми запитами (включно з selectinload)
+    виконується одним викликом у ThreadPoolExecutor на власній сесії, тому
+    за один перехід між потоками виконується пакет запитів, а не кожна операція
+    курсора окремо. Повернені ORM-об'єкти від'єднані від сесії: доступні лише
+    завантажені атрибути, тому через цей backend ідуть тільки функції читання.
+    """
+    name = 'threadpool'
+
+    def __init__(self, threads: int = DB_THREADS):
+        self.threads = threads
+        self.calls = 0
+        self.engine = create_engine(
+            make_url(DATABASE_URL).set(drivername='sqlite'),
+            pool_size=threads,
+            max_overflow=0,
+            connect_args={'check_same_thread': False},
+            execution_options=engine.sync_engine.get_execution_options()
+        )
+        event.listen(self.engine, 'connect', _on_connect)
+        EngineMetrics('threadpool').bind(self.engine)
+        self.session_maker = sessionmaker(self.engine, expire_on_commit=False, autoflush=False)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='sqlite')
+
+    def _call(self, fn: Callable, args: tuple):
+        with self.session_maker() as session:
+            return fn(session, *args)
+
+    async def run(self, db: AsyncSession, fn: Callable, *args):
+        self.calls += 1
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._call, fn, args)
+
+    def stats(self) -> dict:
+        return {'backend': self.name, 'threads': self.threads, 'calls': self.calls}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.engine.dispose()
+
+
+BACKENDS = {'aiosqlite': AiosqliteBackend, 'threadpool': ThreadPoolBackend}
+
+backend: Optional[AiosqliteBackend | ThreadPoolBackend] = None
+
+
+def get_backend():
+    """Backend читання db_func (створюється при першому виклику, тип - DB_BACKEND)."""
+    global backend
+    if backend is None:
+        backend = BACKENDS[DB_BACKEND]()
+    return backend
+
+
+def close_backend():
+    global backend
+    if backend is not None:
+        backend.close()
+        backend = None
+
+
+def first(session: Session, statement):
+    return session.execute(statement).scalars().first()
+
+
+def all_rows(session: Session, statement):
+    return session.execute(statement).scalars().all()
+
+
+def scalar(session: Session, statement):
+    return session.execute(statement).scalar()
+
+
+def rows(session: Session, statement):
+    return session.execute(statement).all()
@@ -0,0 +1,346 @@
+"""
+Гарячі резервні копії SQLite без зупинки сервісу.
+
+    python -m core.database.backup create               # знімок усіх БД у BACKUP_DIR
+    python -m core.database.backup list
+    python -m core.database.backup restore backups/learning-20250101-120000-000000.db.gz restored.db
+"""
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from core.database.db import DATABASE_PATH, RESULTS_DATABASE_PATH
+
+logger = logging.getLogger('uvicorn.error')
+
+# Каталог знімків і скільки останніх знімків кожної БД зберігати
+BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+# Як часто знімок робиться фоновим завданням db_backup, секунди (0 - лише вручну)
+BACKUP_INTERVAL = float(os.getenv('BACKUP_INTERVAL', '86400'))
+# Сторінок БД за один крок backup API і пауза між кроками, секунди
+BACKUP_STEP_PAGES = int(os.getenv('BACKUP_STEP_PAGES', '256'))
+BACKUP_STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', '0.05'))
+# До якого розміру БД (МБ) копія тримається в пам'яті процесу; більша пишеться в тимчасовий файл
+BACKUP_MEMORY_MB = int(os.getenv('BACKUP_MEMORY_MB', '256'))
+# Рівень gzip: стиснення займає процесор значно довше за саму копію, 1 - у рази швидше за 6
+BACKUP_COMPRESS_LEVEL = int(os.getenv('BACKUP_COMPRESS_LEVEL', '1'))
+SUFFIX = '.db.gz'
+# Мітка знімка з мікросекундами: два знімки в одну секунду (ручний і плановий, кілька
+# worker'ів) не пишуть у той самий .part; старі знімки без мікросекунд теж розпізнаються
+STAMP_FORMAT = '%Y%m%d-%H%M%S-%f'
+STAMP_FORMATS = (STAMP_FORMAT, '%Y%m%d-%H%M%S')
+CHUNK = 1 << 20
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+def databases() -> list[tuple[str, str]]:
+    """(назва, шлях) файлів, що потрапляють у знімок: основна БД і, якщо окремий, файл результатів."""
+    files = [('learning', DATABASE_PATH)]
+    if RESULTS_DATABASE_PATH:
+        files.append(('results', RESULTS_DATABASE_PATH))
+    return files
+
+
+def copy_database(source: str, target: str = ':memory:', pages: int = BACKUP_STEP_PAGES,
+                  sleep: float = BACKUP_STEP_SLEEP, progress=None,
+                  stop: Optional[threading.Event] = None) -> Optional[bytes]:
+    """
+    Скопіювати живу БД через online backup API кроками по pages сторінок.
+
+    На джерелі відкривається транзакція читання: у WAL-режимі backup копіює її
+    знімок і не починається спочатку після кожного запису інших з'єднань (без
+    неї під постійними записами копія не завершується ніколи). Writer'ів це не
+    блокує, лише checkpoint не переносить WAL далі знімка, поки копія триває.
+
+    Args:
+        target: ':memory:' або шлях тимчасового файлу копії
+        progress: progress(скопійовано, всього сторінок) після кожного кроку
+        stop: подія скасування (перевіряється між кроками)
+
+    Returns:
+        bytes | None: вміст БД для копії в пам'яті, None - копію записано у target
+    """
+    def step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+        if stop is not None and stop.is_set():
+            raise BackupCancelled()
+        if remaining and sleep:
+            time.sleep(sleep)  # віддати диск і GIL запитам між кроками
+
+    src = sqlite3.connect(source, isolation_level=None)
+    try:
+        src.execute('BEGIN')
+        src.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst, pages=pages, progress=step)
+            src.execute('COMMIT')
+            return dst.serialize() if target == ':memory:' else None
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+
+def _chunks(data, path: Optional[str]):
+    """Частини по CHUNK з копії в пам'яті (data) або з тимчасового файлу (path)."""
+    if path is None:
+        for offset in range(0, len(data), CHUNK):
+            yield data[offset:offset + CHUNK]
+        return
+    with open(path, 'rb') as file:
+        while chunk := file.read(CHUNK):
+            yield chunk
+
+
+def snapshot(name: str, source: str, directory: str, stamp: str, progress=None,
+             stop: Optional[threading.Event] = None, pages: int = BACKUP_STEP_PAGES,
+             sleep: float = BACKUP_STEP_SLEEP, memory_limit: int = BACKUP_MEMORY_MB << 20) -> dict:
+    """
+    Знімок однієї БД: копія backup API, стиснена gzip частинами по CHUNK (з тією ж паузою між ними).
+
+    БД до memory_limit байтів копіюється в пам'ять процесу (пік RSS - до двох розмірів БД):
+    нестиснений тимчасовий файл розміром з БД сповільнював fsync транзакцій
+    застосунку аж до "database is locked". Більша БД копіюється в тимчасовий
+    файл у directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}-{stamp}{SUFFIX}')
+    partial = f'{path}.part'
+    copy = None if os.path.getsize(source) <= memory_limit else os.path.join(directory, f'.{name}-{stamp}.db')
+    state = {'total': 0}
+
+    def step(done, total):
+        state['total'] = total
+        if progress:
+            progress(done, total)
+
+    started = time.perf_counter()
+    try:
+        data = copy_database(source, copy or ':memory:', pages, sleep, step, stop)
+        size = len(data) if copy is None else os.path.getsize(copy)
+        copied = time.perf_counter()
+        with gzip.open(partial, 'wb', compresslevel=BACKUP_COMPRESS_LEVEL) as dst:
+            for chunk in _chunks(None if copy else memoryview(data), copy):
+                if stop is not None and stop.is_set():
+                    raise BackupCancelled()
+                dst.write(chunk)
+                if sleep:
+                    time.sleep(sleep)
+        os.replace(partial, path)  # файл з'являється лише повністю записаним
+    finally:
+        for leftover in (partial, copy):
+            if leftover and os.path.exists(leftover):
+                os.remove(leftover)
+    return {
+        'database': name,
+        'path': path,
+        'pages': state['total'],
+        'bytes': size,
+        'compressed_bytes': os.path.getsize(path),
+        'in_memory': copy is None,
+        'copy_s': round(copied - started, 3),
+        'compress_s': round(time.perf_counter() - copied, 3),
+    }
+
+
+def list_backups(directory: str = BACKUP_DIR) -> list[dict]:
+    """Знімки в каталозі, найновіші першими."""
+    if not os.path.isdir(directory):
+        return []
+    items = []
+    for filename in os.listdir(directory):
+        if not filename.endswith(SUFFIX):
+            continue
+        name, _, stamp = filename[:-len(SUFFIX)].partition('-')
+        created_at = _parse_stamp(stamp)
+        if created_at is None:
+            continue  # чужий файл у каталозі: не знімок, ретенція його не чіпає
+        items.append({
+            'name': filename,
+            'database': name,
+            'created_at': created_at,
+            'bytes': os.path.getsize(os.path.join(directory, filename)),
+        })
+    return sorted(items, key=lambda item: (item['created_at'], item['name']), reverse=True)
+
+
+def _parse_stamp(stamp: str) -> Optional[datetime]:
+    for fmt in STAMP_FORMATS:
+        try:
+            return datetime.strptime(stamp, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return None
+
+
+def prune(directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> list[str]:
+    """Видалити знімки кожної БД, старші за keep останніх."""
+    removed, seen = [], {}
+    for item in list_backups(directory):
+        seen[item['database']] = seen.get(item['database'], 0) + 1
+        if seen[item['database']] > keep:
+            os.remove(os.path.join(directory, item['name']))
+            removed.append(item['name'])
+    return removed
+
+
+def restore(path: str, target: str) -> dict:
+    """
+    Розпакувати знімок у новий файл БД і перевірити його (PRAGMA integrity_check).
+
+    Робоча БД не змінюється: target не повинен існувати, його потім підставляють
+    замість learning.db (або results.db) вручну при зупиненому сервісі.
+    """
+    if os.path.exists(target):
+        raise FileExistsError(f'{target} already exists')
+    partial = f'{target}.part'
+    try:
+        with gzip.open(path, 'rb') as src, open(partial, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK)
+        connection = sqlite3.connect(partial)
+        try:
+            integrity = connection.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            connection.close()
+        if integrity != 'ok':
+            raise ValueError(f'Snapshot {path} failed integrity check: {integrity}')
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return {'path': target, 'bytes': os.path.getsize(target), 'integrity': integrity}
+
+
+async def create_backup(report=None, directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP,
+                        pages: int = BACKUP_STEP_PAGES, sleep: float = BACKUP_STEP_SLEEP) -> dict:
+    """
+    Зняти всі БД (databases) у фоновому потоці, не блокуючи event loop, і застосувати ретенцію.
+
+    Args:
+        report: async report(частка 0..1, повідомлення) - JobContext.report
+    """
+    stamp = datetime.now(timezone.utc).strftime(STAMP_FORMAT)
+    files = databases()
+    stop = threading.Event()
+    results = []
+    started = time.perf_counter()
+    for index, (name, source) in enumerate(files):
+        state = {'done': 0, 'total': 0}
+        task = asyncio.create_task(asyncio.to_thread(
+            snapshot, name, source, directory, stamp, lambda done, total: state.update(done=done, total=total), stop,
+            pages, sleep
+        ))
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=0.5)
+                if report and state['total']:
+                    await report((index + state['done'] / state['total']) / len(files),
+                                 f"{name}: {state['done']}/{state['total']} pages")
+            results.append(task.result())
+        except asyncio.CancelledError:
+            stop.set()  # потік зупиниться на наступному кроці
+            await asyncio.gather(task, return_exceptions=True)
+            raise
+    return {
+        'files': results,
+        'seconds': round(time.perf_counter() - started, 3),
+        'removed': prune(directory, keep),
+    }
+
+
+class BackupScheduler:
+    """
+    Планові знімки (singleton): раз на BACKUP_INTERVAL ставить завдання db_backup.
+
+    Планувальник працює в кожному worker'і, але завдання ставиться через
+    submit_scheduled: якщо db_backup уже в черзі, виконується або створений менше ніж
+    пів інтервалу тому (іншим worker'ом), новий не додається.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._task = None
+        return cls._instance
+
+    async def _run(self, interval: float):
+        from core.jobs.runner import get_job_runner
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                since = datetime.now(timezone.utc) - timedelta(seconds=interval / 2)
+                await get_job_runner().submit_scheduled('db_backup', {}, since)
+            except Exception:
+                logger.exception('Database backup was not scheduled')
+
+    def start(self, interval: float = BACKUP_INTERVAL):
+        if self._task is None and interval > 0:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'directory': os.path.abspath(BACKUP_DIR),
+            'interval': BACKUP_INTERVAL,
+            'keep': BACKUP_KEEP,
+            'step_pages': BACKUP_STEP_PAGES,
+            'step_sleep': BACKUP_STEP_SLEEP,
+            'compress_level': BACKUP_COMPRESS_LEVEL,
+            'memory_mb': BACKUP_MEMORY_MB,
+            'backups': list_backups(),
+        }
+
+
+backup_scheduler: Optional[BackupScheduler] = None
+
+
+def get_backup_scheduler() -> BackupScheduler:
+    global backup_scheduler
+    if backup_scheduler is None:
+        backup_scheduler = BackupScheduler()
+    return backup_scheduler
+
+
+def main():
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('create')
+    commands.add_parser('list')
+    restore_parser = commands.add_parser('restore')
+    restore_parser.add_argument('snapshot')
+    restore_parser.add_argument('target')
+    args = parser.parse_args()
+    if args.command == 'create':
+        result = asyncio.run(create_backup())
+    elif args.command == 'list':
+        result = list_backups()
+    else:
+        result = restore(args.snapshot, args.target)
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,185 @@
+import os
+from sqlalchemy import event, inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import declarative_base, Session
+from core.database.metrics import EngineMetrics
 
 # Використовуємо асинхронний драйвер для SQLite
-DATABASE_URL = "sqlite+aiosqlite:///./learning.db"
+DATABASE_URL = os.getenv('DATABASE_URL', "sqlite+aiosqlite:///./learning.db")
+
+# Окремий файл для результатів тестування (test_results та інші дані спроб).
+# Якщо змінна не задана, результати зберігаються в основній БД, як і раніше.
+RESULTS_DATABASE_PATH = os.getenv('RESULTS_DATABASE_PATH')
+
+# Схема, до якої належать таблиці результатів. В окремому режимі файл результатів
+# підключається до основних з'єднань через ATTACH під цим іменем, тому звітні
+# запити з JOIN між каталогом і результатами продовжують працювати.
+RESULTS_SCHEMA = 'results'
+
+SEPARATE_RESULTS_DB = bool(RESULTS_DATABASE_PATH)
+
+
+def _enable_wal(dbapi_connection):
+    """WAL дозволяє читачам не блокувати єдиного writer'а SQLite."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+# Пул, потік aiosqlite, транзакції та writer-lock кожного engine (GET /admin/db-metrics)
+engine_metrics = EngineMetrics('main')
 
 # Створюємо асинхронний engine
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    future=True
+    future=True,
+    execution_options={
+        'schema_translate_map': {} if SEPARATE_RESULTS_DB else {RESULTS_SCHEMA: None}
+    },
+    **engine_metrics.engine_options(DATABASE_URL)
 )
+engine_metrics.bind(engine)
+
+# Шлях до файлу основної БД (для синхронних sqlite3-з'єднань поза ORM)
+DATABASE_PATH = engine.url.database
+
+if SEPARATE_RESULTS_DB:
+    results_metrics = EngineMetrics('results')
+    results_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{RESULTS_DATABASE_PATH}",
+        echo=False,
+        future=True,
+        execution_options={'schema_translate_map': {RESULTS_SCHEMA: None}},
+        **results_metrics.engine_options(f"sqlite+aiosqlite:///{RESULTS_DATABASE_PATH}")
+    )
+    results_metrics.bind(results_engine)
+else:
+    results_engine = engine
+
+
+@event.listens_for(engine.sync_engine, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    _enable_wal(dbapi_connection)
+    if SEPARATE_RESULTS_DB:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'ATTACH DATABASE ? AS {RESULTS_SCHEMA}', (RESULTS_DATABASE_PATH,))
+        cursor.close()
+
+
+if SEPARATE_RESULTS_DB:
+    @event.listens_for(results_engine.sync_engine, 'connect')
+    def _on_results_connect(dbapi_connection, connection_record):
+        _enable_wal(dbapi_connection)
+
+
+def is_results_table(table) -> bool:
+    """Чи належить таблиця до даних результатів (окремий файл БД)."""
+    return getattr(table, 'schema', None) == RESULTS_SCHEMA
+
+
+class RoutingSession(Session):
+    """
+    Сесія, що маршрутизує запис результатів у власний engine.
+
+    INSERT/UPDATE/DELETE та flush для таблиць зі схемою RESULTS_SCHEMA
+    виконуються через results_engine, тому подання тестів не займають
+    writer-lock основної БД. Усі SELECT ідуть через основний engine, де файл
+    результатів підключений через ATTACH, тож крос-БД запити залишаються робочими.
+    Явний bind (bind_arguments={'bind': ...}) має пріоритет.
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, bind=None, **kw):
+        if bind is not None:
+            return bind
+        if SEPARATE_RESULTS_DB and (clause is None or clause.is_dml):
+            table = getattr(clause, 'table', None)
+            if table is None and mapper is not None:
+                table = mapper.persist_selectable
+            if is_results_table(table):
+                return results_engine.sync_engine
+        return engine.sync_engine
+
 
 # Асинхронний sessionmaker
 async_session_maker = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    autocommit=False
+)
+
+# Окремий sessionmaker для результатів (у звичайному режимі - той самий файл)
+results_session_maker = async_sessionmaker(
+    bind=results_engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
     autoflush=False,
     autocommit=False
 )
 
 # Базовий клас для моделей
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+def _upgrade_tables(connection, tables):
+    """
+    Додати нові nullable-колонки та індекси в уже існуючі таблиці.
+
+    create_all створює лише відсутні таблиці, тому колонки та індекси, додані
+    в моделі пізніше, в старій БД з'являються тут (ALTER TABLE ADD COLUMN).
+    """
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    for table in tables:
+        if table.name not in existing:
+            continue
+        columns = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns and column.nullable:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+async def init_db():
+    """
+    Створити відсутні таблиці (та нові колонки) в основній БД та в БД результатів.
+
+    Note:
+        В окремому режимі при першому запуску результати, що вже лежать
+        у learning.db, копіюються у файл результатів.
+    """
+    import core.database.models  # noqa: F401 - реєстрація моделей у Base.metadata
+
+    catalogue = [t for t in Base.metadata.sorted_tables if not is_results_table(t)]
+    results = [t for t in Base.metadata.sorted_tables if is_results_table(t)]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(_upgrade_tables, catalogue)
+        await conn.run_sync(Base.metadata.create_all, tables=catalogue)
+    async with results_engine.begin() as conn:
+        await conn.run_sync(_upgrade_tables, results)
+        await conn.run_sync(Base.metadata.create_all, tables=results)
+
+    if not SEPARATE_RESULTS_DB:
+        return
+
+    async with engine.begin() as conn:
+        legacy = await conn.run_sync(lambda c: set(inspect(c).get_table_names()))
+        for table in results:
+            if table.name not in legacy:
+                continue
+            target = f'{RESULTS_SCHEMA}.{table.name}'
+            empty = (await conn.execute(text(f'SELECT 1 FROM {target} LIMIT 1'))).first() is None
+            if empty:
+                legacy_columns = await conn.run_sync(
+                    lambda c: {col['name'] for col in inspect(c).get_columns(table.name)}
+                )
+                columns = ', '.join(c.name for c in table.columns if c.name in legacy_columns)
+                await conn.execute(text(
+                    f'INSERT INTO {target} ({columns}) SELECT {columns} FROM main.{table.name}'
+                ))
@@ -1,18 +1,25 @@
+from datetime import datetime, timezone
+from sqlalchemy import and_, bindparam, delete, func, insert, literal, or_, true, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from core.database.db import async_session_maker
+from sqlalchemy.orm import lazyload, selectinload
+from core.database.backend import get_backend, first as _first, all_rows as _all, scalar as _scalar, rows as _rows
+from core.database.db import async_session_maker, engine
 from core.database.models import (
     LessonModel, CourseModel, ResourceModel,
     UserModel, TestModel, QuestionModel,
-    AnswerOptionModel, TestResultModel
+    AnswerOptionModel, TestResultModel, TestAnswerModel,
+    StudentProgressModel, TestDraftModel, TestAttemptModel, JobModel, ReviewCardModel,
+    CoursePrerequisiteModel, CoursePrerequisiteClosureModel, course_resources
 )
 from core.schemas import (
     UserCreate, UserRead, TestCreate, TestRead,
     TestReadForStudent, AnswerOptionReadForStudent, QuestionRead,
-    TestSubmission
+    TestSubmission, QuestionCreate
 )
 from core.utils.security import get_password_hash
+from core.utils.singleflight import coalesce
 
 
 async def get_db() -> AsyncSession:
@@ -30,6 +37,17 @@ async def get_db() -> AsyncSession:
         yield session
 
 
+async def _read(db: AsyncSession, fn, statement):
+    """
+    Виконати запит читання через backend (DB_BACKEND).
+
+    fn - синхронна функція (session, statement) з core.database.backend: при
+    aiosqlite вона виконується в сесії запиту, при threadpool - на окремому
+    sqlite3-з'єднанні за один виклик у пулі потоків разом з усіма selectinload.
+    """
+    return await get_backend().run(db, fn, statement)
+
+
 async def add_to_db(db: AsyncSession, obj):
     """
     Базова функція для додавання об'єкта до бази даних.
@@ -76,8 +94,7 @@ async def get_lesson_by_title(db: AsyncSession, title: str):
         if lesson:
             print(f"Found: {lesson.title}")
     """
-    result = await db.execute(select(LessonModel).filter(LessonModel.title == title))
-    return result.scalars().first()
+    return await _read(db, _first, select(LessonModel).filter(LessonModel.title == title))
 
 
 async def get_lesson_by_id(db: AsyncSession, _id: int):
@@ -96,8 +113,7 @@ async def get_lesson_by_id(db: AsyncSession, _id: int):
         if lesson:
             print(f"Lesson: {lesson.title}")
     """
-    result = await db.execute(select(LessonModel).filter(LessonModel.id == _id))
-    return result.scalars().first()
+    return await _read(db, _first, select(LessonModel).filter(LessonModel.id == _id))
 
 
 async def get_courses(db: AsyncSession):
@@ -108,10 +124,7 @@ async def get_courses(db: AsyncSession):
         Використання selectinload гарантує, що доступ до course.resources
         не викличе додаткових запитів до БД (вирішення N+1 проблеми)
     """
-    result = await db.execute(
-        select(CourseModel).options(selectinload(CourseModel.resources))
-    )
-    return result.scalars().all()
+    return await _read(db, _all, select(CourseModel).options(selectinload(CourseModel.resources)))
 
 async def get_course_by_id(db: AsyncSession, _id: int):
     """
@@ -132,12 +145,23 @@ async def get_course_by_id(db: AsyncSession, _id: int):
     Note:
         Використовує eager loading для запобігання N+1 запитів
     """
-    result = await db.execute(
+    return await _read(
+        db, _first,
         select(CourseModel)
         .options(selectinload(CourseModel.resources))
         .filter(CourseModel.id == _id)
     )
-    return result.scalars().first()
+
+
+@coalesce
+async def course_exists(db: AsyncSession, _id: int) -> bool:
+    """
+    Перевірити наявність курсу без завантаження його ресурсів.
+
+    Note:
+        Однакові паралельні виклики об'єднуються (singleflight)
+    """
+    return await _read(db, _scalar, select(CourseModel.id).filter(CourseModel.id == _id)) is not None
 
 
 async def save_course(db: AsyncSession, course: CourseModel):
@@ -204,8 +228,7 @@ async def get_resource_by_title(db: AsyncSession, title: str):
     Example:
         resource = await get_resource_by_title(db, "Python Quiz")
     """
-    result = await db.execute(select(ResourceModel).filter(ResourceModel.title == title))
-    return result.scalars().first()
+    return await _read(db, _first, select(ResourceModel).filter(ResourceModel.title == title))
 
 
 async def get_resources_by_level(db: AsyncSession, level: str):
@@ -223,8 +246,7 @@ async def get_resources_by_level(db: AsyncSession, level: str):
         beginner_resources = await get_resources_by_level(db, 'beginner')
         print(f"Found {len(beginner_resources)} beginner resources")
     """
-    result = await db.execute(select(ResourceModel).filter(ResourceModel.difficulty == level))
-    return result.scalars().all()
+    return await _read(db, _all, select(ResourceModel).filter(ResourceModel.difficulty == level))
 
 
 async def get_users(db: AsyncSession):
@@ -332,8 +354,21 @@ async def get_user_by_username(db: AsyncSession, username: str) -> UserRead:
         else:
             print("User not found")
     """
-    result = await db.execute(select(UserModel).filter(UserModel.username == username))
-    return result.scalars().first()
+    return await _read(db, _first, select(UserModel).filter(UserModel.username == username))
+
+
+async def get_usernames_by_ids(db: AsyncSession, ids: list[int]) -> dict[int, str]:
+    """
+    Отримати імена користувачів за списком ID одним запитом.
+
+    Args:
+        db (AsyncSession): Асинхронна сесія бази даних
+        ids (list[int]): Список ID користувачів
+
+    Returns:
+        dict[int, str]: Відповідність ID -> username (неіснуючі ID пропускаються)
+    """
+    return dict(await _read(db, _rows, select(UserModel.id, UserModel.username).filter(UserModel.id.in_(ids))))
 
 
 async def create_test(db: AsyncSession, test: TestCreate):
@@ -375,14 +410,15 @@ async def create_test(db: AsyncSession, test: TestCreate):
         title=test.title,
         description=test.description,
         max_score=test.max_score,
-        course_id=test.course_id
+        course_id=test.course_id,
+        sample_size=test.sample_size
     )
     db.add(new_test)
     await db.commit()
     await db.refresh(new_test)
 
     for q in test.questions:
-        question = QuestionModel(text=q.text, test_id=new_test.id)
+        question = QuestionModel(text=q.text, difficulty=q.difficulty, test_id=new_test.id)
         db.add(question)
         await db.commit()
         await db.refresh(question)
@@ -404,7 +440,8 @@ async def create_test(db: AsyncSession, test: TestCreate):
         description=new_test.description,
         max_score=new_test.max_score,
         course_id=new_test.course_id,
-        questions_count=questions_count
+        questions_count=questions_count,
+        sample_size=new_test.sample_size
     )
 
 
@@ -435,25 +472,52 @@ async def get_test_by_id(db: AsyncSession, _id: int):
     """
     result = await db.execute(
         select(TestModel)
-        .options(selectinload(TestModel.questions).selectinload(QuestionModel.options))
+        .options(
+            selectinload(TestModel.questions).selectinload(QuestionModel.options),
+            lazyload(TestModel.course)  # курс з усіма ресурсами тут не потрібен
+        )
         .filter(TestModel.id == _id)
     )
     return result.scalars().first()
 
+async def test_exists(db: AsyncSession, _id: int) -> bool:
+    """Перевірити наявність тесту без завантаження його питань."""
+    return await _read(db, _scalar, select(TestModel.id).filter(TestModel.id == _id)) is not None
+
+
+async def get_test_info(db: AsyncSession, _id: int):
+    """Row(id, course_id, sample_size) тесту без питань або None."""
+    rows = await _read(db, _rows, select(TestModel.id, TestModel.course_id, TestModel.sample_size)
+                       .filter(TestModel.id == _id))
+    return rows[0] if rows else None
+
+@coalesce
 async def get_test_for_student_by_id(db: AsyncSession, _id: int):
     """
     Отримати тест для проходження студентом (БЕЗ правильних відповідей).
 
+    Returns:
+        TestReadForStudent | None: Тест або None, якщо не знайдено
+
     Security:
         КРИТИЧНО: Правильні відповіді НЕ включаються в response для студента.
         Поле is_correct доступне тільки на backend при перевірці результатів.
+
+    Note:
+        Однакові паралельні виклики (відкриття іспиту) об'єднуються в один
+        запит до БД; всі отримують один і той самий об'єкт - не змінювати його.
     """
-    result = await db.execute(
+    test = await _read(
+        db, _first,
         select(TestModel)
-        .options(selectinload(TestModel.questions).selectinload(QuestionModel.options))
+        .options(
+            selectinload(TestModel.questions).selectinload(QuestionModel.options),
+            lazyload(TestModel.course)  # курс з усіма ресурсами тут не потрібен
+        )
         .filter(TestModel.id == _id)
     )
-    test = result.scalars().first()
+    if test is None:
+        return None
 
     questions = []
     for q in test.questions:  # тепер вони вже завантажені
@@ -467,6 +531,7 @@ async def get_test_for_student_by_id(db: AsyncSession, _id: int):
         max_score=test.max_score,
         course_id=test.course_id,
         questions_count=len(test.questions),
+        sample_size=test.sample_size,
         questions=questions
     )
 
@@ -475,34 +540,46 @@ async def save_test_result(db: AsyncSession, test: TestModel, subm: TestSubmissi
     """
     Зберегти результат проходження тесту та підрахувати бал.
 
+    Разом з результатом зберігається кожна відповідь (TestAnswerModel) з ознакою
+    правильності - вони потрібні для аналітики питань. У тій самій транзакції
+    оновлюється матеріалізований прогрес студента (student_progress).
+
+    Args:
+        db (AsyncSession): Асинхронна сесія бази даних
+        test (TestModel): Тест з get_test_by_id (питання та варіанти вже завантажені)
+        subm (TestSubmission): Відповіді студента
+
     Algorithm:
         score = (correct_answers / total_questions) * max_score
 
         Приклад: якщо max_score=100, total_questions=10, correct=7
         --> score = (7/10) * 100 = 70.00
     """
-    result = await db.execute(
-        select(TestModel)
-        .options(selectinload(TestModel.questions))
-        .filter(TestModel.id == test.id)
-    )
-    test = result.scalars().first()
+    # Тест приходить з get_test_by_id разом з питаннями та варіантами,
+    # тому перевірка відповідей не потребує запитів до БД
+    options = {o.id: o for q in test.questions for o in q.options}
 
     score = 0
+    answers = []
     for ans in subm.answers:
-        result = await db.execute(
-            select(AnswerOptionModel).filter(
-                AnswerOptionModel.id == ans.selected_option_id,
-                AnswerOptionModel.question_id == ans.question_id
-            )
-        )
-        option = result.scalars().first()
-        if option and option.is_correct:
+        option = options.get(ans.selected_option_id)
+        is_correct = bool(option and option.question_id == ans.question_id and option.is_correct)
+        if is_correct:
             score += 1
+        answers.append({
+            'question_id': ans.question_id,
+            'selected_option_id': ans.selected_option_id,
+            'is_correct': is_correct
+        })
 
     max_score = test.max_score
     total_questions = len(test.questions)
-    final_score = float(score / total_questions * max_score)
+    # Прогрес отримує те саме округлене значення, що й test_results (як після rebuild_progress)
+    final_score = round(float(score / total_questions * max_score), 2)
+
+    # Завершити транзакцію читання: тоді запис почнеться з INSERT і SQLite чекатиме
+    # writer-lock (busy timeout), а не поверне "database is locked" через застарілий snapshot
+    await db.commit()
 
     result = TestResultModel(
         user_id=subm.user_id,
@@ -510,7 +587,778 @@ async def save_test_result(db: AsyncSession, test: TestModel, subm: TestSubmissi
         score=f'{final_score:.2f}'
     )
     db.add(result)
+    await db.flush()
+    if answers:
+        # Усі відповіді одним executemany; result.answers підвантажить refresh нижче
+        await db.execute(insert(TestAnswerModel), [{'result_id': result.id, **a} for a in answers])
+    await _update_progress(db, test, result, final_score)
     await db.commit()
     await db.refresh(result)
 
     return result
+
+
+async def _update_progress(db: AsyncSession, test: TestModel, result: TestResultModel, score: float):
+    """UPSERT строки прогресу: найкращий бал, кількість спроб та остання спроба."""
+    table = StudentProgressModel.__table__
+    stmt = sqlite_insert(table).values(
+        user_id=result.user_id,
+        course_id=test.course_id,
+        test_id=test.id,
+        best_score=score,
+        attempts=1,
+        last_result_id=result.id,
+        last_attempt_at=datetime.now(timezone.utc)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.course_id, table.c.test_id],
+        set_={
+            'best_score': func.max(table.c.best_score, stmt.excluded.best_score),
+            'attempts': table.c.attempts + 1,
+            'last_result_id': stmt.excluded.last_result_id,
+            'last_attempt_at': stmt.excluded.last_attempt_at
+        }
+    )
+    await db.execute(stmt)
+
+
+async def get_progress_by_user(db: AsyncSession, user_id: int):
+    """
+    Отримати прогрес студента по всіх курсах та тестах.
+
+    Args:
+        db (AsyncSession): Асинхронна сесія бази даних
+        user_id (int): ID студента
+
+    Returns:
+        list[StudentProgressModel]: Строки прогресу, впорядковані за курсом і тестом
+
+    Note:
+        Первинний ключ (user_id, course_id, test_id) робить вибірку пошуком
+        по індексу без сканування test_results
+    """
+    return await _read(
+        db, _all,
+        select(StudentProgressModel)
+        .filter(StudentProgressModel.user_id == user_id)
+        .order_by(StudentProgressModel.course_id, StudentProgressModel.test_id)
+    )
+
+
+async def rebuild_progress(db: AsyncSession, test_id: int | None = None) -> int:
+    """
+    Перебудувати student_progress з історії test_results.
+
+    Args:
+        db (AsyncSession): Асинхронна сесія бази даних
+        test_id (int | None): Перебудувати лише строки одного тесту (після повторної перевірки)
+
+    Returns:
+        int: Кількість строк прогресу після перебудови
+
+    Note:
+        Обидва запити виконуються через основний engine: тільки там видно
+        і tests, і таблиці результатів (в окремому режимі - через ATTACH).
+        Час останньої спроби для історичних даних невідомий і лишається NULL.
+    """
+    bind = {'bind': engine.sync_engine}
+    stale = delete(StudentProgressModel)
+    if test_id is not None:
+        stale = stale.where(StudentProgressModel.test_id == test_id)
+    await db.execute(stale, bind_arguments=bind)
+    history = (
+        select(
+            TestResultModel.user_id,
+            TestModel.course_id,
+            TestResultModel.test_id,
+            func.max(TestResultModel.score),
+            func.count(TestResultModel.id),
+            func.max(TestResultModel.id),
+            literal(None)
+        )
+        .join(TestModel, TestModel.id == TestResultModel.test_id)
+        .filter(TestResultModel.user_id.is_not(None))
+        .group_by(TestResultModel.user_id, TestModel.course_id, TestResultModel.test_id)
+    )
+    if test_id is not None:
+        history = history.filter(TestResultModel.test_id == test_id)
+    await db.execute(
+        insert(StudentProgressModel).from_select(
+            ['user_id', 'course_id', 'test_id', 'best_score',
+             'attempts', 'last_result_id', 'last_attempt_at'],
+            history
+        ),
+        bind_arguments=bind
+    )
+    await db.commit()
+    count = await db.execute(select(func.count()).select_from(StudentProgressModel))
+    return count.scalar_one()
+
+
+async def get_draft_answers(db: AsyncSession, user_id: int, test_id: int) -> dict[int, int]:
+    """
+    Отримати збережену чернетку відповідей студента на тест.
+
+    Returns:
+        dict[int, int]: question_id -> selected_option_id
+    """
+    result = await db.execute(
+        select(TestDraftModel.question_id, TestDraftModel.selected_option_id)
+        .filter(TestDraftModel.user_id == user_id, TestDraftModel.test_id == test_id)
+    )
+    return dict(result.all())
+
+
+async def flush_drafts(db: AsyncSession, rows: list[dict], submitted: list[tuple[int, int]]):
+    """
+    Записати пакет змінених відповідей чернеток та прибрати чернетки зданих тестів.
+
+    Args:
+        db (AsyncSession): Асинхронна сесія бази даних
+        rows (list[dict]): {'user_id', 'test_id', 'question_id', 'selected_option_id'}
+        submitted (list[tuple[int, int]]): (user_id, test_id) зданих тестів
+
+    Note:
+        Уся пачка - одна транзакція: один DELETE, потім UPSERT через executemany
+        (нова спроба після здачі не втрачає своїх відповідей)
+    """
+    now = datetime.now(timezone.utc)
+    if submitted:
+        await db.execute(
+            delete(TestDraftModel).where(tuple_(TestDraftModel.user_id, TestDraftModel.test_id).in_(submitted))
+        )
+    if rows:
+        table = TestDraftModel.__table__
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.test_id, table.c.question_id],
+            set_={
+                'selected_option_id': stmt.excluded.selected_option_id,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        await db.execute(stmt, [{**row, 'updated_at': now} for row in rows])
+    await db.commit()
+
+
+async def add_bank_questions(db: AsyncSession, test_id: int, questions: list[QuestionCreate]) -> int:
+    """
+    Додати питання в банк тесту пакетно.
+
+    Args:
+        db (AsyncSession): Асинхронна сесія бази даних
+        test_id (int): ID тесту-банку
+        questions (list[QuestionCreate]): Питання з рівнем складності та варіантами
+
+    Returns:
+        int: Кількість доданих питань
+
+    Note:
+        На відміну від create_test (commit на кожне питання) питання вставляються
+        одним executemany з RETURNING, варіанти - другим, в одній транзакції,
+        тому банк з десятків тисяч питань завантажується за секунди.
+    """
+    if not questions:
+        return 0
+    ids = (await db.scalars(
+        insert(QuestionModel).returning(QuestionModel.id, sort_by_parameter_order=True),
+        [{'text': q.text, 'difficulty': q.difficulty, 'test_id': test_id} for q in questions]
+    )).all()
+    options = [
+        {'text': o.text, 'is_correct': o.is_correct, 'question_id': question_id}
+        for question_id, q in zip(ids, questions) for o in q.options
+    ]
+    if options:
+        await db.execute(insert(AnswerOptionModel), options)
+    await db.commit()
+    return len(ids)
+
+
+async def get_bank_columns(db: AsyncSession, test_id: int):
+    """
+    Отримати параметри тесту-банку та колонки (id, difficulty) його питань.
+
+    Returns:
+        tuple | None: (Row(id, course_id, max_score, sample_size), [(question_id, difficulty), ...])
+        або None, якщо тесту немає
+
+    Note:
+        Лише дві колонки по індексу questions.test_id - без ORM-об'єктів і варіантів
+    """
+    test = (await db.execute(
+        select(TestModel.id, TestModel.course_id, TestModel.max_score, TestModel.sample_size)
+        .filter(TestModel.id == test_id)
+    )).first()
+    if test is None:
+        return None
+    rows = await db.execute(
+        select(QuestionModel.id, QuestionModel.difficulty).filter(QuestionModel.test_id == test_id)
+    )
+    return test, rows.all()
+
+
+async def get_bank_versions(db: AsyncSession, test_ids: list[int]) -> dict[int, tuple[int, int]]:
+    """
+    (кількість питань, найбільший question_id) кожного з тестів.
+
+    Note:
+        Питання банку лише додаються, тож зміна пари означає нові питання;
+        один GROUP BY по індексу questions.test_id
+    """
+    result = await db.execute(
+        select(QuestionModel.test_id, func.count(QuestionModel.id), func.max(QuestionModel.id))
+        .filter(QuestionModel.test_id.in_(test_ids))
+        .group_by(QuestionModel.test_id)
+    )
+    return {test_id: (count, max_id) for test_id, count, max_id in result.all()}
+
+
+async def get_questions_by_ids(db: AsyncSession, ids: list[int]) -> list[QuestionModel]:
+    """
+    Отримати питання з варіантами відповідей у порядку ids.
+
+    Note:
+        Вибірка за первинним ключем - O(N) від розміру спроби, а не банку
+    """
+    result = await db.execute(
+        select(QuestionModel)
+        .options(selectinload(QuestionModel.options), lazyload(QuestionModel.test))
+        .filter(QuestionModel.id.in_(ids))
+    )
+    questions = {q.id: q for q in result.scalars().all()}
+    return [questions[i] for i in ids if i in questions]
+
+
+async def create_attempt(db: AsyncSession, user_id: int, test_id: int, seed: int, question_ids: list[int]) -> TestAttemptModel:
+    """
+    Зберегти спробу тесту-банку: seed та вибрані питання (лише id через кому).
+    """
+    attempt = TestAttemptModel(
+        user_id=user_id,
+        test_id=test_id,
+        seed=seed,
+        question_ids=','.join(map(str, question_ids)),
+        created_at=datetime.now(timezone.utc)
+    )
+    db.add(attempt)
+    await db.commit()
+    return attempt
+
+
+async def get_attempt(db: AsyncSession, attempt_id: int) -> TestAttemptModel | None:
+    result = await db.execute(select(TestAttemptModel).filter(TestAttemptModel.id == attempt_id))
+    return result.scalars().first()
+
+
+async def claim_attempt(db: AsyncSession, attempt_id: int, user_id: int) -> bool:
+    """
+    Позначити спробу як здану (атомарно: повторна або паралельна здача отримає False).
+    """
+    result = await db.execute(
+        update(TestAttemptModel)
+        .where(TestAttemptModel.id == attempt_id,
+               TestAttemptModel.user_id == user_id,
+               TestAttemptModel.submitted_at.is_(None))
+        .values(submitted_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def finish_attempt(db: AsyncSession, attempt_id: int, result_id: int | None):
+    """
+    Прив'язати результат до зданої спроби; result_id=None - зняти позначку здачі (помилка оцінювання).
+    """
+    values = {'result_id': result_id} if result_id is not None else {'submitted_at': None}
+    await db.execute(update(TestAttemptModel).where(TestAttemptModel.id == attempt_id).values(**values))
+    await db.commit()
+
+
+async def get_course_test_ids(db: AsyncSession, course_id: int) -> list[int]:
+    result = await db.execute(select(TestModel.id).filter(TestModel.course_id == course_id).order_by(TestModel.id))
+    return list(result.scalars().all())
+
+
+async def stream_gradebook(db: AsyncSession, course_id: int, test_ids: list[int], chunk: int = 5000):
+    """
+    Потоково віддати журнал курсу: рядок на студента, колонка на тест (найкращий бал).
+
+    Args:
+        db (AsyncSession): Сесія, відкрита на весь час експорту
+        course_id (int): ID курсу
+        test_ids (list[int]): Тести курсу - порядок колонок
+        chunk (int): Кількість строк student_progress за одну вибірку з курсора
+
+    Yields:
+        list[tuple]: (user_id, username, бал_тесту_1, ..., бал_тесту_k); None - тест не проходився
+
+    Note:
+        Строки йдуть з серверного курсора в порядку первинного ключа
+        (user_id, course_id, test_id) без сортування, тому пам'ять не залежить від
+        розміру курсу: в ній лише поточна пачка та рядок одного студента.
+    """
+    column = {test_id: i for i, test_id in enumerate(test_ids, start=2)}
+    result = await db.stream(
+        select(StudentProgressModel.user_id, UserModel.username,
+               StudentProgressModel.test_id, StudentProgressModel.best_score)
+        .join(UserModel, UserModel.id == StudentProgressModel.user_id)
+        .filter(StudentProgressModel.course_id == course_id)
+        .order_by(StudentProgressModel.user_id, StudentProgressModel.test_id)
+        .execution_options(yield_per=chunk)
+    )
+    row = None
+    async for partition in result.partitions():
+        rows = []
+        for user_id, username, test_id, best_score in partition:
+            if row is None or row[0] != user_id:
+                if row is not None:
+                    rows.append(tuple(row))
+                row = [user_id, username] + [None] * len(test_ids)
+            if test_id in column:
+                row[column[test_id]] = best_score
+        if rows:
+            yield rows
+    if row is not None:
+        yield [tuple(row)]
+
+
+async def stream_test_results(db: AsyncSession, test_id: int, chunk: int = 5000):
+    """
+    Потоково віддати всі спроби тесту: (result_id, user_id, username, score).
+
+    Note:
+        Вибірка по індексу test_results.test_id пачками з серверного курсора
+    """
+    result = await db.stream(
+        select(TestResultModel.id, TestResultModel.user_id, UserModel.username, TestResultModel.score)
+        .outerjoin(UserModel, UserModel.id == TestResultModel.user_id)
+        .filter(TestResultModel.test_id == test_id)
+        .order_by(TestResultModel.id)
+        .execution_options(yield_per=chunk)
+    )
+    async for partition in result.partitions():
+        yield [tuple(r) for r in partition]
+
+
+async def create_job(db: AsyncSession, kind: str, params: str, user_id: int | None) -> JobModel:
+    """Зареєструвати нове завдання зі статусом queued (params - JSON-текст)."""
+    job = JobModel(kind=kind, status='queued', progress=0, params=params, user_id=user_id,
+                   created_at=datetime.now(timezone.utc))
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def create_scheduled_job(db: AsyncSession, kind: str, params: str, since: datetime) -> JobModel | None:
+    """
+    Зареєструвати планове завдання, якщо завдання цього типу немає в черзі, не виконується
+    і не створене після since; інакше None.
+
+    Note:
+        Перевірка і вставка - один INSERT ... SELECT ... WHERE NOT EXISTS, який SQLite
+        виконує під write-lock: при WORKERS > 1 з однаковим розкладом завдання ставить
+        лише один worker
+    """
+    pending = select(JobModel.id).filter(
+        JobModel.kind == kind,
+        or_(JobModel.status.in_(('queued', 'running')), JobModel.created_at >= since)
+    )
+    values = select(
+        literal(kind), literal('queued'), literal(0.0), literal(params),
+        literal(datetime.now(timezone.utc), JobModel.created_at.type)
+    ).where(~pending.exists())
+    result = await db.execute(
+        insert(JobModel).from_select(['kind', 'status', 'progress', 'params', 'created_at'], values)
+        .returning(JobModel.id)
+    )
+    job_id = result.scalar()
+    await db.commit()
+    return None if job_id is None else await get_job(db, job_id)
+
+
+async def get_job(db: AsyncSession, job_id: int) -> JobModel | None:
+    result = await db.execute(select(JobModel).filter(JobModel.id == job_id))
+    return result.scalars().first()
+
+
+async def list_jobs(db: AsyncSession, user_id: int | None = None, status: str | None = None,
+                    limit: int = 50) -> list[JobModel]:
+    """Останні завдання (нові першими), за потреби - лише одного користувача або статусу."""
+    query = select(JobModel).order_by(JobModel.id.desc()).limit(limit)
+    if user_id is not None:
+        query = query.filter(JobModel.user_id == user_id)
+    if status is not None:
+        query = query.filter(JobModel.status == status)
+    return list((await db.execute(query)).scalars().all())
+
+
+async def claim_job(db: AsyncSession, job_id: int, worker_pid: int) -> bool:
+    """
+    Перевести завдання queued -> running.
+
+    Note:
+        Умовний UPDATE: якщо завдання вже забрав інший worker (WORKERS > 1)
+        або його скасовано, повертає False
+    """
+    result = await db.execute(
+        update(JobModel)
+        .where(JobModel.id == job_id, JobModel.status == 'queued')
+        .values(status='running', worker_pid=worker_pid, started_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def update_job(db: AsyncSession, job_id: int, **values):
+    await db.execute(update(JobModel).where(JobModel.id == job_id).values(**values))
+    await db.commit()
+
+
+async def get_unfinished_jobs(db: AsyncSession) -> list[tuple[int, str, int | None]]:
+    """(id, status, worker_pid) завдань у статусах queued та running, від найстаріших."""
+    result = await db.execute(
+        select(JobModel.id, JobModel.status, JobModel.worker_pid)
+        .filter(JobModel.status.in_(('queued', 'running')))
+        .order_by(JobModel.id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def get_grading_columns(db: AsyncSession, test_id: int) -> dict | None:
+    """
+    Зчитати колонками все, що потрібно для повторної перевірки тесту.
+
+    Returns:
+        dict | None: test (max_score, sample_size), options [(id, question_id, is_correct)],
+        questions_count, answers [(id, result_id, question_id, selected_option_id, is_correct)],
+        results [(id, score)] за зростанням id, attempt_sizes {result_id: кількість питань спроби}
+    """
+    test = (await db.execute(
+        select(TestModel.id, TestModel.max_score, TestModel.sample_size).filter(TestModel.id == test_id)
+    )).first()
+    if test is None:
+        return None
+    options = (await db.execute(
+        select(AnswerOptionModel.id, AnswerOptionModel.question_id, AnswerOptionModel.is_correct)
+        .join(QuestionModel, QuestionModel.id == AnswerOptionModel.question_id)
+        .filter(QuestionModel.test_id == test_id)
+    )).all()
+    questions_count = (await db.execute(
+        select(func.count()).select_from(QuestionModel).filter(QuestionModel.test_id == test_id)
+    )).scalar_one()
+    results = (await db.execute(
+        select(TestResultModel.id, TestResultModel.score)
+        .filter(TestResultModel.test_id == test_id)
+        .order_by(TestResultModel.id)
+    )).all()
+    answers = (await db.execute(
+        select(TestAnswerModel.id, TestAnswerModel.result_id, TestAnswerModel.question_id,
+               TestAnswerModel.selected_option_id, TestAnswerModel.is_correct)
+        .join(TestResultModel, TestResultModel.id == TestAnswerModel.result_id)
+        .filter(TestResultModel.test_id == test_id)
+    )).all()
+    attempts = (await db.execute(
+        select(TestAttemptModel.result_id, TestAttemptModel.question_ids)
+        .filter(TestAttemptModel.test_id == test_id, TestAttemptModel.result_id.is_not(None))
+    )).all()
+    return {
+        'test': test,
+        'options': options,
+        'questions_count': questions_count,
+        'results': results,
+        'answers': answers,
+        'attempt_sizes': {result_id: ids.count(',') + 1 for result_id, ids in attempts},
+    }
+
+
+async def apply_regrade(db: AsyncSession, answers: list[dict], results: list[dict]):
+    """
+    Записати нові is_correct відповідей та бали спроб (executemany, одна транзакція).
+
+    Args:
+        answers (list[dict]): {'answer_id', 'is_correct'}
+        results (list[dict]): {'result_id', 'score'}
+    """
+    await db.commit()  # запис починається з UPDATE, без застарілого snapshot читання
+    if answers:
+        await db.execute(
+            update(TestAnswerModel.__table__)
+            .where(TestAnswerModel.__table__.c.id == bindparam('answer_id'))
+            .values(is_correct=bindparam('is_correct')),
+            answers
+        )
+    if results:
+        await db.execute(
+            update(TestResultModel.__table__)
+            .where(TestResultModel.__table__.c.id == bindparam('result_id'))
+            .values(score=bindparam('score')),
+            results
+        )
+    await db.commit()
+
+
+async def bump_regrade_epoch(db: AsyncSession, test_id: int):
+    """Позначити тест повторно перевіреним: regrade_epoch = найбільший серед усіх тестів + 1."""
+    tests = TestModel.__table__.alias()
+    await db.execute(
+        update(TestModel)
+        .where(TestModel.id == test_id)
+        .values(regrade_epoch=select(func.coalesce(func.max(tests.c.regrade_epoch), 0) + 1).scalar_subquery())
+    )
+    await db.commit()
+
+
+async def cancel_queued_job(db: AsyncSession, job_id: int) -> bool:
+    """Скасувати завдання, яке ще не почало виконуватись (умовний UPDATE, як і claim_job)."""
+    result = await db.execute(
+        update(JobModel)
+        .where(JobModel.id == job_id, JobModel.status == 'queued')
+        .values(status='cancelled', finished_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def count_gradebook_rows(db: AsyncSession, course_id: int) -> int:
+    """Кількість студентів з прогресом у курсі (рядків журналу)."""
+    result = await db.execute(
+        select(func.count(func.distinct(StudentProgressModel.user_id)))
+        .filter(StudentProgressModel.course_id == course_id)
+    )
+    return result.scalar_one()
+
+
+async def get_titles(db: AsyncSession, after: dict[str, int] | None = None) -> dict[str, list[tuple[int, str]]]:
+    """
+    (id, title) усіх уроків, ресурсів, курсів і тестів - для префіксного індексу /learn/suggest.
+
+    Args:
+        after: {тип: id} - лише записи з більшим id (дочитування індексу після змін інших worker'ів)
+    """
+    models = {'lesson': LessonModel, 'resource': ResourceModel, 'course': CourseModel, 'test': TestModel}
+    titles = {}
+    for kind, model in models.items():
+        query = select(model.id, model.title)
+        if after:
+            query = query.filter(model.id > after.get(kind, 0))
+        result = await db.execute(query)
+        titles[kind] = [tuple(row) for row in result.all()]
+    return titles
+
+
+async def get_related_columns(db: AsyncSession) -> dict:
+    """
+    Зчитати колонками все, що потрібно для рекомендацій курсів.
+
+    Returns:
+        dict: courses - [(id, title)] за зростанням id,
+            course_resources - [(course_id, resource_id)],
+            enrolments - [(user_id, course_id, середня частка max_score за найкращими балами тестів курсу)]
+    """
+    courses = await db.execute(select(CourseModel.id, CourseModel.title).order_by(CourseModel.id))
+    pairs = await db.execute(
+        select(course_resources.c.course_id, course_resources.c.resource_id)
+        .filter(course_resources.c.course_id.is_not(None), course_resources.c.resource_id.is_not(None))
+    )
+    ratio = StudentProgressModel.best_score / func.coalesce(func.nullif(TestModel.max_score, 0), 100)
+    enrolments = await db.execute(
+        select(StudentProgressModel.user_id, StudentProgressModel.course_id, func.avg(ratio))
+        .join(TestModel, TestModel.id == StudentProgressModel.test_id)
+        .group_by(StudentProgressModel.user_id, StudentProgressModel.course_id)
+    )
+    return {
+        'courses': [tuple(row) for row in courses.all()],
+        'course_resources': [tuple(row) for row in pairs.all()],
+        'enrolments': [tuple(row) for row in enrolments.all()],
+    }
+
+
+async def get_answer_columns(db: AsyncSession, test_id: int) -> dict | None:
+    """
+    Відповіді всіх спроб тесту колонками - для пошуку однакових хибних відповідей.
+
+    Returns:
+        dict | None: results [(id, user_id)] за зростанням id,
+        answers [(result_id, question_id, selected_option_id, is_correct)]; None - тесту немає
+    """
+    if (await db.execute(select(TestModel.id).filter(TestModel.id == test_id))).first() is None:
+        return None
+    results = await db.execute(
+        select(TestResultModel.id, TestResultModel.user_id)
+        .filter(TestResultModel.test_id == test_id)
+        .order_by(TestResultModel.id)
+    )
+    answers = await db.execute(
+        select(TestAnswerModel.result_id, TestAnswerModel.question_id,
+               TestAnswerModel.selected_option_id, TestAnswerModel.is_correct)
+        .join(TestResultModel, TestResultModel.id == TestAnswerModel.result_id)
+        .filter(TestResultModel.test_id == test_id)
+    )
+    return {'results': [tuple(row) for row in results.all()], 'answers': [tuple(row) for row in answers.all()]}
+
+
+async def get_quiz_ids(db: AsyncSession) -> list[int]:
+    """ID усіх ресурсів Quiz за зростанням - картки інтервального повторення."""
+    result = await db.execute(select(ResourceModel.id).filter(ResourceModel.type == 'Quiz').order_by(ResourceModel.id))
+    return list(result.scalars().all())
+
+
+async def get_review_cards(db: AsyncSession, user_id: int) -> list[tuple]:
+    """
+    Картки інтервального повторення студента.
+
+    Returns:
+        list[tuple]: (resource_id, due_at, interval, ease, reps, lapses)
+    """
+    result = await db.execute(
+        select(ReviewCardModel.resource_id, ReviewCardModel.due_at, ReviewCardModel.interval,
+               ReviewCardModel.ease, ReviewCardModel.reps, ReviewCardModel.lapses)
+        .filter(ReviewCardModel.user_id == user_id)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def flush_review_cards(db: AsyncSession, rows: list[dict]):
+    """
+    Записати пакет змінених карток повторення однією транзакцією (UPSERT через executemany).
+
+    Args:
+        rows (list[dict]): {'user_id', 'resource_id', 'due_at', 'interval', 'ease', 'reps', 'lapses', 'reviewed_at'}
+    """
+    if not rows:
+        return
+    table = ReviewCardModel.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.resource_id],
+        set_={name: stmt.excluded[name] for name in ('due_at', 'interval', 'ease', 'reps', 'lapses', 'reviewed_at')}
+    )
+    await db.execute(stmt, rows)
+    await db.commit()
+
+
+async def add_course_prerequisite(db: AsyncSession, course_id: int, prerequisite_id: int) -> str:
+    """
+    Додати передумову курсу та оновити транзитивне замикання.
+
+    Кожен нащадок course_id (і сам курс) отримує всіх предків prerequisite_id (і сам
+    prerequisite_id) одним INSERT ... SELECT; при кількох шляхах зберігається найкоротший.
+
+    Returns:
+        str: added; exists - ребро вже є; cycle - prerequisite_id сам залежить від course_id
+
+    Note:
+        Перевірка циклу виконується після вставки ребра, тобто вже під writer-lock SQLite:
+        паралельне ребро у зворотний бік не пройде перевірку одночасно з цим.
+    """
+    if course_id == prerequisite_id:
+        return 'cycle'
+    edges = CoursePrerequisiteModel.__table__
+    closure = CoursePrerequisiteClosureModel.__table__
+    inserted = await db.execute(
+        sqlite_insert(edges).values(course_id=course_id, prerequisite_id=prerequisite_id).on_conflict_do_nothing()
+    )
+    if not inserted.rowcount:
+        await db.rollback()
+        return 'exists'
+    cycle = await db.execute(
+        select(closure.c.depth).filter(closure.c.course_id == prerequisite_id, closure.c.ancestor_id == course_id)
+    )
+    if cycle.first() is not None:
+        await db.rollback()
+        return 'cycle'
+
+    descendants = select(literal(course_id).label('course_id'), literal(0).label('depth')).union_all(
+        select(closure.c.course_id, closure.c.depth).filter(closure.c.ancestor_id == course_id)
+    ).subquery()
+    ancestors = select(literal(prerequisite_id).label('ancestor_id'), literal(0).label('depth')).union_all(
+        select(closure.c.ancestor_id, closure.c.depth).filter(closure.c.course_id == prerequisite_id)
+    ).subquery()
+    pairs = (
+        select(descendants.c.course_id, ancestors.c.ancestor_id, descendants.c.depth + ancestors.c.depth + 1)
+        .select_from(descendants.join(ancestors, true()))
+        .where(true())  # без WHERE SQLite не розбирає ON CONFLICT після INSERT ... SELECT
+    )
+    stmt = sqlite_insert(closure).from_select(['course_id', 'ancestor_id', 'depth'], pairs)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[closure.c.course_id, closure.c.ancestor_id],
+        set_={'depth': func.min(closure.c.depth, stmt.excluded.depth)}
+    )
+    await db.execute(stmt)
+    await db.commit()
+    return 'added'
+
+
+async def remove_course_prerequisite(db: AsyncSession, course_id: int, prerequisite_id: int) -> bool:
+    """
+    Видалити передумову курсу та перебудувати замикання course_id і його нащадків.
+
+    Returns:
+        bool: False - такого ребра немає
+
+    Note:
+        Інші шляхи між тими самими курсами можуть лишитися, тому рядки зачеплених курсів
+        виводяться заново з ребер рекурсивним CTE (лише при записі, читання - по замиканню).
+    """
+    edges = CoursePrerequisiteModel.__table__
+    closure = CoursePrerequisiteClosureModel.__table__
+    deleted = await db.execute(
+        delete(edges).where(edges.c.course_id == course_id, edges.c.prerequisite_id == prerequisite_id)
+    )
+    if not deleted.rowcount:
+        await db.rollback()
+        return False
+    descendants = await db.execute(select(closure.c.course_id).filter(closure.c.ancestor_id == course_id))
+    affected = [course_id, *descendants.scalars().all()]
+    await db.execute(delete(closure).where(closure.c.course_id.in_(affected)))
+
+    chain = (
+        select(edges.c.course_id, edges.c.prerequisite_id.label('ancestor_id'), literal(1).label('depth'))
+        .filter(edges.c.course_id.in_(affected))
+        .cte('chain', recursive=True)
+    )
+    chain = chain.union(
+        select(chain.c.course_id, edges.c.prerequisite_id, chain.c.depth + 1)
+        .join(edges, edges.c.course_id == chain.c.ancestor_id)
+    )
+    await db.execute(insert(closure).from_select(
+        ['course_id', 'ancestor_id', 'depth'],
+        select(chain.c.course_id, chain.c.ancestor_id, func.min(chain.c.depth))
+        .group_by(chain.c.course_id, chain.c.ancestor_id)
+    ))
+    await db.commit()
+    return True
+
+
+async def get_course_prerequisites(db: AsyncSession, course_id: int, user_id: int,
+                                   pass_score: float) -> list[tuple[int, str, int, bool]]:
+    """
+    Повний ланцюжок передумов курсу з позначкою, чи завершив їх студент.
+
+    Один запит по замиканню (course_prerequisite_closure) без рекурсії. Передумова
+    завершена, якщо в кожному її тесті найкращий бал студента (student_progress) -
+    щонайменше pass_score від max_score; курс без тестів вважається завершеним.
+
+    Returns:
+        list[tuple]: (course_id, title, depth, completed), найвіддаленіші передумови першими
+    """
+    closure = CoursePrerequisiteClosureModel.__table__
+    progress = StudentProgressModel
+    unmet = (
+        select(TestModel.id)
+        .outerjoin(progress, and_(progress.user_id == user_id, progress.course_id == TestModel.course_id,
+                                  progress.test_id == TestModel.id))
+        .where(
+            TestModel.course_id == closure.c.ancestor_id,
+            or_(progress.best_score.is_(None),
+                progress.best_score < pass_score * func.coalesce(func.nullif(TestModel.max_score, 0), 100))
+        )
+        .exists()
+    )
+    statement = (
+        select(closure.c.ancestor_id, CourseModel.title, closure.c.depth, ~unmet)
+        .join(CourseModel, CourseModel.id == closure.c.ancestor_id)
+        .filter(closure.c.course_id == course_id)
+        .order_by(closure.c.depth.desc(), closure.c.ancestor_id)
+    )
+    return [tuple(row) for row in await _read(db, _rows, statement)]
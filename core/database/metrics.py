@@ -0,0 +1,259 @@
+import logging
+import os
+import sqlite3
+import time
+from bisect import bisect_left
+from collections import deque
+from functools import partial
+from typing import Optional
+import aiosqlite
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger('uvicorn.error')
+
+# Поріг сповіщення про довгу транзакцію запису (writer-lock утримується довше), мс
+DB_SLOW_WRITE_MS = float(os.getenv('DB_SLOW_WRITE_MS', '250'))
+# Перший запис транзакції, довший за це, вважається очікуванням writer-lock:
+# busy handler SQLite між повторами спить щонайменше 1 мс
+BUSY_WAIT_MS = 1.0
+# Верхні межі кошиків гістограм, мс
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Метрики всіх engine за назвою (для /admin/db-metrics та дашборду)
+db_metrics: dict = {}
+
+
+class LatencyHistogram:
+    """Гістограма затримок з фіксованими кошиками; перцентиль - верхня межа кошика."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else round(self.max, 3)
+        return round(self.max, 3)
+
+    def report(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 3) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max, 3),
+        }
+
+
+def _statement(function: partial) -> Optional[str]:
+    sql = function.args[0] if function.args and isinstance(function.args[0], str) else None
+    return ' '.join(sql.split())[:200] if sql else None
+
+
+def _in_transaction(connection: sqlite3.Connection) -> bool:
+    try:
+        return connection.in_transaction
+    except sqlite3.ProgrammingError:  # з'єднання щойно закрите
+        return False
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, що рахує очікування з'єднання (metrics задає EngineMetrics.engine_options)."""
+    metrics: 'EngineMetrics'
+
+    def _do_get(self):
+        metrics = self.metrics
+        metrics.waiting += 1
+        metrics.peak_waiting = max(metrics.peak_waiting, metrics.waiting)
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.waiting -= 1
+            metrics.checkouts += 1
+            metrics.checkout_wait.observe(time.perf_counter() - started)
+            metrics.peak_in_use = max(metrics.peak_in_use, self.checkedout())
+
+
+class TimedConnection(aiosqlite.Connection):
+    """
+    aiosqlite-з'єднання, що міряє кожен виклик у своєму потоці.
+
+    Час від постановки в чергу до початку виконання та від завершення до
+    повернення в event loop - це "перехід між потоками", решта - робота SQLite.
+    Момент, коли sqlite3.Connection.in_transaction стає True, - перший запис
+    транзакції (implicit BEGIN перед INSERT/UPDATE/DELETE), тобто захоплення
+    writer-lock; коли знову False - commit/rollback і звільнення lock.
+    """
+
+    def __init__(self, metrics: 'EngineMetrics', connector):
+        super().__init__(connector, 64)
+        self.metrics = metrics
+        self.write_started: Optional[float] = None
+        self.write_statement: Optional[str] = None
+
+    async def _execute(self, fn, *args, **kwargs):
+        function = partial(fn, *args, **kwargs)
+        timing = []
+
+        def timed():
+            connection = self._connection
+            before = _in_transaction(connection)
+            started = time.perf_counter()
+            try:
+                return function()
+            finally:
+                timing.append((started, time.perf_counter(), before, _in_transaction(connection)))
+
+        queued = time.perf_counter()
+        try:
+            return await super()._execute(timed)
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                self.metrics.busy_errors += 1
+            raise
+        finally:
+            if timing:
+                self.metrics.observe_call(self, queued, *timing[0], time.perf_counter(), function)
+
+
+class EngineMetrics:
+    """
+    Метрики одного engine: пул, перехід у потік aiosqlite, транзакції, writer-lock.
+
+    Усі лічильники оновлюються в event loop (після повернення з потоку aiosqlite),
+    тому не потребують блокувань.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.checkouts = 0
+        self.connects = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.peak_in_use = 0
+        self.checkout_wait = LatencyHistogram()
+        self.thread_hop = LatencyHistogram()
+        self.thread_exec = LatencyHistogram()
+        self.transaction = LatencyHistogram()
+        self.write_lock_wait = LatencyHistogram()
+        self.write_lock_held = LatencyHistogram()
+        self.busy_waits = 0
+        self.busy_errors = 0
+        self.slow_writes = 0
+        self.recent_slow_writes = deque(maxlen=20)
+        db_metrics[name] = self
+
+    def engine_options(self, url: str) -> dict:
+        """
+        Аргументи create_async_engine для інструментованого engine.
+
+        Для файлової SQLite через aiosqlite - власний async_creator (TimedConnection з
+        тими ж аргументами sqlite3.connect, що й у діалекту) та InstrumentedQueuePool;
+        для інших URL - порожній dict (збираються лише метрики транзакцій).
+        """
+        url = make_url(url)
+        if url.get_driver_name() != 'aiosqlite' or url.database in (None, '', ':memory:'):
+            return {}
+        args, kwargs = url.get_dialect()().create_connect_args(url)
+
+        async def connect():
+            return await TimedConnection(self, partial(sqlite3.connect, *args, **kwargs))
+
+        return {
+            'async_creator': connect,
+            'poolclass': type('InstrumentedQueuePool', (InstrumentedQueuePool,), {'metrics': self}),
+        }
+
+    def bind(self, engine):
+        """Підписатись на події пулу та транзакцій engine (AsyncEngine або синхронного)."""
+        self.engine = engine
+        sync_engine = getattr(engine, 'sync_engine', engine)
+
+        @event.listens_for(sync_engine, 'connect')
+        def _connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        @event.listens_for(sync_engine, 'begin')
+        def _begin(conn):
+            conn.info['tx_started'] = time.perf_counter()
+
+        @event.listens_for(sync_engine, 'commit')
+        @event.listens_for(sync_engine, 'rollback')
+        def _end(conn):
+            started = conn.info.pop('tx_started', None)
+            if started is not None:
+                self.transaction.observe(time.perf_counter() - started)
+
+    def observe_call(self, connection: TimedConnection, queued: float, started: float, finished: float,
+                     in_tx_before: bool, in_tx_after: bool, done: float, function: partial):
+        self.thread_hop.observe((started - queued) + (done - finished))
+        self.thread_exec.observe(finished - started)
+        if not in_tx_before and in_tx_after:
+            connection.write_started = finished  # lock захоплено - далі лише утримання
+            connection.write_statement = _statement(function)
+            self.write_lock_wait.observe(finished - started)
+            if (finished - started) * 1000 >= BUSY_WAIT_MS:
+                self.busy_waits += 1
+        elif in_tx_before and not in_tx_after and connection.write_started is not None:
+            held = finished - connection.write_started
+            self.write_lock_held.observe(held)
+            if held * 1000 >= DB_SLOW_WRITE_MS:
+                self.slow_writes += 1
+                self.recent_slow_writes.append({
+                    'at': time.time(),
+                    'held_ms': round(held * 1000, 1),
+                    'statement': connection.write_statement,
+                })
+                logger.warning('Slow write transaction on %s: writer lock held %.0f ms (first write: %s)',
+                               self.name, held * 1000, connection.write_statement)
+            connection.write_started = None
+
+    def report(self) -> dict:
+        pool = getattr(self.engine, 'sync_engine', self.engine).pool if self.engine is not None else None
+        return {
+            'pool': {
+                'size': pool.size() if hasattr(pool, 'size') else None,
+                'in_use': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+                'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+                'waiting': self.waiting,
+                'peak_in_use': self.peak_in_use,
+                'peak_waiting': self.peak_waiting,
+                'checkouts': self.checkouts,
+                'connects': self.connects,
+            },
+            'checkout_wait': self.checkout_wait.report(),
+            'thread_hop': self.thread_hop.report(),
+            'thread_exec': self.thread_exec.report(),
+            'transaction': self.transaction.report(),
+            'write_lock_wait': self.write_lock_wait.report(),
+            'write_lock_held': self.write_lock_held.report(),
+            'busy_waits': self.busy_waits,
+            'busy_errors': self.busy_errors,
+            'slow_writes': self.slow_writes,
+            'slow_write_threshold_ms': DB_SLOW_WRITE_MS,
+            'recent_slow_writes': list(self.recent_slow_writes),
+        }
+
+
+def report() -> dict:
+    return {name: metrics.report() for name, metrics in db_metrics.items()}
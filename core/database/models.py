@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Table, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Table, ForeignKey, Boolean, Float, DateTime
 from sqlalchemy.orm import relationship
-from core.database.db import Base
+from core.database.db import Base, RESULTS_SCHEMA
 
 course_resources = Table(
     "course_resources",
@@ -50,6 +50,24 @@ class CourseModel(Base):
     )
 
 
+class CoursePrerequisiteModel(Base):
+    """Пряма передумова: course_id можна проходити після завершення prerequisite_id (ребро DAG)."""
+    __tablename__ = 'course_prerequisites'
+    course_id = Column(Integer, ForeignKey('courses.id'), primary_key=True)
+    prerequisite_id = Column(Integer, ForeignKey('courses.id'), primary_key=True)
+
+
+class CoursePrerequisiteClosureModel(Base):
+    """
+    Транзитивне замикання course_prerequisites: ancestor_id - пряма чи непряма передумова
+    course_id, depth - довжина найкоротшого ланцюжка. Оновлюється разом з ребрами.
+    """
+    __tablename__ = 'course_prerequisite_closure'
+    course_id = Column(Integer, ForeignKey('courses.id'), primary_key=True)
+    ancestor_id = Column(Integer, ForeignKey('courses.id'), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)
+
+
 class StatisticsModel(Base):
     __tablename__ = 'statistics'
     id = Column(Integer, primary_key=True, default=1)
@@ -66,7 +84,12 @@ class TestModel(Base):
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
     max_score = Column(Integer, default=100)
-    course_id = Column(Integer, ForeignKey('courses.id'))
+    course_id = Column(Integer, ForeignKey('courses.id'), index=True)
+    # Якщо задано - тест є банком питань: кожна спроба отримує sample_size випадкових питань
+    sample_size = Column(Integer, nullable=True)
+    # Номер останньої повторної перевірки (спільна для всіх тестів послідовність) - за ним інші worker'и
+    # дізнаються, що кеші тесту треба перебудувати
+    regrade_epoch = Column(Integer, nullable=True, index=True)
     course = relationship(
         'CourseModel',
         backref='tests',
@@ -77,7 +100,8 @@ class QuestionModel(Base):
     __tablename__ = 'questions'
     id = Column(Integer, primary_key=True, index=True)
     text = Column(String, nullable=False)
-    test_id = Column(Integer, ForeignKey('tests.id'))
+    test_id = Column(Integer, ForeignKey('tests.id'), index=True)
+    difficulty = Column(String, nullable=True)
     test = relationship(
         'TestModel',
         backref='questions',
@@ -98,11 +122,94 @@ class AnswerOptionModel(Base):
 
 class TestResultModel(Base):
     __tablename__ = 'test_results'
+    __table_args__ = {'schema': RESULTS_SCHEMA}
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'))
-    test_id = Column(Integer, ForeignKey('tests.id'))
+    test_id = Column(Integer, ForeignKey('tests.id'), index=True)
     score = Column(Integer)
     test = relationship(
         'TestModel',
         backref='results',
-        lazy="selectin")
\ No newline at end of file
+        lazy="selectin")
+    answers = relationship(
+        'TestAnswerModel',
+        backref='result',
+        lazy="selectin")
+
+
+class TestAnswerModel(Base):
+    __tablename__ = 'test_answers'
+    __table_args__ = {'schema': RESULTS_SCHEMA}
+    id = Column(Integer, primary_key=True, index=True)
+    result_id = Column(Integer, ForeignKey(f'{RESULTS_SCHEMA}.test_results.id'), index=True)
+    question_id = Column(Integer, ForeignKey('questions.id'))
+    selected_option_id = Column(Integer, ForeignKey('answer_options.id'))
+    is_correct = Column(Boolean, default=False)
+
+
+class StudentProgressModel(Base):
+    __tablename__ = 'student_progress'
+    __table_args__ = {'schema': RESULTS_SCHEMA}
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    course_id = Column(Integer, ForeignKey('courses.id'), primary_key=True)
+    test_id = Column(Integer, ForeignKey('tests.id'), primary_key=True)
+    best_score = Column(Float, default=0)
+    attempts = Column(Integer, default=0)
+    last_result_id = Column(Integer)
+    last_attempt_at = Column(DateTime, nullable=True)
+
+
+class TestDraftModel(Base):
+    __tablename__ = 'test_drafts'
+    __table_args__ = {'schema': RESULTS_SCHEMA}
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    test_id = Column(Integer, ForeignKey('tests.id'), primary_key=True)
+    question_id = Column(Integer, ForeignKey('questions.id'), primary_key=True)
+    selected_option_id = Column(Integer, ForeignKey('answer_options.id'))
+    updated_at = Column(DateTime, nullable=True)
+
+
+class TestAttemptModel(Base):
+    """Спроба тесту-банку: зберігаються лише seed та вибрані question_id (через кому)."""
+    __tablename__ = 'test_attempts'
+    __table_args__ = {'schema': RESULTS_SCHEMA}
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    test_id = Column(Integer, ForeignKey('tests.id'))
+    seed = Column(Integer, nullable=False)
+    question_ids = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    submitted_at = Column(DateTime, nullable=True)
+    result_id = Column(Integer, nullable=True)
+
+
+class ReviewCardModel(Base):
+    """Картка інтервального повторення (Quiz) студента: стан SM-2 та час наступного повторення."""
+    __tablename__ = 'review_cards'
+    __table_args__ = {'schema': RESULTS_SCHEMA}
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    resource_id = Column(Integer, ForeignKey('resources.id'), primary_key=True)
+    due_at = Column(DateTime, nullable=False)
+    interval = Column(Float, default=0)
+    ease = Column(Float, default=2.5)
+    reps = Column(Integer, default=0)
+    lapses = Column(Integer, default=0)
+    reviewed_at = Column(DateTime, nullable=True)
+
+
+class JobModel(Base):
+    """Фонове завдання JobRunner: параметри, стан і результат (JSON-текст)."""
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, default='queued', index=True)
+    progress = Column(Float, default=0)
+    message = Column(String, nullable=True)
+    params = Column(String, nullable=True)
+    result = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
+    worker_pid = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,188 @@
+import secrets
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from core.database import db_func
+from core.database.db import async_session_maker
+from core.utils.singleflight import flights
+
+# Рівень складності для питань без difficulty
+UNRATED = ''
+
+
+def allocate(sizes: np.ndarray, n: int) -> np.ndarray:
+    """
+    Розподілити n питань між стратами пропорційно їхнім розмірам.
+
+    Метод найбільших залишків: кожна страта отримує floor(n * size / total),
+    а решта питань віддається стратам з найбільшою дробовою частиною.
+    """
+    total = int(sizes.sum())
+    n = min(n, total)
+    quotas = sizes * n / total
+    counts = np.floor(quotas).astype(np.int64)
+    rest = n - int(counts.sum())
+    if rest:
+        # Стабільне сортування: при рівних залишках - страта з меншим індексом
+        order = np.argsort(counts - quotas, kind='stable')
+        counts[order[:rest]] += 1
+    return counts
+
+
+class QuestionBank:
+    """
+    Індекс питань одного тесту-банку, згрупованих за складністю.
+
+    ids - масив question_id, відсортований за стратою (далі за id), offsets -
+    межі страт у ньому: питання страти i лежать в ids[offsets[i]:offsets[i + 1]].
+    Вибірка спроби не потребує ні запитів, ні ORDER BY RANDOM() по таблиці.
+    """
+    __slots__ = ('test_id', 'course_id', 'max_score', 'sample_size', 'strata', 'ids', 'offsets')
+
+    def __init__(self, test, rows):
+        self.test_id = test.id
+        self.course_id = test.course_id
+        self.max_score = test.max_score
+        self.sample_size = test.sample_size
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        levels = np.array([r[1] or UNRATED for r in rows], dtype=str)
+        self.strata, codes = np.unique(levels, return_inverse=True)
+        order = np.lexsort((ids, codes))
+        self.ids = ids[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.strata)))])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def draw(self, seed: int, n: Optional[int] = None) -> list[int]:
+        """
+        Вибрати n питань без повторів, стратифіковано за складністю.
+
+        Args:
+            seed: seed генератора - та сама пара (seed, банк) дає ту саму вибірку
+            n: розмір спроби (за замовчуванням sample_size тесту, без нього - весь банк)
+
+        Note:
+            Generator.choice без повернення для малих n відносно страти працює
+            за O(n) (алгоритм Флойда), тому вартість не залежить від розміру банку.
+        """
+        if not len(self.ids):
+            return []
+        n = n or self.sample_size or len(self.ids)
+        rng = np.random.default_rng(seed)
+        counts = allocate(self.sizes(), n)
+        picks = [
+            self.offsets[i] + rng.choice(int(self.offsets[i + 1] - self.offsets[i]), int(k), replace=False)
+            for i, k in enumerate(counts) if k
+        ]
+        sample = self.ids[np.concatenate(picks)]
+        rng.shuffle(sample)  # щоб питання не йшли блоками за складністю
+        return sample.tolist()
+
+    def version(self) -> tuple[int, Optional[int]]:
+        """(кількість питань, найбільший id) - див. db_func.get_bank_versions."""
+        return len(self.ids), int(self.ids.max()) if len(self.ids) else None
+
+    def summary(self) -> dict:
+        return {
+            'test_id': self.test_id,
+            'questions_count': len(self.ids),
+            'sample_size': self.sample_size,
+            'strata': {str(name): int(size) for name, size in zip(self.strata, self.sizes())},
+        }
+
+
+@dataclass
+class SampledTest:
+    """
+    Тест у межах однієї спроби: лише вибрані питання.
+
+    Має ті самі поля, що використовують save_test_result та підписники ResultsFeed
+    (id, course_id, max_score, questions), тому оцінювання та аналітика
+    працюють без змін.
+    """
+    id: int
+    course_id: int
+    max_score: int
+    questions: list
+
+
+class QuestionBankEngine:
+    """
+    Кеш індексів банків питань (singleton).
+
+    Індекс банку будується при першій спробі (одночасні перші спроби
+    об'єднуються в один запит) і скидається, коли викладач додає питання.
+
+    Note:
+        Кеш - в межах процесу. При WORKERS > 1 питання, додані іншим worker'ом
+        (add_bank_questions, bank_import), знаходить refresh, підписаний на
+        зміни основної БД (DataVersionWatcher).
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._banks = {}
+            cls._instance.attempts = 0
+        return cls._instance
+
+    async def get(self, db, test_id: int) -> Optional[QuestionBank]:
+        """Індекс банку з кешу або з БД; None, якщо тесту не існує."""
+        bank = self._banks.get(test_id)
+        if bank is None:
+            bank = await flights.do('question_bank', ('question_bank', test_id), lambda: self._load(db, test_id))
+        return bank
+
+    async def _load(self, db, test_id: int) -> Optional[QuestionBank]:
+        columns = await db_func.get_bank_columns(db, test_id)
+        if columns is None:
+            return None
+        bank = self._banks[test_id] = QuestionBank(*columns)
+        return bank
+
+    def invalidate(self, test_id: int):
+        self._banks.pop(test_id, None)
+
+    async def refresh(self):
+        """Скинути закешовані банки, у які додано питання з іншого процесу."""
+        if not self._banks:
+            return
+        async with async_session_maker() as db:
+            versions = await db_func.get_bank_versions(db, list(self._banks))
+        for test_id, bank in list(self._banks.items()):
+            if versions.get(test_id, (0, None)) != bank.version():
+                self.invalidate(test_id)
+
+    def draw(self, bank: QuestionBank) -> tuple[int, list[int]]:
+        """
+        Вибрати питання для нової спроби.
+
+        Returns:
+            tuple: (seed, question_ids) - саме це зберігається в test_attempts
+        """
+        seed = secrets.randbits(63)  # вміщується в INTEGER SQLite
+        self.attempts += 1
+        return seed, bank.draw(seed)
+
+    def stats(self) -> dict:
+        return {
+            'banks': len(self._banks),
+            'questions': sum(len(b) for b in self._banks.values()),
+            'index_bytes': sum(b.ids.nbytes + b.offsets.nbytes for b in self._banks.values()),
+            'attempts': self.attempts,
+        }
+
+
+question_banks: Optional[QuestionBankEngine] = None
+
+
+def get_question_banks() -> QuestionBankEngine:
+    global question_banks
+    if question_banks is None:
+        question_banks = QuestionBankEngine()
+    return question_banks
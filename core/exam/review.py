@@ -0,0 +1,424 @@
+import asyncio
+import logging
+import os
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+from core.database import db_func
+from core.database.db import async_session_maker
+
+logger = logging.getLogger('uvicorn.error')
+
+# Як часто змінені картки записуються в review_cards (секунди)
+REVIEW_FLUSH_INTERVAL = float(os.getenv('REVIEW_FLUSH_INTERVAL', '5.0'))
+# Скільки колод студентів тримається в пам'яті (решта завантажується з БД при зверненні)
+REVIEW_MAX_USERS = int(os.getenv('REVIEW_MAX_USERS', '10000'))
+# Колода без звернень довше за цей час вивантажується
+REVIEW_USER_TTL = 60 * 60
+
+# SM-2: початковий і мінімальний коефіцієнт легкості, оцінки 0-5 (менше PASS_GRADE - не згадав)
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+PASS_GRADE = 3
+DAY = 24 * 60 * 60
+# Забуту картку показати знову через стільки секунд
+RELEARN_DELAY = 10 * 60
+
+
+def schedule(grade: int, interval: float, ease: float, reps: int, lapses: int) -> tuple[float, float, int, int, int]:
+    """
+    Наступний стан картки за алгоритмом SM-2.
+
+    Args:
+        grade: оцінка відповіді 0-5
+        interval: поточний інтервал, дні
+
+    Returns:
+        tuple: (interval, ease, reps, lapses, затримка до наступного повторення в секундах)
+    """
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    if grade < PASS_GRADE:
+        return 0.0, ease, 0, lapses + 1, RELEARN_DELAY
+    reps += 1
+    interval = 1.0 if reps == 1 else 6.0 if reps == 2 else round(interval * ease, 2)
+    return interval, ease, reps, lapses, int(interval * DAY)
+
+
+def _epoch(value: datetime) -> int:
+    # SQLite повертає datetime без часової зони - час зберігається в UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class ReviewDeck:
+    """
+    Картки одного студента: стан SM-2 у масивах array за номером картки (slot)
+    та двійкова купа (due, slot) за часом наступного повторення.
+
+    pos[slot] - позиція картки в купі, тому зміна due будь-якої картки - це
+    просіювання O(log n). Картка займає близько 40 байтів замість кількох сотень
+    для dict/tuple. Нові (ще не бачені) картки в купі не лежать: це Quiz, яких
+    немає в колоді, по порядку id (new_pos - скільки з них уже пройдено).
+
+    index_ids/index_slots - відсортовані resource_id та їхні slot: пошук картки
+    за resource_id (slot_of, next_new) - bisect O(log n), а не перебір resources.
+    """
+    __slots__ = ('user_id', 'resources', 'interval', 'ease', 'reps', 'lapses',
+                 'heap_due', 'heap_slot', 'pos', 'index_ids', 'index_slots', 'new_pos', 'dirty', 'updated')
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.resources = array('i')
+        self.interval = array('f')
+        self.ease = array('f')
+        self.reps = array('H')
+        self.lapses = array('H')
+        self.heap_due = array('q')
+        self.heap_slot = array('i')
+        self.pos = array('i')
+        self.index_ids = array('i')
+        self.index_slots = array('i')
+        self.new_pos = 0
+        self.dirty: set[int] = set()
+        self.updated = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.resources)
+
+    def add(self, resource_id: int, due: int, interval: float = 0.0, ease: float = INITIAL_EASE,
+            reps: int = 0, lapses: int = 0) -> int:
+        slot = len(self.resources)
+        self.resources.append(resource_id)
+        self.interval.append(interval)
+        self.ease.append(ease)
+        self.reps.append(min(reps, 0xFFFF))
+        self.lapses.append(min(lapses, 0xFFFF))
+        self.heap_due.append(due)
+        self.heap_slot.append(slot)
+        self.pos.append(slot)
+        self._sift_up(slot)
+        i = bisect_left(self.index_ids, resource_id)
+        self.index_ids.insert(i, resource_id)
+        self.index_slots.insert(i, slot)
+        return slot
+
+    def load(self, cards: list[tuple[int, int, float, float, int, int]]):
+        """Заповнити порожню колоду: (resource_id, due, interval, ease, reps, lapses)."""
+        # Масив, відсортований за due, уже є купою - без просіювання кожної картки
+        cards = sorted(cards, key=lambda card: card[1])
+        self.resources = array('i', [card[0] for card in cards])
+        self.heap_due = array('q', [card[1] for card in cards])
+        self.interval = array('f', [card[2] for card in cards])
+        self.ease = array('f', [card[3] for card in cards])
+        self.reps = array('H', [min(card[4], 0xFFFF) for card in cards])
+        self.lapses = array('H', [min(card[5], 0xFFFF) for card in cards])
+        self.heap_slot = array('i', range(len(cards)))
+        self.pos = array('i', range(len(cards)))
+        order = sorted(range(len(cards)), key=self.resources.__getitem__)
+        self.index_ids = array('i', [self.resources[slot] for slot in order])
+        self.index_slots = array('i', order)
+
+    def slot_of(self, resource_id: int) -> Optional[int]:
+        i = bisect_left(self.index_ids, resource_id)
+        if i < len(self.index_ids) and self.index_ids[i] == resource_id:
+            return self.index_slots[i]
+        return None
+
+    def peek(self) -> Optional[tuple[int, int]]:
+        """(due, slot) картки з найменшим due; None - колода порожня."""
+        return (self.heap_due[0], self.heap_slot[0]) if self.heap_due else None
+
+    def due(self, slot: int) -> int:
+        return self.heap_due[self.pos[slot]]
+
+    def reschedule(self, slot: int, due: int):
+        i = self.pos[slot]
+        old, self.heap_due[i] = self.heap_due[i], due
+        if due < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def _place(self, i: int, due: int, slot: int):
+        self.heap_due[i] = due
+        self.heap_slot[i] = slot
+        self.pos[slot] = i
+
+    def _sift_up(self, i: int):
+        due, slot = self.heap_due[i], self.heap_slot[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if self.heap_due[parent] <= due:
+                break
+            self._place(i, self.heap_due[parent], self.heap_slot[parent])
+            i = parent
+        self._place(i, due, slot)
+
+    def _sift_down(self, i: int):
+        heap_due, n = self.heap_due, len(self.heap_due)
+        due, slot = heap_due[i], self.heap_slot[i]
+        while (child := 2 * i + 1) < n:
+            if child + 1 < n and heap_due[child + 1] < heap_due[child]:
+                child += 1
+            if heap_due[child] >= due:
+                break
+            self._place(i, heap_due[child], self.heap_slot[child])
+            i = child
+        self._place(i, due, slot)
+
+    def next_new(self, quiz_ids: array) -> Optional[int]:
+        """Перший Quiz (за id), якого ще немає в колоді."""
+        while self.new_pos < len(quiz_ids) and self.slot_of(quiz_ids[self.new_pos]) is not None:
+            self.new_pos += 1
+        return quiz_ids[self.new_pos] if self.new_pos < len(quiz_ids) else None
+
+    def state(self, slot: int) -> dict:
+        return {
+            'resource_id': self.resources[slot],
+            'due_at': datetime.fromtimestamp(self.due(slot), timezone.utc),
+            'interval': round(self.interval[slot], 2),
+            'ease': round(self.ease[slot], 2),
+            'reps': self.reps[slot],
+            'lapses': self.lapses[slot],
+        }
+
+    def take_dirty(self) -> list[dict]:
+        rows = [{'user_id': self.user_id, **self.state(slot)} for slot in self.dirty]
+        self.dirty = set()
+        return rows
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.resources, self.interval, self.ease, self.reps, self.lapses,
+                  self.heap_due, self.heap_slot, self.pos, self.index_ids, self.index_slots)
+        return sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+
+
+class ReviewScheduler:
+    """
+    Інтервальне повторення ресурсів Quiz (singleton).
+
+    Колода студента завантажується з review_cards при першому зверненні і далі
+    живе в пам'яті; "наступна картка" - вершина купи (O(1)), оцінка - SM-2 і
+    просіювання (O(log n)). Змінені картки записуються в review_cards фоновим
+    завданням раз на REVIEW_FLUSH_INTERVAL однією транзакцією. Колоди
+    впорядковані за останнім зверненням: неактивні довше REVIEW_USER_TTL та
+    зайві понад REVIEW_MAX_USERS вивантажуються, тому пам'ять обмежена
+    активними студентами, а не кількістю пар (студент, Quiz) у БД.
+
+    Note:
+        Як і чернетки тестів - у межах процесу. При WORKERS > 1 (shared) запити
+        студента потрапляють у різні worker'и, тому колода перечитується з
+        review_cards на кожен запит, а оцінка записується одразу (save); нові
+        Quiz інших worker'ів підхоплює refresh_quizzes (DataVersionWatcher).
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.quiz_ids = array('i')
+            cls._instance._decks = OrderedDict()
+            cls._instance._pending = []
+            cls._instance._task = None
+            cls._instance.shared = False
+            cls._instance.max_users = REVIEW_MAX_USERS
+            cls._instance.ttl = REVIEW_USER_TTL
+            cls._instance.loads = 0
+            cls._instance.evictions = 0
+            cls._instance.reviews = 0
+            cls._instance.flushes = 0
+            cls._instance.rows_flushed = 0
+        return cls._instance
+
+    @classmethod
+    async def init(cls):
+        instance = cls()
+        async with async_session_maker() as db:
+            instance.quiz_ids = array('i', await db_func.get_quiz_ids(db))
+        return instance
+
+    def add_quiz(self, resource_id: int):
+        """Новий Quiz (teacher-роут) стає новою карткою для всіх студентів."""
+        i = bisect_left(self.quiz_ids, resource_id)
+        if i == len(self.quiz_ids) or self.quiz_ids[i] != resource_id:
+            insort(self.quiz_ids, resource_id)
+            for deck in self._decks.values():
+                deck.new_pos = min(deck.new_pos, i)
+
+    async def refresh_quizzes(self):
+        """Перечитати список Quiz (нові могли додати через інший worker)."""
+        async with async_session_maker() as db:
+            quiz_ids = array('i', await db_func.get_quiz_ids(db))
+        if quiz_ids != self.quiz_ids:
+            self.quiz_ids = quiz_ids
+            for deck in self._decks.values():
+                deck.new_pos = 0
+
+    def is_quiz(self, resource_id: int) -> bool:
+        i = bisect_left(self.quiz_ids, resource_id)
+        return i < len(self.quiz_ids) and self.quiz_ids[i] == resource_id
+
+    async def deck(self, db, user_id: int) -> ReviewDeck:
+        """Колода з пам'яті або з review_cards (при shared - завжди з review_cards)."""
+        if self.shared:
+            # Оцінки могли прийти через інший worker
+            self._decks.pop(user_id, None)
+        deck = self._decks.get(user_id)
+        if deck is not None:
+            self._decks.move_to_end(user_id)
+            deck.updated = time.monotonic()
+            return deck
+
+        cards = {row[0]: row[1:] for row in await db_func.get_review_cards(db, user_id)}
+        # Картки витісненої колоди, що ще чекають flush, новіші за БД
+        for row in self._pending:
+            if row['user_id'] == user_id:
+                cards[row['resource_id']] = (row['due_at'], row['interval'], row['ease'], row['reps'], row['lapses'])
+        # Поки чекали на БД, колоду могли завантажити паралельно
+        deck = self._decks.get(user_id)
+        if deck is None:
+            deck = self._decks[user_id] = ReviewDeck(user_id)
+            deck.load([(resource_id, _epoch(due_at), interval, ease, reps, lapses)
+                       for resource_id, (due_at, interval, ease, reps, lapses) in cards.items()])
+            self.loads += 1
+        self._evict()
+        return deck
+
+    def next(self, deck: ReviewDeck, now: Optional[float] = None) -> tuple[Optional[int], bool, Optional[datetime]]:
+        """
+        Наступна картка: найдавніше прострочена, інакше нова.
+
+        Returns:
+            tuple: (resource_id або None, чи картка нова, коли настане найближче повторення)
+        """
+        now = time.time() if now is None else now
+        top = deck.peek()
+        if top is not None and top[0] <= now:
+            return deck.resources[top[1]], False, datetime.fromtimestamp(top[0], timezone.utc)
+        new = deck.next_new(self.quiz_ids)
+        next_due = datetime.fromtimestamp(top[0], timezone.utc) if top is not None else None
+        return new, new is not None, next_due
+
+    def review(self, deck: ReviewDeck, resource_id: int, grade: int, now: Optional[float] = None) -> dict:
+        """Оцінити відповідь на картку (нова картка додається в колоду) і запланувати наступне повторення."""
+        now = int(time.time() if now is None else now)
+        slot = deck.slot_of(resource_id)
+        if slot is None:
+            slot = deck.add(resource_id, now)
+        interval, ease, reps, lapses, delay = schedule(
+            grade, deck.interval[slot], deck.ease[slot], deck.reps[slot], deck.lapses[slot]
+        )
+        deck.interval[slot] = interval
+        deck.ease[slot] = ease
+        deck.reps[slot] = min(reps, 0xFFFF)
+        deck.lapses[slot] = min(lapses, 0xFFFF)
+        deck.reschedule(slot, now + delay)
+        deck.dirty.add(slot)
+        self.reviews += 1
+        return deck.state(slot)
+
+    async def save(self, deck: ReviewDeck):
+        """При shared - записати змінені картки колоди в review_cards до відповіді клієнту."""
+        if not self.shared or not deck.dirty:
+            return
+        slots = set(deck.dirty)
+        rows = deck.take_dirty()
+        reviewed_at = datetime.now(timezone.utc)
+        try:
+            async with async_session_maker() as db:
+                await db_func.flush_review_cards(db, [{**row, 'reviewed_at': reviewed_at} for row in rows])
+        except Exception:
+            deck.dirty |= slots  # допише фоновий flush
+            raise
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._decks:
+            user_id, deck = next(iter(self._decks.items()))
+            if len(self._decks) <= self.max_users and now - deck.updated < self.ttl:
+                break
+            del self._decks[user_id]
+            self.evictions += 1
+            if deck.dirty:
+                self._pending.extend(deck.take_dirty())
+
+    async def flush(self) -> int:
+        """Записати всі змінені картки."""
+        rows, self._pending = self._pending, []
+        for deck in self._decks.values():
+            if deck.dirty:
+                rows.extend(deck.take_dirty())
+        if not rows:
+            return 0
+        reviewed_at = datetime.now(timezone.utc)
+        try:
+            async with async_session_maker() as db:
+                await db_func.flush_review_cards(db, [{**row, 'reviewed_at': reviewed_at} for row in rows])
+        except Exception:
+            # Повернути пачку - запишеться наступним flush
+            self._pending = rows + self._pending
+            raise
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+        return len(rows)
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._evict()
+                await self.flush()
+            except Exception:
+                logger.exception('Review cards flush failed')
+
+    def start(self, interval: float = REVIEW_FLUSH_INTERVAL):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        """Зупинити фоновий flush і записати залишок."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception('Final review cards flush failed')
+
+    def stats(self) -> dict:
+        return {
+            'quizzes': len(self.quiz_ids),
+            'shared': self.shared,
+            'users': len(self._decks),
+            'max_users': self.max_users,
+            'cards': sum(len(d) for d in self._decks.values()),
+            'bytes': sum(d.nbytes for d in self._decks.values()),
+            'dirty_cards': sum(len(d.dirty) for d in self._decks.values()) + len(self._pending),
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'reviews': self.reviews,
+            'flushes': self.flushes,
+            'rows_flushed': self.rows_flushed,
+        }
+
+
+review_scheduler: Optional[ReviewScheduler] = None
+
+
+async def get_review_scheduler(shared: bool = False):
+    global review_scheduler
+    if review_scheduler is None:
+        review_scheduler = await ReviewScheduler.init()
+        review_scheduler.shared = shared
+    return review_scheduler
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from core.database import db_func
+from core.database.db import async_session_maker
+from core.schemas import TestReadForStudent, TestSubmission, UserAnswer
+
+logger = logging.getLogger('uvicorn.error')
+
+# Сесія без активності довше за цей час вважається покинутою
+EXAM_SESSION_TTL = 3 * 60 * 60
+MAX_EXAM_SESSIONS = 100_000
+# Як часто змінені відповіді чернеток записуються в test_drafts (секунди)
+DRAFT_FLUSH_INTERVAL = float(os.getenv('DRAFT_FLUSH_INTERVAL', '2.0'))
+
+
+class ExamSession:
+    """
+    Чернетка одного студента на один тест: question_id -> selected_option_id.
+
+    dirty - питання, змінені після останнього запису в test_drafts.
+    """
+    __slots__ = ('user_id', 'test_id', 'options', 'answers', 'dirty', 'updated')
+
+    def __init__(self, user_id: int, test_id: int, options: dict[int, frozenset], answers: dict[int, int]):
+        self.user_id = user_id
+        self.test_id = test_id
+        self.options = options
+        self.answers = answers
+        self.dirty: set[int] = set()
+        self.updated = time.monotonic()
+
+    def answer(self, question_id: int, selected_option_id: int) -> bool:
+        """Записати (або замінити) відповідь; False, якщо варіант не належить питанню тесту."""
+        if selected_option_id not in self.options.get(question_id, ()):
+            return False
+        if self.answers.get(question_id) != selected_option_id:
+            self.answers[question_id] = selected_option_id
+            self.dirty.add(question_id)
+        self.updated = time.monotonic()
+        return True
+
+    def take_dirty(self) -> list[dict]:
+        rows = [
+            {'user_id': self.user_id, 'test_id': self.test_id,
+             'question_id': q, 'selected_option_id': self.answers[q]}
+            for q in self.dirty
+        ]
+        self.dirty = set()
+        return rows
+
+    def submission(self) -> TestSubmission:
+        return TestSubmission(
+            test_id=self.test_id,
+            user_id=self.user_id,
+            answers=[UserAnswer(question_id=q, selected_option_id=o) for q, o in self.answers.items()]
+        )
+
+
+class ExamSessionStore:
+    """
+    Чернетки проходження тестів у пам'яті (singleton).
+
+    Відповіді (WebSocket або autosave-ендпоінти) пишуться лише в пам'ять, а
+    фонове завдання раз на DRAFT_FLUSH_INTERVAL записує всі змінені відповіді
+    в test_drafts однією транзакцією. Сесія, якої немає в пам'яті (перезапуск,
+    витіснення), відновлюється з test_drafts. Сесії впорядковані за останньою
+    активністю, тому покинуті (старші EXAM_SESSION_TTL) та зайві понад
+    MAX_EXAM_SESSIONS видаляються з голови; їхні незаписані зміни чекають
+    найближчого flush.
+
+    Note:
+        Сховище - в межах процесу. При WORKERS > 1 (shared) запити однієї
+        чернетки потрапляють у різні worker'и, тому відповіді записуються в
+        test_drafts одразу (save), відкриття та здача читають чернетку з БД,
+        а здана чернетка видаляється відразу - пам'ять лише кешує варіанти тесту.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._sessions = OrderedDict()
+            cls._instance._tests = {}
+            cls._instance._pending = []
+            cls._instance._submitted = []
+            cls._instance._task = None
+            cls._instance.shared = False
+            cls._instance.ttl = EXAM_SESSION_TTL
+            cls._instance.max_sessions = MAX_EXAM_SESSIONS
+            cls._instance.answers_received = 0
+            cls._instance.submitted = 0
+            cls._instance.flushes = 0
+            cls._instance.rows_flushed = 0
+        return cls._instance
+
+    async def open(self, db, user_id: int, test_id: int,
+                   test: Optional[TestReadForStudent] = None) -> Optional[ExamSession]:
+        """
+        Повернути сесію з пам'яті або відновити її з test_drafts.
+
+        Args:
+            db: сесія БД (потрібна лише якщо сесії немає в пам'яті)
+            test: вже завантажений тест (інакше береться з get_test_for_student_by_id)
+
+        Returns:
+            ExamSession | None: None, якщо тесту не існує
+        """
+        key = (user_id, test_id)
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+            if self.shared:
+                # Відповіді могли прийти через інший worker
+                session.answers = await db_func.get_draft_answers(db, user_id, test_id)
+            return session
+
+        options = self._tests.get(test_id)
+        if options is None:
+            test = test or await db_func.get_test_for_student_by_id(db, test_id)
+            if test is None:
+                return None
+            options = self._tests[test_id] = {q.id: frozenset(o.id for o in q.options) for q in test.questions}
+        # Чернетку зданого тесту ще не видалено з БД - нова спроба починається з нуля
+        answers = {} if key in self._submitted else await db_func.get_draft_answers(db, user_id, test_id)
+        # Відповіді витісненої сесії, що ще чекають flush, новіші за БД
+        for row in self._pending:
+            if (row['user_id'], row['test_id']) == key:
+                answers[row['question_id']] = row['selected_option_id']
+        # Поки чекали на БД, сесію могли створити паралельно
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = ExamSession(user_id, test_id, options, answers)
+        self._evict()
+        return session
+
+    def answer(self, session: ExamSession, question_id: int, selected_option_id: int) -> bool:
+        if not session.answer(question_id, selected_option_id):
+            return False
+        self.answers_received += 1
+        key = (session.user_id, session.test_id)
+        if key in self._sessions:
+            self._sessions.move_to_end(key)
+        return True
+
+    async def save(self, session: ExamSession):
+        """При shared - записати змінені відповіді сесії в test_drafts до відповіді клієнту."""
+        if not self.shared or not session.dirty:
+            return
+        rows = session.take_dirty()
+        try:
+            async with async_session_maker() as db:
+                await db_func.flush_drafts(db, rows, [])
+        except Exception:
+            session.dirty.update(row['question_id'] for row in rows)  # допише фоновий flush
+            raise
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+
+    async def submission(self, db, session: ExamSession) -> TestSubmission:
+        """Відповіді для здачі; при shared - з test_drafts, куди пишуть усі worker'и."""
+        if self.shared:
+            await self.save(session)
+            session.answers = await db_func.get_draft_answers(db, session.user_id, session.test_id)
+        return session.submission()
+
+    async def close(self, session: ExamSession):
+        """
+        Прибрати чернетку після успішної здачі тесту.
+
+        З test_drafts вона видаляється при наступному flush, а при shared - одразу,
+        щоб інший worker не відкрив здану чернетку.
+        """
+        self.submitted += 1
+        key = (session.user_id, session.test_id)
+        if self._sessions.get(key) is session:
+            del self._sessions[key]
+        session.dirty = set()
+        self._submitted.append(key)
+        if self.shared:
+            await self.flush()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - session.updated < self.ttl:
+                break
+            del self._sessions[key]
+            if session.dirty:
+                self._pending.extend(session.take_dirty())
+
+    async def flush(self) -> int:
+        """Записати всі змінені відповіді та прибрати чернетки зданих тестів."""
+        submitted, self._submitted = self._submitted, []
+        done = set(submitted)
+        # Відповіді витіснених сесій, які встигли здати, записувати вже не треба
+        rows = [row for row in self._pending if (row['user_id'], row['test_id']) not in done]
+        self._pending = []
+        for session in self._sessions.values():
+            if session.dirty:
+                rows.extend(session.take_dirty())
+        if not rows and not submitted:
+            return 0
+        try:
+            async with async_session_maker() as db:
+                await db_func.flush_drafts(db, rows, submitted)
+        except Exception:
+            # Повернути пачку - запишеться наступним flush
+            self._pending = rows + self._pending
+            self._submitted = submitted + self._submitted
+            raise
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+        return len(rows)
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._evict()
+                await self.flush()
+            except Exception:
+                logger.exception('Draft flush failed')
+
+    def start(self, interval: float = DRAFT_FLUSH_INTERVAL):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        """Зупинити фоновий flush і записати залишок."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception('Final draft flush failed')
+
+    def stats(self) -> dict:
+        return {
+            'sessions': len(self._sessions),
+            'dirty_answers': sum(len(s.dirty) for s in self._sessions.values()) + len(self._pending),
+            'answers_received': self.answers_received,
+            'submitted': self.submitted,
+            'flushes': self.flushes,
+            'rows_flushed': self.rows_flushed,
+        }
+
+
+exam_sessions: Optional[ExamSessionStore] = None
+
+
+def get_exam_sessions(shared: bool = False) -> ExamSessionStore:
+    global exam_sessions
+    if exam_sessions is None:
+        exam_sessions = ExamSessionStore()
+        exam_sessions.shared = shared
+    return exam_sessions
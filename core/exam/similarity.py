@@ -0,0 +1,323 @@
+import os
+from itertools import combinations
+from typing import Optional
+import numpy as np
+
+# Пара позначається, якщо студенти однаково помилились щонайменше в стількох питаннях
+SIMILARITY_MIN_SHARED = int(os.getenv('SIMILARITY_MIN_SHARED', '3'))
+# і випадковий збіг настільки ж великий малоймовірний: поріг p-value - з поправкою Бонферроні на
+# кількість пар спроб, тобто серед усіх пар тесту випадково позначається в середньому не більше alpha
+SIMILARITY_ALPHA = float(os.getenv('SIMILARITY_ALPHA', '0.01'))
+# Скільки найменш імовірних хибних відповідей спроби хешується (трійками) для пошуку кандидатів
+RARE_ANSWERS = 4
+RARE_GROUP = 3
+# Трійки, однакові в більшої кількості спроб, не дають кандидатів: це поширена помилка, а не списування
+MAX_GROUP = 100
+# Пар за одне векторне порівняння (обмежує пам'ять проміжних матриць)
+CHUNK = 65536
+# Пар в одному блоці точного p-value (match_sf)
+SF_BLOCK = 4096
+
+_PRIME = np.uint64(1_000_003)
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, 0.01, 0.99)
+    return np.log(p / (1 - p))
+
+
+class AnswerVectors:
+    """
+    Спроби тесту в розрідженому вигляді: лише відповіді, що справді були в спробах.
+
+    Пам'ять - O(відповідей), а не спроби×питання: спроба тесту-банку містить
+    sample_size із, можливо, тисяч питань банку, і щільні матриці займали б гігабайти.
+    Ключ відповіді - row * questions + col (номер спроби, номер питання); ключі
+    відсортовані, тобто згруповані по спробах, а хибні відповіді додатково
+    виділені в CSR за спробою (wrong_ptr).
+
+    Attributes:
+        keys, options: відсортовані ключі всіх відповідей (питання потрапило в спробу)
+            та id вибраного хибного варіанта (-1 - правильна або порожня відповідь)
+        wrong_keys, wrong_options, share: хибні відповіді - ключ, id варіанта та частка
+            цього варіанта серед усіх хибних відповідей на питання
+        question_logit, offset: logit частки помилок питання та відхилення logit частки
+            помилок студента від середнього (з них складається p_wrong)
+    """
+    __slots__ = ('n', 'questions', 'keys', 'options', 'key_ptr', 'wrong_keys', 'wrong_options', 'share',
+                 'wrong_ptr', 'question_logit', 'offset')
+
+    def __init__(self, n: int, questions: int, keys: np.ndarray, options: np.ndarray, share: np.ndarray,
+                 question_logit: np.ndarray, offset: np.ndarray):
+        self.n = n
+        self.questions = questions
+        self.keys = keys
+        self.options = options
+        self.key_ptr = np.searchsorted(keys, np.arange(n + 1, dtype=np.int64) * questions)
+        wrong = options >= 0
+        self.wrong_keys = keys[wrong]
+        self.wrong_options = options[wrong]
+        self.share = share[wrong]
+        self.wrong_ptr = np.searchsorted(self.wrong_keys, np.arange(n + 1, dtype=np.int64) * questions)
+        self.question_logit = question_logit
+        self.offset = offset
+
+    def wrong_counts(self) -> np.ndarray:
+        return np.diff(self.wrong_ptr)
+
+    def wrong_entries(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Хибні відповіді спроб rows: (індекс у rows, позиція у wrong_*)."""
+        starts = self.wrong_ptr[rows]
+        lengths = self.wrong_ptr[rows + 1] - starts
+        owner = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        return owner, positions
+
+    def p_wrong(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Імовірність помилки студента на питанні: logit частки помилок питання +
+        відхилення студента (без перевірки, чи було питання у спробі).
+        """
+        return 1 / (1 + np.exp(-(self.question_logit[cols] + self.offset[rows])))
+
+    def lookup(self, rows: np.ndarray, cols: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (чи було питання у спробі, id вибраного хибного варіанта або -1).
+
+        У спробі з відповідями на всі питання позиція ключа - key_ptr[row] + col,
+        інакше (тест-банк, пропущені питання) - бінарний пошук у keys.
+        """
+        key = rows * self.questions + cols
+        if not len(self.keys):
+            return np.zeros(len(key), dtype=bool), np.full(len(key), -1, dtype=np.int64)
+        i = self.key_ptr[rows] + cols
+        sparse = self.key_ptr[rows + 1] - self.key_ptr[rows] < self.questions
+        i[sparse] = np.searchsorted(self.keys, key[sparse])
+        i = np.minimum(i, len(self.keys) - 1)
+        present = self.keys[i] == key
+        return present, np.where(present, self.options[i], -1)
+
+
+def answer_vectors(result_ids: np.ndarray, answers: np.ndarray) -> AnswerVectors:
+    """
+    Закодувати спроби тесту розрідженими векторами вибраних хибних варіантів.
+
+    Args:
+        result_ids: id спроб за зростанням (номери рядків)
+        answers: n×4 - result_id, question_id, selected_option_id (-1 - без відповіді), is_correct
+    """
+    rows = np.searchsorted(result_ids, answers[:, 0])
+    questions, cols = np.unique(answers[:, 1], return_inverse=True)
+    n, q = len(result_ids), len(questions)
+    is_wrong = (answers[:, 2] >= 0) & (answers[:, 3] == 0)
+
+    _, option_index, option_counts = np.unique(answers[is_wrong, 2], return_inverse=True, return_counts=True)
+    wrong_per_question = np.bincount(cols[is_wrong], minlength=q)
+    share = np.zeros(len(answers))
+    share[is_wrong] = option_counts[option_index] / wrong_per_question[cols[is_wrong]]
+
+    # Без відповіді - теж помилка: так рахує save_test_result
+    question_rate = wrong_per_question / np.maximum(np.bincount(cols, minlength=q), 1)
+    student_rate = np.bincount(rows, weights=answers[:, 3] == 0, minlength=n) / np.maximum(np.bincount(rows, minlength=n), 1)
+    offset = _logit(student_rate) - _logit(np.array([student_rate.mean() if n else 0.5]))
+
+    keys = rows.astype(np.int64) * q + cols
+    # Відповіді зазвичай уже впорядковані за спробою - стабільне сортування тут майже лінійне
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    # Повторна відповідь на те саме питання спроби: діє остання
+    last = np.append(keys[1:] != keys[:-1], True) if len(keys) else np.zeros(0, dtype=bool)
+    order = order[last]
+    options = np.where(is_wrong[order], answers[order, 2], -1)
+    return AnswerVectors(n, q, keys[last], options, share[order], _logit(question_rate), offset)
+
+
+def rare_answer_hashes(vectors: AnswerVectors) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Хеші трійок з RARE_ANSWERS найменш імовірних хибних відповідей кожної спроби.
+
+    Імовірність відповіді - p_wrong * share, та сама, що в compare: якщо b списав
+    в a, більшість рідкісних помилок a є і в b, тож у них збігається хоча б одна
+    трійка, а випадкові спроби мають спільну трійку рідко.
+
+    Returns:
+        tuple: (рядок спроби, хеш трійки id хибних варіантів)
+    """
+    k = min(RARE_ANSWERS, vectors.questions)
+    if k < RARE_GROUP:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+    rows = np.repeat(np.arange(vectors.n), vectors.wrong_counts())
+    rarity = vectors.share * vectors.p_wrong(rows, vectors.wrong_keys % vectors.questions)
+    # Хибні відповіді кожної спроби за зростанням rarity; перші k - найрідкісніші
+    order = np.lexsort((rarity, rows))
+    rank = np.arange(len(order)) - vectors.wrong_ptr[rows[order]]
+    chosen = rank < k
+    tokens = np.full((vectors.n, k), -1, dtype=np.int64)
+    tokens[rows[order][chosen], rank[chosen]] = vectors.wrong_options[order][chosen]
+    tokens.sort(axis=1)  # порожні (-1) - на початку рядка
+    rows, keys = [], []
+    for group in combinations(range(k), RARE_GROUP):
+        usable = np.flatnonzero(tokens[:, group[0]] >= 0)
+        h = np.zeros(len(usable), dtype=np.uint64)
+        for column in group:
+            h = h * _PRIME + tokens[usable, column].astype(np.uint64)
+        rows.append(usable)
+        keys.append(h)
+    return np.concatenate(rows), np.concatenate(keys)
+
+
+def group_pairs(rows: np.ndarray, keys: np.ndarray, n: int) -> np.ndarray:
+    """Унікальні пари рядків (a < b, закодовані a * n + b) з однаковим ключем у групах 2..MAX_GROUP."""
+    order = np.argsort(keys, kind='stable')
+    rows, keys = rows[order], keys[order]
+    _, starts, sizes = np.unique(keys, return_index=True, return_counts=True)
+    usable = (sizes >= 2) & (sizes <= MAX_GROUP)
+    group_start = np.repeat(np.where(usable, starts, 0), sizes)
+    group_size = np.repeat(np.where(usable, sizes, 0), sizes)
+    position = np.arange(len(rows))
+    # Кожен елемент у парі з усіма наступними в групі
+    later = np.maximum(group_start + group_size - position - 1, 0)
+    offsets = np.arange(later.sum()) - np.repeat(np.cumsum(later) - later, later)
+    left = np.repeat(rows, later)
+    right = rows[np.repeat(position + 1, later) + offsets]
+    return np.unique(np.minimum(left, right) * n + np.maximum(left, right))
+
+
+def match_sf(owner: np.ndarray, p: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """
+    P(S >= k) для кожної пари, де S - кількість збігів: сума незалежних Bernoulli(p)
+    по хибних відповідях пари (owner - індекс пари), векторно.
+
+    Note:
+        Точний розподіл суми (Пуассона-біноміальний) рахується динамікою по відповідях
+        пари зі станами 0..max(k) (останній поглинає "не менше"). При малих p він збігається
+        з Пуассоном(expected), а при великих (популярна хибна відповідь, слабкий студент)
+        дисперсія менша за expected, і Пуассон занижував би значущість навіть повної копії.
+        Додаються лише невід'ємні доданки, тож малі ймовірності не губляться у 1 - cdf.
+    """
+    lengths = np.bincount(owner, minlength=len(k))
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    probs = np.zeros((len(k), lengths.max(initial=0)))
+    probs[owner, position] = p
+    sf = np.ones(len(k), dtype=np.float64)
+    # Пари впорядковуються за k і рахуються блоками: станів max(k) блоку, а не всього масиву
+    order = np.argsort(k, kind='stable')
+    order = order[k[order] > 0]
+    for start in range(0, len(order), SF_BLOCK):
+        rows = order[start:start + SF_BLOCK]
+        top = int(k[rows[-1]])
+        dist = np.zeros((len(rows), top + 1))
+        dist[:, 0] = 1.0
+        for column in probs[rows, :lengths[rows].max()].T:
+            q = column[:, None]
+            moved = dist * q
+            dist *= 1 - q
+            dist[:, 1:] += moved[:, :-1]
+            dist[:, top] += moved[:, top]
+        tail = np.cumsum(dist[:, ::-1], axis=1)[:, ::-1]
+        sf[rows] = np.minimum(tail[np.arange(len(rows)), k[rows]], 1.0)
+    return sf
+
+
+def compare(vectors: AnswerVectors, a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Векторно порівняти пари спроб (пачками по CHUNK).
+
+    Якщо b відповідав незалежно від a, то на питанні, де a обрав хибний варіант,
+    b обере той самий з імовірністю p_wrong[b] * share[a]; кількість збігів - сума
+    таких незалежних випробувань (питання поза спробою b дають 0), і p-value - її точний
+    хвіст (match_sf). Нормальне наближення тут не годиться: при очікуванні ~0.2 три
+    збіги дають z ~ 8, хоча P(S >= 3) ~ 0.001. Рахується в обидва боки, береться
+    більше p (консервативно).
+
+    Returns:
+        tuple: (shared - однакові хибні відповіді, expected - очікувана кількість,
+            p - P(S >= shared) при незалежних відповідях)
+    """
+    shared = np.empty(len(a), dtype=np.int64)
+    expected = np.empty(len(a), dtype=np.float64)
+    p_value = np.empty(len(a), dtype=np.float64)
+    for start in range(0, len(a), CHUNK):
+        left, right = a[start:start + CHUNK], b[start:start + CHUNK]
+        count = None
+        directions = []
+        for source, target in ((left, right), (right, left)):
+            owner, positions = vectors.wrong_entries(source)
+            rows, cols = target[owner], vectors.wrong_keys[positions] % vectors.questions
+            present, options = vectors.lookup(rows, cols)
+            if count is None:
+                same = options == vectors.wrong_options[positions]
+                count = np.bincount(owner, weights=same, minlength=len(source)).astype(np.int64)
+            p = np.where(present, vectors.share[positions] * vectors.p_wrong(rows, cols), 0.0)
+            directions.append((np.bincount(owner, weights=p, minlength=len(source)), match_sf(owner, p, count)))
+        (mean_ab, p_ab), (mean_ba, p_ba) = directions
+        chunk = slice(start, start + CHUNK)
+        shared[chunk] = count
+        expected[chunk] = np.maximum(mean_ab, mean_ba)
+        p_value[chunk] = np.maximum(p_ab, p_ba)
+    return shared, expected, p_value
+
+
+def threshold(submissions: int, alpha: float = SIMILARITY_ALPHA) -> float:
+    """Поріг p-value для тесту з такою кількістю спроб (з поправкою на кількість пар)."""
+    pairs = max(submissions * (submissions - 1) // 2, 1)
+    return alpha / pairs
+
+
+def detect(result_ids: np.ndarray, user_ids: np.ndarray, answers: np.ndarray,
+           min_shared: int = SIMILARITY_MIN_SHARED, max_p: Optional[float] = None) -> dict:
+    """
+    Знайти пари спроб з підозріло однаковими хибними відповідями.
+
+    Кандидати - спроби зі спільною трійкою рідкісних хибних відповідей (хешування,
+    rare_answer_hashes), тому замість n² порівнянь перевіряються лише пари зі
+    спільними рідкісними помилками. Для кандидата рахується, скільки разів студенти обрали
+    той самий хибний варіант і наскільки малоймовірний такий випадковий збіг (p, див. compare).
+    Пари спроб одного студента пропускаються; для пари студентів лишається
+    найпідозріліша пара спроб.
+
+    Args:
+        max_p: поріг p-value (None - threshold(кількість спроб))
+
+    Returns:
+        dict: submissions, questions, candidates, max_p та масиви позначених пар
+            (a, b - індекси спроб, shared, expected, p) за зростанням p
+    """
+    n = len(result_ids)
+    max_p = threshold(n) if max_p is None else max_p
+    vectors = answer_vectors(result_ids, answers)
+    candidates = group_pairs(*rare_answer_hashes(vectors), n) if n else np.empty(0, dtype=np.int64)
+    a, b = candidates // max(n, 1), candidates % max(n, 1)
+    keep = user_ids[a] != user_ids[b]
+    a, b = a[keep], b[keep]
+
+    shared, expected, p = compare(vectors, a, b)
+    flagged = np.flatnonzero((shared >= min_shared) & (p <= max_p))
+    flagged = flagged[np.lexsort((-shared[flagged], p[flagged]))]
+    users = np.stack([np.minimum(user_ids[a[flagged]], user_ids[b[flagged]]),
+                      np.maximum(user_ids[a[flagged]], user_ids[b[flagged]])], axis=1)
+    _, first = np.unique(users, axis=0, return_index=True)
+    flagged = flagged[np.sort(first)]
+    return {
+        'submissions': n,
+        'questions': vectors.questions,
+        'candidates': len(candidates),
+        'max_p': max_p,
+        'a': a[flagged],
+        'b': b[flagged],
+        'shared': shared[flagged],
+        'expected': expected[flagged],
+        'p': p[flagged],
+        'wrong': vectors.wrong_counts(),
+    }
+
+
+def load(columns: dict) -> Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Аргументи detect з db_func.get_answer_columns (None - тест не знайдено)."""
+    if columns is None:
+        return None
+    # Спроби без user_id не мають пари "той самий студент"
+    results = np.array([(r, -r if u is None else u) for r, u in columns['results']], dtype=np.int64).reshape(-1, 2)
+    answers = np.array([(r, q, -1 if s is None else s, 1 if c else 0) for r, q, s, c in columns['answers']],
+                       dtype=np.int64).reshape(-1, 4)
+    return results[:, 0], results[:, 1], answers
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from core.database import db_func
+from core.database.db import async_session_maker
+from core.database.models import JobModel
+from core.schemas import JobRead
+
+logger = logging.getLogger('uvicorn.error')
+
+# Скільки завдань виконується одночасно в цьому процесі
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', '2'))
+# Процеси для CPU-важких кроків (створюються при першому run_cpu)
+JOB_PROCESSES = int(os.getenv('JOB_PROCESSES', '2'))
+# Прогрес пишеться в jobs не частіше, ніж раз на цей інтервал (секунди)
+JOB_PROGRESS_INTERVAL = 1.0
+
+
+@dataclass
+class JobKind:
+    name: str
+    fn: Callable[..., Awaitable[Optional[dict]]]
+
+
+registry: dict[str, JobKind] = {}
+
+
+def job(name: str):
+    """
+    Зареєструвати тип завдання.
+
+    Функція отримує JobContext та параметри завдання як keyword-аргументи і
+    повертає dict (результат, зберігається як JSON) або None.
+
+    Example:
+        >>> @job('progress_rebuild')
+        ... async def progress_rebuild(ctx: JobContext): ...
+    """
+    def decorator(fn):
+        registry[name] = JobKind(name, fn)
+        return fn
+    return decorator
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobContext:
+    """Те, що бачить функція завдання: його id, звіт про прогрес і пул процесів."""
+
+    def __init__(self, runner: 'JobRunner', job: JobModel):
+        self.runner = runner
+        self.job_id = job.id
+        self.kind = job.kind
+        self.user_id = job.user_id
+        self.progress = 0.0
+        self.message: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_requested = False
+        self._saved = 0.0
+
+    async def report(self, progress: float, message: Optional[str] = None):
+        """Оновити прогрес (0..1); у БД - не частіше за JOB_PROGRESS_INTERVAL."""
+        self.progress = min(max(progress, 0.0), 1.0)
+        self.message = message
+        now = time.monotonic()
+        if now - self._saved >= JOB_PROGRESS_INTERVAL:
+            self._saved = now
+            async with async_session_maker() as db:
+                await db_func.update_job(db, self.job_id, progress=self.progress, message=message)
+
+    async def run_cpu(self, fn, *args):
+        """Виконати fn(*args) у пулі процесів (fn та аргументи мають серіалізуватись pickle)."""
+        return await asyncio.get_running_loop().run_in_executor(self.runner.pool(), fn, *args)
+
+
+class JobRunner:
+    """
+    Черга фонових завдань у процесі застосунку (singleton).
+
+    Завдання записується в таблицю jobs і потрапляє в asyncio-чергу, яку
+    розбирають JOB_CONCURRENCY worker-корутин. CPU-важкі кроки завдання
+    виконуються в ProcessPoolExecutor (JobContext.run_cpu), тому не блокують
+    event loop. Стан, прогрес і результат зберігаються в jobs і доступні після
+    перезапуску; завдання, що не встигли почати, при старті повертаються в
+    чергу, а перервані - позначаються failed.
+
+    Note:
+        Зовнішнього брокера немає: при WORKERS > 1 кожен процес має власну
+        чергу, а claim_job гарантує, що завдання виконає лише один з них.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._queue = asyncio.Queue()
+            cls._instance._workers = []
+            cls._instance._active = {}
+            cls._instance._pool = None
+            cls._instance.concurrency = JOB_CONCURRENCY
+            cls._instance.completed = 0
+            cls._instance.failed = 0
+        return cls._instance
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: дочірні процеси не успадковують потоки aiosqlite та стан event loop
+            self._pool = ProcessPoolExecutor(JOB_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    async def submit(self, kind: str, params: dict, user_id: Optional[int]) -> JobModel:
+        """
+        Поставити завдання в чергу.
+
+        Raises:
+            KeyError: невідомий тип завдання
+        """
+        if kind not in registry:
+            raise KeyError(kind)
+        async with async_session_maker() as db:
+            job = await db_func.create_job(db, kind, json.dumps(params), user_id)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def submit_scheduled(self, kind: str, params: dict, since: datetime) -> Optional[JobModel]:
+        """
+        Поставити планове завдання, якщо такого ж немає в черзі чи виконанні і жодне
+        не створене після since (див. db_func.create_scheduled_job); None - вже поставлене.
+        """
+        if kind not in registry:
+            raise KeyError(kind)
+        async with async_session_maker() as db:
+            job = await db_func.create_scheduled_job(db, kind, json.dumps(params), since)
+        if job is not None:
+            self._queue.put_nowait(job.id)
+        return job
+
+    async def cancel(self, job_id: int) -> bool:
+        """Скасувати завдання з черги або перервати те, що виконується в цьому процесі."""
+        ctx = self._active.get(job_id)
+        if ctx is not None:
+            ctx.cancel_requested = True
+            ctx.task.cancel()
+            return True
+        async with async_session_maker() as db:
+            return await db_func.cancel_queued_job(db, job_id)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception('Job %s crashed', job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int):
+        async with async_session_maker() as db:
+            if not await db_func.claim_job(db, job_id, os.getpid()):
+                return  # скасоване або вже взяте іншим worker'ом
+            job = await db_func.get_job(db, job_id)
+        ctx = self._active[job_id] = JobContext(self, job)
+        values = {}
+        try:
+            kind = registry.get(job.kind)
+            if kind is None:
+                raise KeyError(f'Unknown job kind {job.kind}')
+            ctx.task = asyncio.create_task(kind.fn(ctx, **json.loads(job.params or '{}')))
+            result = await ctx.task
+        except asyncio.CancelledError:
+            if not ctx.cancel_requested or asyncio.current_task().cancelling():
+                # Зупинка застосунку: завдання перервано, а не скасовано користувачем
+                values = {'status': 'failed', 'error': 'Interrupted by shutdown'}
+                raise
+            values = {'status': 'cancelled'}
+        except Exception as e:
+            logger.exception('Job %s (%s) failed', job_id, job.kind)
+            values = {'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+            self.failed += 1
+        else:
+            values = {'status': 'done', 'progress': 1.0, 'result': json.dumps(result) if result is not None else None}
+            self.completed += 1
+        finally:
+            del self._active[job_id]
+            values.setdefault('progress', ctx.progress)
+            async with async_session_maker() as db:
+                await db_func.update_job(db, job_id, message=ctx.message,
+                                         finished_at=datetime.now(timezone.utc), **values)
+
+    async def start(self, concurrency: Optional[int] = None):
+        """Відновити незавершені завдання з jobs та запустити worker-корутини."""
+        if self._workers:
+            return
+        self.concurrency = concurrency or self.concurrency
+        self._queue = asyncio.Queue()  # черга прив'язується до event loop, в якому стартує застосунок
+        async with async_session_maker() as db:
+            for job_id, status, pid in await db_func.get_unfinished_jobs(db):
+                if status == 'queued':
+                    self._queue.put_nowait(job_id)
+                elif not _pid_alive(pid) or pid == os.getpid():
+                    await db_func.update_job(db, job_id, status='failed', error='Interrupted by restart',
+                                             finished_at=datetime.now(timezone.utc))
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Зупинити worker'и (поточні завдання позначаються failed) та пул процесів."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def describe(self, job: JobModel) -> JobRead:
+        """JobRead з рядка jobs; прогрес активного завдання - з пам'яті (свіжіший за БД)."""
+        ctx = self._active.get(job.id)
+        return JobRead(
+            id=job.id,
+            kind=job.kind,
+            status=job.status,
+            progress=ctx.progress if ctx else job.progress or 0.0,
+            message=ctx.message if ctx else job.message,
+            result=json.loads(job.result) if job.result else None,
+            error=job.error,
+            user_id=job.user_id,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at
+        )
+
+    def stats(self) -> dict:
+        return {
+            'concurrency': self.concurrency,
+            'processes': JOB_PROCESSES,
+            'pool_started': self._pool is not None,
+            'queued': self._queue.qsize(),
+            'running': [{'id': job_id, 'kind': ctx.kind, 'progress': ctx.progress}
+                        for job_id, ctx in self._active.items()],
+            'completed': self.completed,
+            'failed': self.failed,
+        }
+
+
+job_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> JobRunner:
+    global job_runner
+    if job_runner is None:
+        import core.jobs.tasks  # noqa: F401 - реєстрація типів завдань
+        job_runner = JobRunner()
+    return job_runner
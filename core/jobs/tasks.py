@@ -0,0 +1,176 @@
+import os
+from typing import Optional
+import numpy as np
+from core.database import db_func
+from core.database.db import async_session_maker
+from core.jobs.runner import JobContext, job
+from core.schemas import QuestionCreate
+from core.utils.export import export_chunks, export_filename, in_session
+
+# Куди фонові експорти записують файли (шлях зберігається в результаті завдання)
+JOB_EXPORT_DIR = os.getenv('JOB_EXPORT_DIR', 'exports')
+
+
+@job('progress_rebuild')
+async def progress_rebuild(ctx: JobContext):
+    """Перебудувати student_progress з усієї історії test_results."""
+    async with async_session_maker() as db:
+        return {'rows': await db_func.rebuild_progress(db)}
+
+
+@job('analytics_recompute')
+async def analytics_recompute(ctx: JobContext, test_id: Optional[int] = None):
+    """Перерахувати аналітику одного тесту або (test_id=None) всіх тестів."""
+    from core.stats.analytics import TestAnalyticsEngine
+    if test_id is None:
+        analytics = await TestAnalyticsEngine.init()
+        return {'tests': len(analytics._tests)}
+    item = await TestAnalyticsEngine().rebuild_test(test_id)
+    return {'test_id': test_id, 'submissions': item.count if item else 0}
+
+
+@job('related_recompute')
+async def related_recompute(ctx: JobContext):
+    """Перерахувати рекомендації курсів (/learn/course/{id}/related) у пулі процесів."""
+    from core.stats.related import CourseRecommender
+    return await CourseRecommender().refresh(ctx.run_cpu)
+
+
+@job('bank_import')
+async def bank_import(ctx: JobContext, test_id: int, questions: list[dict], batch: int = 1000):
+    """Додати питання в банк тесту пачками по batch (кожна - окрема транзакція)."""
+    from core.exam.bank import get_question_banks
+    questions = [QuestionCreate(**q) for q in questions]
+    added = 0
+    for start in range(0, len(questions), batch):
+        async with async_session_maker() as db:
+            added += await db_func.add_bank_questions(db, test_id, questions[start:start + batch])
+        await ctx.report(added / len(questions), f'{added}/{len(questions)} questions')
+    get_question_banks().invalidate(test_id)
+    return {'test_id': test_id, 'added': added}
+
+
+@job('gradebook_export')
+async def gradebook_export(ctx: JobContext, course_id: int, format: str = 'csv', gzip: bool = False):
+    """Записати журнал курсу у файл JOB_EXPORT_DIR (завантаження - /teacher/jobs/{id}/download)."""
+    async with async_session_maker() as db:
+        if not await db_func.course_exists(db, course_id):
+            raise ValueError(f'Course {course_id} not found')
+        test_ids = await db_func.get_course_test_ids(db, course_id)
+        total = await db_func.count_gradebook_rows(db, course_id)
+
+    written = 0
+
+    async def batches():
+        nonlocal written
+        async for rows in in_session(db_func.stream_gradebook, course_id, test_ids):
+            yield rows
+            written += len(rows)
+            await ctx.report(written / total if total else 1.0, f'{written}/{total} rows')
+
+    os.makedirs(JOB_EXPORT_DIR, exist_ok=True)
+    path = os.path.join(JOB_EXPORT_DIR, export_filename(f'job_{ctx.job_id}_gradebook_course_{course_id}', format, gzip))
+    header = ['user_id', 'username'] + [f'test_{test_id}' for test_id in test_ids]
+    with open(path, 'wb') as file:
+        async for chunk in export_chunks(format, header, batches(), gzip):
+            file.write(chunk)
+    return {'path': path, 'rows': written, 'bytes': os.path.getsize(path)}
+
+
+def grade_answers(option_ids: np.ndarray, option_questions: np.ndarray, option_correct: np.ndarray,
+                  answer_questions: np.ndarray, answer_selected: np.ndarray, answer_results: np.ndarray,
+                  totals: np.ndarray, max_score: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Векторна перевірка відповідей (виконується в пулі процесів).
+
+    Відповідь правильна, якщо вибраний варіант належить тому ж питанню та має
+    is_correct - те саме правило, що в save_test_result.
+
+    Args:
+        answer_results: індекс спроби (0..len(totals)-1) для кожної відповіді
+        totals: кількість питань у кожній спробі
+
+    Returns:
+        tuple: (is_correct для кожної відповіді, новий бал кожної спроби)
+    """
+    order = np.argsort(option_ids)
+    ids = option_ids[order]
+    pos = np.clip(np.searchsorted(ids, answer_selected), 0, max(len(ids) - 1, 0))
+    if len(ids):
+        correct = (ids[pos] == answer_selected) & (option_questions[order][pos] == answer_questions) \
+            & option_correct[order][pos]
+    else:
+        correct = np.zeros(len(answer_selected), dtype=bool)
+    counts = np.bincount(answer_results, weights=correct, minlength=len(totals))
+    scores = np.round(counts / np.maximum(totals, 1) * max_score, 2)
+    return correct, scores
+
+
+@job('regrade_test')
+async def regrade_test(ctx: JobContext, test_id: int):
+    """
+    Повторно перевірити всі спроби тесту за поточними правильними варіантами.
+
+    Після запису нових балів перебудовуються прогрес тесту, його аналітика та рейтинги.
+    """
+    from core.stats.analytics import TestAnalyticsEngine
+    from core.stats.leaderboard import get_leaderboards
+
+    async with async_session_maker() as db:
+        data = await db_func.get_grading_columns(db, test_id)
+    if data is None:
+        raise ValueError(f'Test {test_id} not found')
+    await ctx.report(0.2, f"{len(data['answers'])} answers loaded")
+
+    test = data['test']
+    options = np.array([(i, q, 1 if c else 0) for i, q, c in data['options']], dtype=np.int64).reshape(-1, 3)
+    answers = np.array([(a[0], a[1], a[2], -1 if a[3] is None else a[3], a[4] or 0) for a in data['answers']],
+                       dtype=np.int64).reshape(-1, 5)
+    result_ids = np.array([r[0] for r in data['results']], dtype=np.int64)
+    old_scores = np.array([float(r[1] or 0) for r in data['results']])
+    # Спроба тесту-банку має власну кількість питань (test_attempts), звичайна - усі питання тесту
+    totals = np.array([data['attempt_sizes'].get(rid, data['questions_count']) if test.sample_size
+                       else data['questions_count'] for rid in result_ids.tolist()], dtype=np.float64)
+
+    answer_results = np.searchsorted(result_ids, answers[:, 1])
+    correct, scores = await ctx.run_cpu(
+        grade_answers,
+        options[:, 0], options[:, 1], options[:, 2].astype(bool),
+        answers[:, 2], answers[:, 3], answer_results, totals, float(test.max_score or 100)
+    )
+    await ctx.report(0.5, 'graded')
+
+    # Старі результати без збережених відповідей перевірити неможливо - їхній бал не змінюється
+    graded = np.bincount(answer_results, minlength=len(result_ids)) > 0
+    changed_answers = np.flatnonzero(correct != answers[:, 4].astype(bool))
+    changed_results = np.flatnonzero(graded & (np.abs(scores - old_scores) > 1e-9))
+    async with async_session_maker() as db:
+        await db_func.apply_regrade(
+            db,
+            [{'answer_id': int(answers[i, 0]), 'is_correct': bool(correct[i])} for i in changed_answers],
+            [{'result_id': int(result_ids[i]), 'score': float(scores[i])} for i in changed_results]
+        )
+        await ctx.report(0.7, 'saved')
+        if len(changed_results):
+            await db_func.rebuild_progress(db, test_id)
+        if len(changed_answers) or len(changed_results):
+            # Інші worker'и перебудують свої кеші через ResultsFeed.catch_up_regrades
+            await db_func.bump_regrade_epoch(db, test_id)
+
+    if len(changed_answers) or len(changed_results):
+        await TestAnalyticsEngine().rebuild_test(test_id)
+        await (await get_leaderboards()).rebuild()
+    return {
+        'test_id': test_id,
+        'results': len(result_ids),
+        'answers': len(answers),
+        'answers_changed': len(changed_answers),
+        'results_changed': len(changed_results),
+    }
+
+
+@job('db_backup')
+async def db_backup(ctx: JobContext):
+    """Гарячий знімок learning.db (і results.db) у BACKUP_DIR з ретенцією BACKUP_KEEP."""
+    from core.database.backup import create_backup
+    return await create_backup(ctx.report)
@@ -1,3 +1,4 @@
+from sqlalchemy import update
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.database.db import async_session_maker
@@ -45,50 +46,36 @@ class StatisticsManager:
                     'users': stats.users
                 }
 
-    async def increment_lessons(self):
+    async def _increment(self, column):
+        """
+        Атомарно збільшити лічильник одним UPDATE.
+
+        Лічильник живе тільки в SQLite, тож кілька worker-процесів uvicorn
+        інкрементують спільне значення без втрачених оновлень (read-modify-write
+        через ORM-об'єкт губив їх при одночасних запитах).
+        """
         async with async_session_maker() as session:
-            result = await session.execute(select(StatisticsModel).filter(StatisticsModel.id == 1))
-            stats = result.scalars().first()
-            if stats:
-                stats.lessons_created += 1
-                await session.commit()
-        await self._reload_model()
+            await session.execute(
+                update(StatisticsModel)
+                .where(StatisticsModel.id == 1)
+                .values({column: column + 1})
+            )
+            await session.commit()
+
+    async def increment_lessons(self):
+        await self._increment(StatisticsModel.lessons_created)
 
     async def increment_resources(self):
-        async with async_session_maker() as session:
-            result = await session.execute(select(StatisticsModel).filter(StatisticsModel.id == 1))
-            stats = result.scalars().first()
-            if stats:
-                stats.resources_created += 1
-                await session.commit()
-        await self._reload_model()
+        await self._increment(StatisticsModel.resources_created)
 
     async def increment_courses(self):
-        async with async_session_maker() as session:
-            result = await session.execute(select(StatisticsModel).filter(StatisticsModel.id == 1))
-            stats = result.scalars().first()
-            if stats:
-                stats.courses_built += 1
-                await session.commit()
-        await self._reload_model()
+        await self._increment(StatisticsModel.courses_built)
 
     async def increment_clones(self):
-        async with async_session_maker() as session:
-            result = await session.execute(select(StatisticsModel).filter(StatisticsModel.id == 1))
-            stats = result.scalars().first()
-            if stats:
-                stats.lessons_cloned += 1
-                await session.commit()
-        await self._reload_model()
+        await self._increment(StatisticsModel.lessons_cloned)
 
     async def increment_users(self):
-        async with async_session_maker() as session:
-            result = await session.execute(select(StatisticsModel).filter(StatisticsModel.id == 1))
-            stats = result.scalars().first()
-            if stats:
-                stats.users += 1
-                await session.commit()
-        await self._reload_model()
+        await self._increment(StatisticsModel.users)
 
     async def report(self):
         """Отримати актуальну статистику."""
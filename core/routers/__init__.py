@@ -1,4 +1,4 @@
-from core.routers.learn import router as learn_router
+from core.routers.learn import router as learn_router, exam_router
 from core.routers.auth import router as auth_router
 from core.routers.teacher import router as teacher_router
 from core.routers.admin import router as admin_router
\ No newline at end of file
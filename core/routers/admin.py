@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from core.utils.auth import get_admin_user
+from core.database.models import UserModel
+from core.jobs.runner import JobRunner, registry
+from core.utils import ratelimit
+from core.utils.singleflight import flights
+from core.utils.profiler import profiler
 from core.database import db_func
-from core.schemas import UserRead
+from core.database import metrics as db_metrics
+from core.schemas import UserRead, ProgressRebuildResponse, JobRead, JobCreate, ProfilerStart
 
 
 router = APIRouter(prefix='/admin', dependencies=[Depends(get_admin_user)], tags=['Admin'])
@@ -21,4 +28,211 @@ async def set_teacher(user_id: int, db: AsyncSession = Depends(db_func.get_db)):
     """
     Видача ролі teacher для певного користувача
     """
-    return await db_func.set_role_for_user(db, user_id, 'teacher')
\ No newline at end of file
+    return await db_func.set_role_for_user(db, user_id, 'teacher')
+
+@router.post('/progress/rebuild', response_model=ProgressRebuildResponse)
+async def rebuild_progress(db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Перебудова матеріалізованого прогресу студентів з історії test_results
+    """
+    return ProgressRebuildResponse(rows=await db_func.rebuild_progress(db))
+
+
+@router.get('/startup')
+async def get_startup_timings(request: Request):
+    """
+    Тривалість фаз старту застосунку (schema_check, stats_init, cache_warmup)
+    """
+    return request.app.state.startup.report()
+
+
+@router.get('/ratelimits')
+async def get_rate_limits():
+    """
+    Налаштування та лічильники лімітів запитів на запис по роутерах
+    """
+    return {scope: limit.limiter.stats() if limit.limiter else None
+            for scope, limit in ratelimit.limits.items()}
+
+
+@router.get('/coalescing')
+async def get_coalescing_stats():
+    """
+    Скільки однакових паралельних читань db_func об'єднано в один запит (singleflight)
+    """
+    return flights.stats()
+
+
+@router.get('/db-metrics')
+async def get_db_metrics():
+    """
+    Пул з'єднань, перехід у потік aiosqlite, тривалість транзакцій, очікування та утримання
+    writer-lock SQLite, довгі транзакції запису (поріг DB_SLOW_WRITE_MS) - по кожному engine
+    """
+    return db_metrics.report()
+
+
+@router.get('/exam-sessions')
+async def get_exam_session_stats(request: Request):
+    """
+    Активні WebSocket-сесії проходження тестів та кількість отриманих відповідей
+    """
+    return request.app.state.exam_sessions.stats()
+
+
+@router.get('/question-banks')
+async def get_question_bank_stats(request: Request):
+    """
+    Закешовані індекси банків питань: кількість питань, пам'ять та видані спроби
+    """
+    return request.app.state.question_banks.stats()
+
+
+@router.get('/reviews')
+async def get_review_stats(request: Request):
+    """
+    Інтервальне повторення: колоди студентів у пам'яті, картки, пам'ять, незаписані зміни та flush
+    """
+    return request.app.state.reviews.stats()
+
+
+@router.get('/suggest')
+async def get_suggest_index_stats(request: Request):
+    """
+    Префіксний індекс /learn/suggest: записи, ключі, розмір дельти та пам'ять
+    """
+    return request.app.state.suggest.stats()
+
+
+@router.get('/related')
+async def get_related_stats(request: Request):
+    """
+    Рекомендації курсів: кількість курсів, час останнього перерахунку та пам'ять списків сусідів
+    """
+    return request.app.state.related.stats()
+
+
+@router.get('/sandbox')
+async def get_sandbox_stats(request: Request):
+    """
+    Запуск прикладів коду: розмір пулу процесів, очікування в черзі, час виконання та частка влучань у кеш
+    """
+    return request.app.state.sandbox.stats()
+
+
+@router.get('/backups')
+async def get_backups(request: Request):
+    """
+    Резервні копії БД: налаштування та наявні знімки (найновіші першими)
+    """
+    return request.app.state.backups.stats()
+
+
+@router.post('/backups', response_model=JobRead)
+async def create_backup(request: Request, user: UserModel = Depends(get_admin_user)):
+    """
+    Зняти гарячу копію БД фоновим завданням db_backup (прогрес - GET /admin/jobs/{id})
+    """
+    jobs: JobRunner = request.app.state.jobs
+    return jobs.describe(await jobs.submit('db_backup', {}, user.id))
+
+
+@router.post('/jobs', response_model=JobRead)
+async def submit_job(job: JobCreate, request: Request, user: UserModel = Depends(get_admin_user)):
+    """
+    Поставити фонове завдання будь-якого типу (progress_rebuild, analytics_recompute, regrade_test, ...)
+    """
+    if job.kind not in registry:
+        raise HTTPException(status_code=400, detail=f'Unknown job kind, expected one of {sorted(registry)}')
+    jobs: JobRunner = request.app.state.jobs
+    return jobs.describe(await jobs.submit(job.kind, job.params, user.id))
+
+
+@router.get('/jobs/stats')
+async def get_job_runner_stats(request: Request):
+    """
+    Стан черги фонових завдань: очікують, виконуються, завершені, пул процесів
+    """
+    return request.app.state.jobs.stats()
+
+
+@router.get('/jobs', response_model=List[JobRead])
+async def list_jobs(
+        request: Request,
+        status: Optional[str] = None,
+        limit: int = 50,
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Останні фонові завдання всіх користувачів (фільтр за статусом)
+    """
+    jobs: JobRunner = request.app.state.jobs
+    return [jobs.describe(job) for job in await db_func.list_jobs(db, status=status, limit=limit)]
+
+
+@router.get('/jobs/{job_id}', response_model=JobRead)
+async def get_job(job_id: int, request: Request, db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Стан, прогрес і результат фонового завдання
+    """
+    job = await db_func.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found')
+    return request.app.state.jobs.describe(job)
+
+
+@router.post('/jobs/{job_id}/cancel')
+async def cancel_job(job_id: int, request: Request):
+    """
+    Скасувати завдання в черзі або перервати те, що виконується
+    """
+    if not await request.app.state.jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail='Job is not queued or running in this process')
+    return {'job_id': job_id, 'status': 'cancelling'}
+
+
+@router.post('/profiler/start')
+async def start_profiler(params: ProfilerStart):
+    """
+    Увімкнути семплювальне профілювання на seconds секунд або на наступні requests запитів
+    (route - шаблон маршруту, наприклад /learn/course/{course_id}/test/{test_id}, або шлях)
+    """
+    if (params.seconds is None) == (params.requests is None):
+        raise HTTPException(status_code=400, detail='Specify either seconds or requests')
+    try:
+        return profiler.start(params.seconds, params.requests, params.route, params.interval_ms)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post('/profiler/stop')
+async def stop_profiler():
+    """
+    Зупинити профілювання (зібрані стеки залишаються доступними)
+    """
+    return profiler.stop()
+
+
+@router.get('/profiler')
+async def get_profiler_status():
+    """
+    Стан поточного або останнього профілювання: запити, семпли, частка CPU / очікування aiosqlite
+    """
+    return profiler.status()
+
+
+@router.get('/profiler/profile')
+async def download_profile(format: str = 'collapsed'):
+    """
+    Агреговані стеки: format=collapsed (flamegraph.pl, inferno) або speedscope (https://www.speedscope.app)
+    """
+    session = profiler.profile()
+    if session is None:
+        raise HTTPException(status_code=404, detail='No profile recorded')
+    if format == 'speedscope':
+        return JSONResponse(profiler.speedscope(session),
+                            headers={'Content-Disposition': 'attachment; filename="profile.speedscope.json"'})
+    if format != 'collapsed':
+        raise HTTPException(status_code=400, detail='Unknown format, expected collapsed or speedscope')
+    return PlainTextResponse(profiler.collapsed(session),
+                             headers={'Content-Disposition': 'attachment; filename="profile.collapsed.txt"'})
@@ -1,16 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
 from core.database import db_func
-from core.database.models import TestResultModel
+from core.database.db import async_session_maker
+from core.database.models import TestResultModel, UserModel
 from core.patterns import (
     AdvancedFactory,
     BeginnerFactory
 )
-from core.schemas import ResourceRead, LessonRead, CourseRead, TestReadForStudent, TestSubmission, TestResultResponse
-from core.utils.auth import get_default_user
+from core.schemas import (
+    ResourceRead, LessonRead, CourseRead, TestReadForStudent, TestSubmission, TestResultResponse,
+    LeaderboardRead, LeaderboardEntry, MyStandingRead, CourseProgress, TestProgress, UserAnswer, DraftRead,
+    AttemptRead, AttemptSubmission, QuestionRead, AnswerOptionReadForStudent, Suggestion,
+    RelatedCoursesRead, CodeRunResult, ReviewCard, ReviewNext, ReviewGrade, ReviewState, Prerequisite,
+    CoursePrerequisitesRead
+)
+from core.exam.bank import QuestionBankEngine, SampledTest
+from core.exam.review import ReviewScheduler, INITIAL_EASE
+from core.exam.sessions import ExamSessionStore
+from core.sandbox.pool import SandboxPool, SandboxUnavailable
+from core.search.suggest import SuggestIndex, KINDS, SUGGEST_LIMIT
+from core.stats.feed import ResultsFeed
+from core.stats.leaderboard import LeaderboardManager, LEADERBOARD_SIZE
+from core.stats.related import CourseRecommender
+from core.utils.auth import get_default_user, get_user_by_token
+from core.utils.ratelimit import WriteRateLimit
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+
+write_limit = WriteRateLimit('learn', '1/10')
+
+# Курс-передумова завершений, якщо в кожному його тесті найкращий бал - щонайменше ця частка max_score
+PREREQUISITE_PASS_SCORE = float(os.getenv('PREREQUISITE_PASS_SCORE', '0.6'))
+
+router = APIRouter(
+    prefix='/learn',
+    dependencies=[Depends(get_default_user), Depends(write_limit)],
+    tags=['Learn']
+)
+
+# WebSocket-маршрути автентифікуються самі (один раз на з'єднання),
+# тому не мають HTTP-залежностей роутера learn
+exam_router = APIRouter(prefix='/learn', tags=['Learn'])
+
+
+async def check_prerequisites(db: AsyncSession, user_id: int, course_id: int):
+    """403, якщо студент не завершив усі (транзитивні) передумови курсу."""
+    prerequisites = await db_func.get_course_prerequisites(db, course_id, user_id, PREREQUISITE_PASS_SCORE)
+    missing = [prerequisite_id for prerequisite_id, _, _, completed in prerequisites if not completed]
+    if missing:
+        raise HTTPException(status_code=403, detail=f'Complete prerequisite courses first: {missing}')
+
 
-router = APIRouter(prefix='/learn', dependencies=[Depends(get_default_user)], tags=['Learn'])
+async def check_whole_test(db: AsyncSession, user_id: int, test_id: int, course_id: Optional[int] = None):
+    """
+    Перевірити, що тест можна проходити цілим (перегляд, здача, чернетка, WebSocket).
+
+    404 - тесту немає або він з іншого курсу, ніж course_id; 409 - тест-банк (проходиться
+    лише спробами з sample_size питань, інакше віддавався б увесь банк, а бал рахувався б
+    від усіх його питань); 403 - не завершені передумови курсу. Питання не завантажуються.
+    """
+    test = await db_func.get_test_info(db, test_id)
+    if test is None or (course_id is not None and test.course_id != course_id):
+        raise HTTPException(status_code=404, detail='Test not found')
+    if test.sample_size:
+        raise HTTPException(status_code=409, detail='Question bank test, start an attempt: '
+                                                    f'POST /learn/course/{test.course_id}/test/{test_id}/attempt')
+    await check_prerequisites(db, user_id, test.course_id)
 
 
 @router.get('/lesson/id/{lesson_id}')
@@ -40,6 +97,88 @@ async def get_resources(level: str, db: AsyncSession = Depends(db_func.get_db)):
     """
     return await db_func.get_resources_by_level(db, level)
 
+@router.post('/resource/{resource_id}/run', response_model=CodeRunResult)
+async def run_code_example(
+        resource_id: int,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Виконати код ресурсу CodeExample в ізольованому процесі (результат кешується за хешем коду).
+    Без ізоляції (SANDBOX_ISOLATION=off) - лише для викладачів
+    """
+    sandbox: SandboxPool = request.app.state.sandbox
+    if not sandbox.isolated and user.role == 'student':
+        raise HTTPException(status_code=403, detail='Sandbox isolation is off: code examples run for teachers only')
+    resources = await db_func.get_resources_by_ids(db, [resource_id])
+    if not resources:
+        raise HTTPException(status_code=404, detail='Resource not found')
+    if resources[0].type != 'CodeExample' or not resources[0].code:
+        raise HTTPException(status_code=400, detail='Resource has no code to run')
+    try:
+        return CodeRunResult(resource_id=resource_id, **await sandbox.run(resources[0].code))
+    except SandboxUnavailable as e:
+        raise HTTPException(status_code=503, detail=f'Sandbox is unavailable: {e}')
+
+@router.get('/suggest', response_model=List[Suggestion])
+async def suggest(
+        request: Request,
+        q: str = Query(..., min_length=1, max_length=200),
+        limit: int = Query(SUGGEST_LIMIT, ge=1, le=50),
+        kinds: Optional[List[str]] = Query(None)
+):
+    """
+    Автодоповнення: уроки, ресурси, курси й тести, в назві яких з q починається назва або слово
+    """
+    if kinds and not set(kinds) <= set(KINDS):
+        raise HTTPException(status_code=400, detail=f'Unknown kind, expected any of {list(KINDS)}')
+    index: SuggestIndex = request.app.state.suggest
+    return index.suggest(q, limit, kinds)
+
+@router.get('/review/next', response_model=ReviewNext)
+async def get_next_review(
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Наступна картка інтервального повторення (Quiz): найдавніше прострочена, інакше нова
+    """
+    reviews: ReviewScheduler = request.app.state.reviews
+    deck = await reviews.deck(db, user.id)
+    resource_id, is_new, due_at = reviews.next(deck)
+    if resource_id is None:
+        return ReviewNext(card=None, next_due_at=due_at)
+    resource = (await db_func.get_resources_by_ids(db, [resource_id]))[0]
+    state = {'reps': 0, 'interval': 0, 'ease': INITIAL_EASE} if is_new else deck.state(deck.slot_of(resource_id))
+    card = ReviewCard(resource_id=resource_id, title=resource.title, difficulty=resource.difficulty,
+                      question=resource.question, answer=resource.answer, is_new=is_new,
+                      due_at=None if is_new else due_at, reps=state['reps'], interval=state['interval'],
+                      ease=state['ease'])
+    return ReviewNext(card=card, next_due_at=due_at)
+
+@router.post('/review/{resource_id}', response_model=ReviewState)
+async def review_card(
+        resource_id: int,
+        review: ReviewGrade,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Оцінити відповідь на картку (grade 0-5, менше 3 - не згадав) і запланувати наступне повторення (SM-2)
+    """
+    if not 0 <= review.grade <= 5:
+        raise HTTPException(status_code=400, detail='Grade must be between 0 and 5')
+    reviews: ReviewScheduler = request.app.state.reviews
+    if not reviews.is_quiz(resource_id):
+        raise HTTPException(status_code=404, detail='Quiz not found')
+    deck = await reviews.deck(db, user.id)
+    state = reviews.review(deck, resource_id, review.grade)
+    await reviews.save(deck)
+    return state
+
 @router.get('/courses/', response_model=List[CourseRead])
 async def list_courses(db: AsyncSession = Depends(db_func.get_db)):
     """
@@ -47,28 +186,197 @@ async def list_courses(db: AsyncSession = Depends(db_func.get_db)):
     """
     return await db_func.get_courses(db)
 
+@router.get('/course/{course_id}/related', response_model=RelatedCoursesRead)
+async def get_related_courses(course_id: int, request: Request, db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Схожі курси (спільні ресурси) та курси, які проходили студенти, що пройшли цей курс
+    """
+    related: CourseRecommender = request.app.state.related
+    report = related.get(course_id)
+    if report is not None:
+        return report
+    if not await db_func.course_exists(db, course_id):
+        raise HTTPException(status_code=404, detail='Course not found')
+    return RelatedCoursesRead(course_id=course_id, similar=[], also_took=[], computed_at=related.computed_at)
+
+@router.get('/course/{course_id}/prerequisites', response_model=CoursePrerequisitesRead)
+async def get_course_prerequisites(
+        course_id: int,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Повний ланцюжок передумов курсу (спочатку найвіддаленіші) і чи може студент його проходити
+    """
+    if not await db_func.course_exists(db, course_id):
+        raise HTTPException(status_code=404, detail='Course not found')
+    prerequisites = [
+        Prerequisite(course_id=prerequisite_id, title=title, depth=depth, completed=completed)
+        for prerequisite_id, title, depth, completed in
+        await db_func.get_course_prerequisites(db, course_id, user.id, PREREQUISITE_PASS_SCORE)
+    ]
+    return CoursePrerequisitesRead(course_id=course_id, can_take=all(p.completed for p in prerequisites),
+                                   prerequisites=prerequisites)
+
 @router.get('/course/{course_id}/test/{test_id}', response_model=TestReadForStudent)
-async def get_test_from_course_by_id(course_id: int, test_id: int, db: AsyncSession = Depends(db_func.get_db)):
+async def get_test_from_course_by_id(
+        course_id: int,
+        test_id: int,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
     """
     Отримання тестів за id курсу та id тесту
     """
-    course = await db_func.get_course_by_id(db, course_id)
-    if not course:
+    if not await db_func.course_exists(db, course_id):
         raise HTTPException(status_code=404, detail='Course not found')
-    test = await db_func.get_test_by_id(db, test_id)
-    if not test:
-        raise HTTPException(status_code=404, detail='Test not found')
+    await check_whole_test(db, user.id, test_id, course_id)
     return await db_func.get_test_for_student_by_id(db, test_id)
 
 @router.post('/course/test/submit', response_model=TestResultResponse)
-async def submit_test(submission: TestSubmission, db: AsyncSession = Depends(db_func.get_db)):
+async def submit_test(
+        submission: TestSubmission,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
     """
     Прийом відповідей студента на тест
     """
+    if submission.user_id != user.id:
+        raise HTTPException(status_code=403, detail='Cannot submit a test for another user')
+    await check_whole_test(db, user.id, submission.test_id)
     test = await db_func.get_test_by_id(db, submission.test_id)
-    if not test:
+    result = await db_func.save_test_result(db, test, submission)
+    feed: ResultsFeed = request.app.state.results_feed
+    feed.publish(test, result)
+    return result
+
+@router.post('/course/{course_id}/test/{test_id}/attempt', response_model=AttemptRead)
+async def start_attempt(
+        course_id: int,
+        test_id: int,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Нова спроба тесту-банку: випадкові sample_size питань, стратифіковано за складністю
+    """
+    banks: QuestionBankEngine = request.app.state.question_banks
+    bank = await banks.get(db, test_id)
+    if bank is None or bank.course_id != course_id:
         raise HTTPException(status_code=404, detail='Test not found')
-    return await db_func.save_test_result(db, test, submission)
+    await check_prerequisites(db, user.id, course_id)
+    if not len(bank):
+        raise HTTPException(status_code=400, detail='Question bank is empty')
+    seed, question_ids = banks.draw(bank)
+    attempt = await db_func.create_attempt(db, user.id, test_id, seed, question_ids)
+    questions = await db_func.get_questions_by_ids(db, question_ids)
+    return AttemptRead(
+        attempt_id=attempt.id,
+        test_id=test_id,
+        questions_count=len(questions),
+        questions=[
+            QuestionRead(id=q.id, text=q.text,
+                         options=[AnswerOptionReadForStudent(id=o.id, text=o.text) for o in q.options])
+            for q in questions
+        ]
+    )
+
+@router.post('/attempt/{attempt_id}/submit', response_model=TestResultResponse)
+async def submit_attempt(
+        attempt_id: int,
+        submission: AttemptSubmission,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Здати спробу тесту-банку: оцінюються лише питання, вибрані для цієї спроби
+    """
+    attempt = await db_func.get_attempt(db, attempt_id)
+    if attempt is None or attempt.user_id != user.id:
+        raise HTTPException(status_code=404, detail='Attempt not found')
+    bank = await request.app.state.question_banks.get(db, attempt.test_id)
+    if bank is None:
+        raise HTTPException(status_code=404, detail='Test not found')
+    if not await db_func.claim_attempt(db, attempt_id, user.id):
+        raise HTTPException(status_code=409, detail='Attempt already submitted')
+
+    question_ids = [int(q) for q in attempt.question_ids.split(',')]
+    test = SampledTest(bank.test_id, bank.course_id, bank.max_score,
+                       await db_func.get_questions_by_ids(db, question_ids))
+    # Одна відповідь на питання спроби (остання), відповіді на інші питання відкидаються
+    allowed = set(question_ids)
+    answers = {a.question_id: a.selected_option_id for a in submission.answers if a.question_id in allowed}
+    try:
+        result = await db_func.save_test_result(db, test, TestSubmission(
+            test_id=test.id,
+            user_id=user.id,
+            answers=[UserAnswer(question_id=q, selected_option_id=o) for q, o in answers.items()]
+        ))
+    except Exception:
+        await db.rollback()
+        await db_func.finish_attempt(db, attempt_id, None)
+        raise
+    await db_func.finish_attempt(db, attempt_id, result.id)
+    feed: ResultsFeed = request.app.state.results_feed
+    feed.publish(test, result)
+    return result
+
+@router.get('/course/{course_id}/leaderboard', response_model=LeaderboardRead)
+async def get_course_leaderboard(
+        course_id: int,
+        request: Request,
+        limit: int = Query(10, ge=1, le=LEADERBOARD_SIZE),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Рейтинг курсу: сума найкращих результатів (у % від max_score) по тестах курсу
+    """
+    leaderboards: LeaderboardManager = request.app.state.leaderboards
+    top = leaderboards.course_top(course_id, limit)
+    usernames = await db_func.get_usernames_by_ids(db, [user_id for user_id, _ in top])
+    return LeaderboardRead(course_id=course_id, entries=[
+        LeaderboardEntry(rank=i, user_id=user_id, username=usernames.get(user_id), score=round(score, 2))
+        for i, (user_id, score) in enumerate(top, start=1)
+    ])
+
+@router.get('/course/{course_id}/percentile', response_model=MyStandingRead)
+async def get_my_percentile(course_id: int, request: Request, user: UserModel = Depends(get_default_user)):
+    """
+    Місце та перцентиль поточного користувача в курсі та в кожному пройденому тесті курсу
+    """
+    leaderboards: LeaderboardManager = request.app.state.leaderboards
+    return MyStandingRead(
+        course_id=course_id,
+        course=leaderboards.course_standing(course_id, user.id),
+        tests=leaderboards.test_standings(course_id, user.id)
+    )
+
+@router.get('/progress', response_model=List[CourseProgress])
+async def get_my_progress(user: UserModel = Depends(get_default_user), db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Прогрес поточного користувача: пройдені тести та найкращі бали по кожному курсу
+    """
+    courses = {}
+    for row in await db_func.get_progress_by_user(db, user.id):
+        courses.setdefault(row.course_id, []).append(TestProgress(
+            test_id=row.test_id,
+            best_score=row.best_score,
+            attempts=row.attempts,
+            last_attempt_at=row.last_attempt_at
+        ))
+    return [
+        CourseProgress(
+            course_id=course_id,
+            completed_tests=len(tests),
+            best_score=max(t.best_score for t in tests),
+            tests=tests
+        )
+        for course_id, tests in courses.items()
+    ]
 
 @router.get('/example/{type}/{level}')
 async def get_example(example_type: str, level: str):
@@ -94,3 +402,135 @@ async def get_example(example_type: str, level: str):
     else:
         raise {"error": "Unsupported example level"}
 
+
+async def _grade_draft(app, db: AsyncSession, session) -> TestResultResponse:
+    """Оцінити чернетку, опублікувати результат у кеші та закрити сесію."""
+    sessions: ExamSessionStore = app.state.exam_sessions
+    test = await db_func.get_test_by_id(db, session.test_id)
+    result = await db_func.save_test_result(db, test, await sessions.submission(db, session))
+    app.state.results_feed.publish(test, result)
+    await sessions.close(session)
+    return TestResultResponse(test_id=result.test_id, user_id=result.user_id, score=result.score)
+
+@exam_router.put('/course/test/{test_id}/draft', response_model=DraftRead)
+async def autosave_answer(
+        test_id: int,
+        answer: UserAnswer,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Autosave однієї відповіді в чернетку (пам'ять; у test_drafts - пакетами у фоні,
+    при WORKERS > 1 - одразу)
+    """
+    sessions: ExamSessionStore = request.app.state.exam_sessions
+    await check_whole_test(db, user.id, test_id)
+    session = await sessions.open(db, user.id, test_id)
+    if not sessions.answer(session, answer.question_id, answer.selected_option_id):
+        raise HTTPException(status_code=400, detail='Invalid option')
+    await sessions.save(session)
+    return DraftRead(test_id=test_id, answered=len(session.answers), answers=session.answers)
+
+@exam_router.get('/course/test/{test_id}/draft', response_model=DraftRead)
+async def get_draft(
+        test_id: int,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Поточна чернетка відповідей на тест
+    """
+    await check_whole_test(db, user.id, test_id)
+    session = await request.app.state.exam_sessions.open(db, user.id, test_id)
+    return DraftRead(test_id=test_id, answered=len(session.answers), answers=session.answers)
+
+@exam_router.post('/course/test/{test_id}/draft/submit', response_model=TestResultResponse,
+                  dependencies=[Depends(write_limit)])
+async def submit_draft(
+        test_id: int,
+        request: Request,
+        user: UserModel = Depends(get_default_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Здати тест з відповідями з чернетки (без повторної передачі всіх відповідей)
+    """
+    await check_whole_test(db, user.id, test_id)
+    session = await request.app.state.exam_sessions.open(db, user.id, test_id)
+    return await _grade_draft(request.app, db, session)
+
+@exam_router.websocket('/course/{course_id}/test/{test_id}/ws')
+async def exam_session(websocket: WebSocket, course_id: int, test_id: int, token: Optional[str] = None):
+    """
+    Сесія проходження тесту через WebSocket.
+
+    Токен передається в query (?token=...) або в заголовку Authorization і
+    перевіряється один раз. Після підключення сервер надсилає
+    {"type": "test", "test": TestReadForStudent, "answers": {question_id: option_id}}
+    (answers - вже збережені відповіді при повторному підключенні).
+
+    Повідомлення клієнта:
+        {"type": "answer", "question_id": 1, "selected_option_id": 3} -> {"type": "ack", "answered": n}
+        {"type": "answers", "answers": [UserAnswer, ...]}              -> {"type": "ack", "answered": n}
+        {"type": "submit"} -> {"type": "result", "result": TestResultResponse}, з'єднання закривається
+
+    Відповіді - та сама чернетка, що й в autosave-ендпоінтах: пам'ять плюс фоновий
+    запис у test_drafts; синхронно до БД звертаються лише при підключенні та здачі
+    (при WORKERS > 1 - ще й при кожній відповіді, див. ExamSessionStore).
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get('authorization', '').partition(' ')
+        token = credentials if scheme.lower() == 'bearer' else None
+    try:
+        async with async_session_maker() as db:
+            user = await get_user_by_token(db, token or '')
+            await check_whole_test(db, user.id, test_id, course_id)
+            test = await db_func.get_test_for_student_by_id(db, test_id)
+            sessions: ExamSessionStore = websocket.app.state.exam_sessions
+            session = await sessions.open(db, user.id, test_id, test)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+
+    await websocket.accept()
+    await websocket.send_json({
+        'type': 'test',
+        'test': test.model_dump(mode='json'),
+        'answers': {str(q): o for q, o in session.answers.items()},
+    })
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                if not isinstance(message, dict):
+                    raise ValueError('Message must be a JSON object')
+                kind = message.get('type')
+                if kind in ('answer', 'answers'):
+                    answers = [UserAnswer(**a) for a in message['answers']] if kind == 'answers' \
+                        else [UserAnswer(**message)]
+                    rejected = [a.question_id for a in answers
+                                if not sessions.answer(session, a.question_id, a.selected_option_id)]
+                    await sessions.save(session)
+                    if rejected:
+                        await websocket.send_json({'type': 'error', 'detail': 'Invalid option', 'questions': rejected})
+                    await websocket.send_json({'type': 'ack', 'answered': len(session.answers)})
+                elif kind == 'submit':
+                    wait = write_limit.limiter.acquire(user.id) if write_limit.limiter else 0.0
+                    if wait:
+                        await websocket.send_json({'type': 'error', 'detail': 'Too many requests',
+                                                   'retry_after': wait})
+                        continue
+                    async with async_session_maker() as db:
+                        result = await _grade_draft(websocket.app, db, session)
+                    await websocket.send_json({'type': 'result', 'result': result.model_dump()})
+                    await websocket.close()
+                    return
+                else:
+                    await websocket.send_json({'type': 'error', 'detail': f'Unknown message type: {kind}'})
+            except (ValueError, KeyError, TypeError, ValidationError):
+                await websocket.send_json({'type': 'error', 'detail': 'Malformed message'})
+    except WebSocketDisconnect:
+        pass  # сесія лишається в пам'яті до повторного підключення
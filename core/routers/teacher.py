@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, Request
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.utils.auth import get_teacher_user
+from core.database.models import UserModel
+from core.utils.ratelimit import WriteRateLimit
+from core.utils.export import export_response, in_session
 from core.schemas import (
     LessonRead, LessonCreate, ResourceCreate,
     CourseRead, CourseCreate, TestRead,
-    TestCreate
+    TestCreate, TestAnalyticsRead, QuestionCreate, QuestionBankRead,
+    JobRead, GradebookExportJob, SimilarPair, SimilarityReport
 )
 from core.database import LessonModel, ResourceModel, db_func
 from core.patterns import (
@@ -16,9 +23,18 @@ from core.patterns import (
     CourseBuilder,
     CodeExample,
     Quiz)
+from core.stats.analytics import TestAnalyticsEngine
+from core.exam.bank import QuestionBankEngine
+from core.exam import similarity
+from core.jobs.runner import JobRunner
+from typing import List, Optional
 
 
-router = APIRouter(prefix='/teacher', dependencies=[Depends(get_teacher_user)], tags=['Teacher'])
+router = APIRouter(
+    prefix='/teacher',
+    dependencies=[Depends(get_teacher_user), Depends(WriteRateLimit('teacher', '2/20'))],
+    tags=['Teacher']
+)
 
 @router.post('/lesson/', response_model=LessonRead)
 async def create_lesson(
@@ -33,6 +49,7 @@ async def create_lesson(
     lesson = LessonModel(**lesson.dict())
     await db_func.add_to_db(db, lesson)
     await stats.increment_lessons()
+    request.app.state.suggest.add('lesson', lesson.id, lesson.title)
     return LessonRead(id=lesson.id, title=lesson.title, difficulty=lesson.difficulty, content=lesson.content)
 
 @router.post('/lesson/title/{title}/clone')
@@ -46,11 +63,13 @@ async def clone_lesson(
     Клонувати урок (патерн Прототип) і зберегти копію в SQLite
     """
     stats: StatisticsManager = request.app.state.stats
-    lesson = db_func.get_lesson_by_title(db, title)
+    lesson = await db_func.get_lesson_by_title(db, title)
     if lesson:
-        new_lesson = Lesson(new_title, lesson.difficulty, lesson.content).clone()
+        prototype = Lesson(new_title, lesson.difficulty, lesson.content).clone()
+        new_lesson = LessonModel(title=prototype.title, difficulty=prototype.difficulty, content=prototype.content)
         await db_func.add_to_db(db, new_lesson)
         await stats.increment_clones()
+        request.app.state.suggest.add('lesson', new_lesson.id, new_lesson.title)
         return {'status': 'cloned',
                 'lesson': {
                     'title': new_title,
@@ -80,7 +99,11 @@ async def create_resource(
         await stats.increment_resources()
     else:
         raise {"error": "Unsupported resource type"}
-    return await db_func.get_resource_by_title(db, created.title)
+    saved = await db_func.get_resource_by_title(db, created.title)
+    request.app.state.suggest.add('resource', saved.id, saved.title)
+    if saved.type == 'Quiz':
+        request.app.state.reviews.add_quiz(saved.id)
+    return saved
 
 @router.post('/course/', response_model=CourseRead)
 async def create_course(
@@ -103,14 +126,244 @@ async def create_course(
 
     db_course = await builder.build_and_save()
     await stats.increment_courses()
+    request.app.state.suggest.add('course', db_course.id, db_course.title)
     return db_course
 
+@router.post('/course/{course_id}/prerequisite/{prerequisite_id}')
+async def add_course_prerequisite(course_id: int, prerequisite_id: int, db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Додати передумову курсу (курс можна проходити лише після завершення prerequisite_id); цикли відхиляються
+    """
+    if not await db_func.course_exists(db, course_id) or not await db_func.course_exists(db, prerequisite_id):
+        raise HTTPException(status_code=404, detail='Course not found')
+    status = await db_func.add_course_prerequisite(db, course_id, prerequisite_id)
+    if status == 'cycle':
+        raise HTTPException(status_code=409, detail='Prerequisite would create a cycle')
+    return {'course_id': course_id, 'prerequisite_id': prerequisite_id, 'status': status}
+
+@router.delete('/course/{course_id}/prerequisite/{prerequisite_id}')
+async def remove_course_prerequisite(course_id: int, prerequisite_id: int, db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Прибрати передумову курсу
+    """
+    if not await db_func.remove_course_prerequisite(db, course_id, prerequisite_id):
+        raise HTTPException(status_code=404, detail='Prerequisite not found')
+    return {'course_id': course_id, 'prerequisite_id': prerequisite_id, 'status': 'removed'}
+
 @router.post('/test', response_model=TestRead)
 async def create_test(
         test: TestCreate,
+        request: Request,
         db: AsyncSession = Depends(db_func.get_db)
 ):
     """
     Додати новий тест
     """
-    return await db_func.create_test(db, test)
+    created = await db_func.create_test(db, test)
+    request.app.state.suggest.add('test', created.id, created.title)
+    return created
+
+@router.post('/test/{test_id}/bank', response_model=QuestionBankRead)
+async def add_bank_questions(
+        test_id: int,
+        questions: List[QuestionCreate],
+        request: Request,
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Додати пакет питань (з рівнем складності) в банк тесту
+    """
+    banks: QuestionBankEngine = request.app.state.question_banks
+    if await banks.get(db, test_id) is None:
+        raise HTTPException(status_code=404, detail='Test not found')
+    await db_func.add_bank_questions(db, test_id, questions)
+    banks.invalidate(test_id)
+    return (await banks.get(db, test_id)).summary()
+
+@router.get('/test/{test_id}/bank', response_model=QuestionBankRead)
+async def get_bank(test_id: int, request: Request, db: AsyncSession = Depends(db_func.get_db)):
+    """
+    Розмір банку питань тесту та кількість питань у кожній страті складності
+    """
+    bank = await request.app.state.question_banks.get(db, test_id)
+    if bank is None:
+        raise HTTPException(status_code=404, detail='Test not found')
+    return bank.summary()
+
+@router.get('/test/{test_id}/analytics', response_model=TestAnalyticsRead)
+async def get_test_analytics(test_id: int, request: Request, recompute: bool = False):
+    """
+    Аналітика тесту: розподіл балів, середнє, перцентилі, складність та дискримінація питань.
+    Параметр recompute=true перераховує показники з усієї історії замість інкрементальних.
+    """
+    analytics: TestAnalyticsEngine = request.app.state.analytics
+    if recompute:
+        await analytics.rebuild_test(test_id)
+    report = analytics.report(test_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail='Test not found')
+    return report
+
+@router.get('/test/{test_id}/similarity', response_model=SimilarityReport)
+async def get_answer_similarity(
+        test_id: int,
+        min_shared: int = Query(similarity.SIMILARITY_MIN_SHARED, ge=1),
+        max_p: Optional[float] = Query(None, gt=0, le=1),
+        limit: int = Query(100, ge=1, le=1000),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Пари спроб з підозріло однаковими хибними відповідями (можливе списування), найпідозріліші першими.
+    max_p за замовчуванням залежить від кількості спроб (див. SIMILARITY_ALPHA)
+    """
+    args = similarity.load(await db_func.get_answer_columns(db, test_id))
+    if args is None:
+        raise HTTPException(status_code=404, detail='Test not found')
+    # Векторні обчислення NumPy - в окремому потоці, щоб не зупиняти event loop
+    report = await asyncio.to_thread(similarity.detect, *args, min_shared, max_p)
+    result_ids, user_ids, _ = args
+    a, b = report['a'][:limit], report['b'][:limit]
+    users = {int(user_ids[row]) for row in a.tolist() + b.tolist() if user_ids[row] > 0}
+    usernames = await db_func.get_usernames_by_ids(db, sorted(users))
+
+    def user(row):
+        user_id = int(user_ids[row])
+        return (user_id, usernames.get(user_id)) if user_id > 0 else (None, None)
+
+    pairs = []
+    for i, (left, right) in enumerate(zip(a.tolist(), b.tolist())):
+        (user_a, username_a), (user_b, username_b) = user(left), user(right)
+        pairs.append(SimilarPair(
+            result_a=int(result_ids[left]), user_a=user_a, username_a=username_a, wrong_a=int(report['wrong'][left]),
+            result_b=int(result_ids[right]), user_b=user_b, username_b=username_b, wrong_b=int(report['wrong'][right]),
+            shared=int(report['shared'][i]), expected=round(float(report['expected'][i]), 3),
+            p_value=float(f"{report['p'][i]:.3g}")
+        ))
+    return SimilarityReport(test_id=test_id, submissions=report['submissions'], questions=report['questions'],
+                            candidates=report['candidates'], max_p=float(f"{report['max_p']:.3g}"), flagged=len(report['a']), pairs=pairs)
+
+@router.get('/course/{course_id}/gradebook')
+async def export_gradebook(
+        course_id: int,
+        format: str = Query('csv', pattern='^(csv|ndjson)$'),
+        gzip: bool = False,
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Журнал курсу (студенти × тести, найкращий бал) у CSV або NDJSON, потоково.
+    Параметр gzip=true стискає файл на льоту.
+    """
+    if not await db_func.course_exists(db, course_id):
+        raise HTTPException(status_code=404, detail='Course not found')
+    test_ids = await db_func.get_course_test_ids(db, course_id)
+    header = ['user_id', 'username'] + [f'test_{test_id}' for test_id in test_ids]
+    return export_response(f'gradebook_course_{course_id}', format, header,
+                           in_session(db_func.stream_gradebook, course_id, test_ids), gzip)
+
+@router.get('/test/{test_id}/results/export')
+async def export_test_results(
+        test_id: int,
+        format: str = Query('csv', pattern='^(csv|ndjson)$'),
+        gzip: bool = False,
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Усі спроби тесту (result_id, user_id, username, score) у CSV або NDJSON, потоково
+    """
+    if not await db_func.test_exists(db, test_id):
+        raise HTTPException(status_code=404, detail='Test not found')
+    return export_response(f'results_test_{test_id}', format, ['result_id', 'user_id', 'username', 'score'],
+                           in_session(db_func.stream_test_results, test_id), gzip)
+
+
+async def _own_job(db: AsyncSession, job_id: int, user: UserModel):
+    job = await db_func.get_job(db, job_id)
+    if job is None or (job.user_id != user.id and user.role != 'admin'):
+        raise HTTPException(status_code=404, detail='Job not found')
+    return job
+
+@router.post('/jobs/gradebook-export', response_model=JobRead)
+async def start_gradebook_export(
+        export: GradebookExportJob,
+        request: Request,
+        user: UserModel = Depends(get_teacher_user)
+):
+    """
+    Фоновий експорт журналу курсу у файл; завантаження - /teacher/jobs/{job_id}/download
+    """
+    if export.format not in ('csv', 'ndjson'):
+        raise HTTPException(status_code=400, detail='Unsupported format')
+    jobs: JobRunner = request.app.state.jobs
+    return jobs.describe(await jobs.submit('gradebook_export', export.model_dump(), user.id))
+
+@router.post('/test/{test_id}/bank/import', response_model=JobRead)
+async def start_bank_import(
+        test_id: int,
+        questions: List[QuestionCreate],
+        request: Request,
+        user: UserModel = Depends(get_teacher_user)
+):
+    """
+    Фонове додавання великого пакета питань у банк тесту (з прогресом)
+    """
+    jobs: JobRunner = request.app.state.jobs
+    job = await jobs.submit('bank_import', {'test_id': test_id, 'questions': [q.model_dump() for q in questions]}, user.id)
+    return jobs.describe(job)
+
+@router.post('/test/{test_id}/regrade', response_model=JobRead)
+async def start_regrade(test_id: int, request: Request, user: UserModel = Depends(get_teacher_user)):
+    """
+    Фонова повторна перевірка всіх спроб тесту за поточними правильними варіантами
+    """
+    jobs: JobRunner = request.app.state.jobs
+    return jobs.describe(await jobs.submit('regrade_test', {'test_id': test_id}, user.id))
+
+@router.post('/test/{test_id}/analytics/recompute', response_model=JobRead)
+async def start_analytics_recompute(test_id: int, request: Request, user: UserModel = Depends(get_teacher_user)):
+    """
+    Фоновий перерахунок аналітики тесту з усієї історії
+    """
+    jobs: JobRunner = request.app.state.jobs
+    return jobs.describe(await jobs.submit('analytics_recompute', {'test_id': test_id}, user.id))
+
+@router.get('/jobs', response_model=List[JobRead])
+async def list_my_jobs(
+        request: Request,
+        user: UserModel = Depends(get_teacher_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Останні фонові завдання поточного викладача
+    """
+    jobs: JobRunner = request.app.state.jobs
+    return [jobs.describe(job) for job in await db_func.list_jobs(db, user_id=user.id)]
+
+@router.get('/jobs/{job_id}', response_model=JobRead)
+async def get_job_status(
+        job_id: int,
+        request: Request,
+        user: UserModel = Depends(get_teacher_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Стан, прогрес і результат фонового завдання
+    """
+    return request.app.state.jobs.describe(await _own_job(db, job_id, user))
+
+@router.get('/jobs/{job_id}/download')
+async def download_job_file(
+        job_id: int,
+        request: Request,
+        user: UserModel = Depends(get_teacher_user),
+        db: AsyncSession = Depends(db_func.get_db)
+):
+    """
+    Завантажити файл, створений завершеним завданням експорту
+    """
+    job = request.app.state.jobs.describe(await _own_job(db, job_id, user))
+    path = (job.result or {}).get('path')
+    if job.status != 'done' or not path or not os.path.exists(path):
+        raise HTTPException(status_code=409, detail='Job has no file to download')
+    # mimetypes визначає .csv.gz як text/csv з кодуванням gzip - віддаємо як архів
+    media_type = 'application/gzip' if path.endswith('.gz') else None
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
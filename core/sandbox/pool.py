@@ -0,0 +1,423 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional
+from core.database.metrics import LatencyHistogram
+from core.utils.singleflight import flights
+
+logger = logging.getLogger('uvicorn.error')
+
+# Кількість прогрітих процесів-виконавців (водночас виконується не більше стількох прикладів)
+SANDBOX_WORKERS = int(os.getenv('SANDBOX_WORKERS', '2'))
+# Ліміти одного запуску: процесорний час (секунди), адресний простір (МБ) та загальний час очікування
+SANDBOX_CPU_SECONDS = int(os.getenv('SANDBOX_CPU_SECONDS', '2'))
+SANDBOX_MEMORY_MB = int(os.getenv('SANDBOX_MEMORY_MB', '256'))
+SANDBOX_TIMEOUT = float(os.getenv('SANDBOX_TIMEOUT', '5'))
+# Скільки результатів зберігається в LRU-кеші за хешем коду
+SANDBOX_CACHE_SIZE = int(os.getenv('SANDBOX_CACHE_SIZE', '512'))
+# Межа stdout/stderr, символів (решта відкидається, truncated=True)
+MAX_OUTPUT = 16_384
+# 'on' - виконавець ізолюється простором імен (Linux): без мережі, порожня файлова система лише
+# для читання, непривілейований користувач; без ізоляції ('off') запуск доступний лише викладачам
+SANDBOX_ISOLATION = os.getenv('SANDBOX_ISOLATION', 'on') != 'off'
+# Каталоги, видимі ізольованому виконавцю (лише читання): стандартна бібліотека та системні бібліотеки
+SANDBOX_READONLY = sorted({os.path.join(sys.base_prefix, 'lib'), '/lib', '/lib64', '/usr/lib', '/usr/lib64'})
+
+# Код процесу-виконавця (python -I -S -c). Інтерпретатор стартує заздалегідь і
+# чекає на код у stdin; ізоляція (confine) - до повідомлення ready, ліміти - після
+# старту, перед виконанням коду. Вивід прикладу перехоплюється в обмежені буфери,
+# а результат - JSON в окремий дескриптор (fd 1 прикладу веде в /dev/null).
+# Останній вираз виводиться як у REPL.
+BOOTSTRAP = r'''
+import ast, ctypes, io, json, os, resource, signal, sys, traceback
+cpu, memory, limit, isolate = map(int, sys.argv[1:5])
+readonly = sys.argv[5:]
+
+CLONE_NEWNS, CLONE_NEWUTS, CLONE_NEWIPC, CLONE_NEWUSER, CLONE_NEWPID, CLONE_NEWNET = \
+    0x20000, 0x4000000, 0x8000000, 0x10000000, 0x20000000, 0x40000000
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_NOEXEC, MS_REMOUNT, MS_BIND, MS_REC, MS_PRIVATE = \
+    1, 2, 4, 8, 32, 4096, 16384, 1 << 18
+SYS_PIVOT_ROOT = {'x86_64': 155, 'aarch64': 41}
+NOBODY = 65534
+
+
+def confine(root):
+    """
+    Нові простори імен: mount (порожній tmpfs root лише для читання з readonly-каталогами),
+    net (без інтерфейсів, крім вимкненого lo), ipc, uts та pid; потім - без привілеїв.
+    Root переходить у nobody, інший користувач - у власний user namespace без capabilities.
+
+    Код виконує дочірній процес - PID 1 нового pid namespace: процесів сервісу (API
+    worker, інші виконавці) він не бачить, тому os.kill(pid, ...) чи kill(-1) їх не
+    досягають навіть з тим самим uid. Батьківський процес лише чекає на нього і
+    завершується з тим самим кодом або сигналом; повертається з confine тільки дитина.
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+
+    def check(code):
+        if code != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+    def mount(source, target, fstype, flags, data=None):
+        check(libc.mount(source and source.encode(), target.encode(), fstype and fstype.encode(),
+                         ctypes.c_ulong(flags), data and data.encode()))
+
+    uid, gid = os.getuid(), os.getgid()
+    server = os.getppid()
+    check(libc.unshare(CLONE_NEWNS | CLONE_NEWNET | CLONE_NEWIPC | CLONE_NEWUTS | CLONE_NEWPID
+                       | (CLONE_NEWUSER if uid else 0)))
+    if uid:
+        for name, value in (('setgroups', 'deny'), ('uid_map', f'{uid} {uid} 1'), ('gid_map', f'{gid} {gid} 1')):
+            with open(f'/proc/self/{name}', 'w') as file:
+                file.write(value)
+    mount(None, '/', None, MS_REC | MS_PRIVATE)
+    mount('tmpfs', root, 'tmpfs', MS_NOSUID | MS_NODEV, 'size=64k,mode=755')
+    bound = []
+    for path in readonly:
+        target = root + path
+        if os.path.islink(path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.symlink(os.readlink(path), target)
+        elif os.path.isdir(path) and not any(path.startswith(b + '/') for b in bound):
+            os.makedirs(target, exist_ok=True)
+            mount(path, target, None, MS_BIND | MS_REC)
+            # nosuid/nodev/noexec вихідного монтування в user namespace зняти не можна
+            kept = os.statvfs(target).f_flag & (MS_NOSUID | MS_NODEV | MS_NOEXEC)
+            mount(None, target, None, MS_REMOUNT | MS_BIND | MS_RDONLY | kept)
+            bound.append(path)
+    os.chdir(root)
+    os.mkdir('.old')
+    check(libc.syscall(ctypes.c_long(SYS_PIVOT_ROOT[os.uname().machine]), b'.', b'.old'))
+    check(libc.umount2(b'.old', 2))  # MNT_DETACH
+    os.rmdir('.old')
+    mount(None, '/', None, MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+    os.chdir('/')
+
+    child = os.fork()
+    if child:
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        _, status, usage = os.wait4(child, 0)
+        if os.WIFEXITED(status):
+            os._exit(os.WEXITSTATUS(status))
+        sig = os.WTERMSIG(status)
+        # PID 1 ігнорує SIGXCPU, тож ліміт CPU закінчується SIGKILL на жорсткій межі
+        if sig == signal.SIGKILL and usage.ru_utime + usage.ru_stime >= cpu:
+            sig = signal.SIGXCPU
+        if sig != signal.SIGKILL:
+            signal.signal(sig, signal.SIG_DFL)
+        os.kill(os.getpid(), sig)
+        os._exit(1)
+    os.setsid()
+    if uid == 0:
+        os.setgroups([])
+        os.setgid(NOBODY)
+        os.setuid(NOBODY)
+    else:
+        class Header(ctypes.Structure):
+            _fields_ = [('version', ctypes.c_uint32), ('pid', ctypes.c_int)]
+        check(libc.capset(ctypes.byref(Header(0x20080522, 0)), (ctypes.c_uint32 * 6)()))
+    check(libc.prctl(1, signal.SIGKILL, 0, 0, 0))  # PR_SET_PDEATHSIG (setuid його скидає)
+    check(libc.prctl(38, 1, 0, 0, 0))  # PR_SET_NO_NEW_PRIVS
+    # Процес сервера має бути недосяжним (ESRCH - поза pid namespace)
+    try:
+        os.kill(server, 0)
+    except ProcessLookupError:
+        pass
+    else:
+        raise OSError(f'server process {server} is reachable from the sandbox')
+
+
+class Capped(io.StringIO):
+    truncated = False
+    def write(self, s):
+        room = limit - self.tell()
+        if len(s) > room:
+            self.truncated = True
+            s = s[:max(room, 0)]
+        super().write(s)
+        return len(s)
+
+result = os.fdopen(os.dup(1), 'w')
+os.dup2(os.open(os.devnull, os.O_RDWR), 1)
+if isolate:
+    try:
+        confine(os.getcwd())
+    except Exception as e:
+        result.write(f'isolation failed: {type(e).__name__}: {e}\n')
+        result.flush()
+        os._exit(1)
+result.write('ready\n')
+result.flush()
+code = sys.stdin.read()
+
+for name, value in (('RLIMIT_CPU', (cpu, cpu + 1)), ('RLIMIT_AS', (memory, memory)),
+                    ('RLIMIT_FSIZE', (0, 0)), ('RLIMIT_NPROC', (0, 0)), ('RLIMIT_CORE', (0, 0))):
+    try:
+        resource.setrlimit(getattr(resource, name), value)
+    except (AttributeError, ValueError, OSError):
+        pass
+
+stdout, stderr = Capped(), Capped()
+sys.stdout, sys.stderr = stdout, stderr
+status = 'ok'
+try:
+    tree = ast.parse(code, '<example>')
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    namespace = {'__name__': '__main__'}
+    exec(compile(tree, '<example>', 'exec'), namespace)
+    if last is not None:
+        value = eval(compile(ast.Expression(last.value), '<example>', 'eval'), namespace)
+        if value is not None:
+            print(repr(value))
+except SystemExit as e:
+    status = 'ok' if e.code in (None, 0) else 'error'
+except MemoryError:
+    status = 'memory_limit'
+except BaseException as e:
+    status = 'error'
+    tb = e.__traceback__.tb_next if e.__traceback__ else None  # без кадру виконавця
+    stderr.write(''.join(traceback.format_exception(type(e), e, tb)))
+result.write(json.dumps({'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(),
+                         'truncated': stdout.truncated or stderr.truncated}))
+result.flush()
+os._exit(0)
+'''
+
+
+class SandboxUnavailable(Exception):
+    pass
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+class SandboxPool:
+    """
+    Виконання прикладів коду (CodeExample) в ізольованих процесах (singleton).
+
+    Пул тримає SANDBOX_WORKERS прогрітих інтерпретаторів (python -I: без
+    змінних середовища, user site та поточного каталогу в sys.path), кожен
+    виконує рівно один приклад і завершується, а на його місце одразу
+    запускається новий - тому стан одного прикладу не потрапляє в інший, а
+    запит не чекає на старт інтерпретатора. Процес обмежується rlimit
+    (процесорний час, пам'ять, заборона запису файлів і fork) та загальним
+    тайм-аутом. Результати кешуються за sha256 коду (LRU); однакові паралельні
+    запуски об'єднуються (singleflight).
+
+    При isolated виконавець до отримання коду переходить у нові простори імен
+    Linux (confine у BOOTSTRAP): мережі немає, файлова система - порожній tmpfs
+    лише для читання зі стандартною та системними бібліотеками, користувач -
+    nobody (або власний без capabilities). Якщо ізоляція недоступна (не Linux,
+    заборонені простори імен), пул не запускає код взагалі (unavailable).
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.size = SANDBOX_WORKERS
+            cls._instance.isolated = SANDBOX_ISOLATION
+            cls._instance.unavailable = None
+            cls._instance.cache = OrderedDict()
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+            cls._instance.waiting = 0
+            cls._instance.busy = 0
+            cls._instance.spawned = 0
+            cls._instance.statuses = {}
+            cls._instance.queue_wait = LatencyHistogram()
+            cls._instance.run_time = LatencyHistogram()
+            cls._instance._idle = None
+            cls._instance._slots = None
+            cls._instance._spawning = set()
+        return cls._instance
+
+    def start(self):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.size)
+            for _ in range(self.size):
+                self._replenish()
+
+    async def stop(self):
+        for task in list(self._spawning):
+            task.cancel()
+        await asyncio.gather(*self._spawning, return_exceptions=True)
+        while self._idle is not None and not self._idle.empty():
+            proc = self._idle.get_nowait()
+            if proc is not None:
+                await self._kill(proc)
+        self._idle = None
+
+    def _replenish(self):
+        task = asyncio.create_task(self._spawn())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def _spawn(self):
+        # Окремий порожній каталог на кожен процес: файли одного прикладу не бачить наступний
+        workdir = tempfile.mkdtemp(prefix='sandbox-')
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, '-I', '-S', '-c', BOOTSTRAP,
+                str(SANDBOX_CPU_SECONDS), str(SANDBOX_MEMORY_MB * 1024 * 1024), str(MAX_OUTPUT),
+                str(int(self.isolated)), *SANDBOX_READONLY,
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL, cwd=workdir, env={}, start_new_session=True
+            )
+            proc.workdir = workdir
+            line = await proc.stdout.readline()
+            if line != b'ready\n':
+                await self._kill(proc)
+                if line.startswith(b'isolation failed'):
+                    # Повтор не допоможе: без ізоляції код не виконується (див. SANDBOX_ISOLATION)
+                    self.unavailable = line.decode(errors='replace').strip()
+                    logger.error('Sandbox is disabled: %s', self.unavailable)
+                    shutil.rmtree(workdir, ignore_errors=True)
+                    if self._idle is not None:
+                        self._idle.put_nowait(None)  # розбудити запити, що вже чекають на процес
+                    return
+                raise RuntimeError(f'Sandbox worker exited with code {proc.returncode}')
+        except Exception:
+            shutil.rmtree(workdir, ignore_errors=True)
+            logger.exception('Sandbox worker was not started')
+            await asyncio.sleep(1)
+            if self._idle is not None:
+                self._replenish()
+            return
+        self.spawned += 1
+        self._idle.put_nowait(proc)
+
+    @staticmethod
+    async def _kill(proc):
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+        shutil.rmtree(proc.workdir, ignore_errors=True)
+
+    @staticmethod
+    async def _communicate(proc, code: str) -> bytes:
+        """Передати код і прочитати результат до EOF (не більше, ніж може записати виконавець)."""
+        proc.stdin.write(code.encode())
+        proc.stdin.close()
+        # JSON екранує не-ASCII символи (\uXXXX - до 6 байтів на символ)
+        limit = 12 * MAX_OUTPUT + 4096
+        chunks, size = [], 0
+        while size < limit and (chunk := await proc.stdout.read(limit - size)):
+            chunks.append(chunk)
+            size += len(chunk)
+        await proc.wait()
+        return b''.join(chunks)
+
+    async def _execute(self, code: str) -> dict:
+        if self._idle is None:
+            raise RuntimeError('Sandbox pool is not started')
+        if self.unavailable:
+            raise SandboxUnavailable(self.unavailable)
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            proc = await self._idle.get()
+            if proc is None:
+                self._idle.put_nowait(None)
+                raise SandboxUnavailable(self.unavailable)
+            self.queue_wait.observe(time.perf_counter() - queued)
+            self._replenish()
+
+            self.busy += 1
+            started = time.perf_counter()
+            try:
+                result = json.loads(await asyncio.wait_for(self._communicate(proc, code), SANDBOX_TIMEOUT))
+            except TimeoutError:
+                result = {'status': 'timeout', 'stdout': '', 'stderr': '', 'truncated': False}
+            except (ValueError, ConnectionError):
+                await self._kill(proc)
+                # Без JSON: процес убито сигналом (SIGXCPU - ліміт процесорного часу) або вивід зіпсовано
+                exit_code = proc.returncode
+                status = ('cpu_limit' if exit_code == -signal.SIGXCPU
+                          else 'killed' if exit_code and exit_code < 0 else 'crashed')
+                result = {'status': status, 'stdout': '', 'stderr': '', 'truncated': False}
+            finally:
+                self.busy -= 1
+                await self._kill(proc)
+        finally:
+            self._slots.release()
+        elapsed = time.perf_counter() - started
+        self.run_time.observe(elapsed)
+        self.statuses[result['status']] = self.statuses.get(result['status'], 0) + 1
+        result['duration_ms'] = round(elapsed * 1000, 1)
+        return result
+
+    async def run(self, code: str) -> dict:
+        """
+        Виконати код (або взяти результат з кешу).
+
+        Returns:
+            dict: status (ok, error, timeout, cpu_limit, memory_limit, killed, crashed),
+                stdout, stderr, truncated, duration_ms (час виконання, для кешу - першого), cached
+
+        Raises:
+            SandboxUnavailable: ізоляція ввімкнена, але недоступна в цій системі
+        """
+        key = code_hash(code)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return {**cached, 'cached': True}
+        self.misses += 1
+        result = await flights.do('sandbox_run', ('sandbox_run', key), lambda: self._execute(code))
+        if result['status'] not in ('killed', 'crashed'):  # збій процесу, а не результат коду
+            self.cache[key] = result
+            self.cache.move_to_end(key)
+        while len(self.cache) > SANDBOX_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return {**result, 'cached': False}
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'pool_size': self.size,
+            'isolated': self.isolated,
+            'unavailable': self.unavailable,
+            'idle': self._idle.qsize() if self._idle is not None else 0,
+            'busy': self.busy,
+            'waiting': self.waiting,
+            'spawned': self.spawned,
+            'limits': {'cpu_seconds': SANDBOX_CPU_SECONDS, 'memory_mb': SANDBOX_MEMORY_MB,
+                       'timeout_s': SANDBOX_TIMEOUT},
+            'cache': {
+                'size': len(self.cache),
+                'capacity': SANDBOX_CACHE_SIZE,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / requests, 4) if requests else 0.0,
+            },
+            'statuses': self.statuses,
+            'queue_wait': self.queue_wait.report(),
+            'run_time': self.run_time.report(),
+        }
+
+
+sandbox: Optional[SandboxPool] = None
+
+
+def get_sandbox():
+    global sandbox
+    if sandbox is None:
+        sandbox = SandboxPool()
+    return sandbox
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Dict, List, Optional
 
 
 class UserCreate(BaseModel):
@@ -65,6 +66,7 @@ class Question(BaseModel):
     text: str
 
 class QuestionCreate(Question):
+    difficulty: Optional[str] = None
     options: List[AnswerOptionCreate]
 
 class QuestionRead(Question):
@@ -76,6 +78,7 @@ class TestCreate(BaseModel):
     description: str | None = None
     max_score: int
     course_id: int
+    sample_size: Optional[int] = Field(None, ge=1)
     questions: List[QuestionCreate]
 
 class TestRead(BaseModel):
@@ -85,6 +88,7 @@ class TestRead(BaseModel):
     max_score: int
     course_id: int
     questions_count: int
+    sample_size: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -104,4 +108,192 @@ class TestReadForStudent(TestRead):
 class TestResultResponse(BaseModel):
     test_id: int
     user_id: int
-    score: float
\ No newline at end of file
+    score: float
+
+class DraftRead(BaseModel):
+    test_id: int
+    answered: int
+    answers: Dict[int, int]
+
+class QuestionBankRead(BaseModel):
+    test_id: int
+    questions_count: int
+    sample_size: Optional[int]
+    strata: Dict[str, int]
+
+class AttemptRead(BaseModel):
+    attempt_id: int
+    test_id: int
+    questions_count: int
+    questions: List[QuestionRead]
+
+class AttemptSubmission(BaseModel):
+    answers: List[UserAnswer]
+
+class QuestionAnalytics(BaseModel):
+    question_id: int
+    difficulty: Optional[float]
+    discrimination: Optional[float]
+
+class TestAnalyticsRead(BaseModel):
+    test_id: int
+    submissions: int
+    mean: Optional[float]
+    percentiles: dict[str, Optional[float]]
+    histogram: List[int]
+    questions: List[QuestionAnalytics]
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    username: Optional[str]
+    score: float
+
+class LeaderboardRead(BaseModel):
+    course_id: int
+    entries: List[LeaderboardEntry]
+
+class Standing(BaseModel):
+    score: float
+    rank: int
+    percentile: float
+    participants: int
+
+class TestStanding(Standing):
+    test_id: int
+
+class MyStandingRead(BaseModel):
+    course_id: int
+    course: Optional[Standing]
+    tests: List[TestStanding]
+
+class TestProgress(BaseModel):
+    test_id: int
+    best_score: float
+    attempts: int
+    last_attempt_at: Optional[datetime]
+    class Config:
+        orm_mode = True
+
+class CourseProgress(BaseModel):
+    course_id: int
+    completed_tests: int
+    best_score: float
+    tests: List[TestProgress]
+
+class SimilarPair(BaseModel):
+    result_a: int
+    user_a: Optional[int]
+    username_a: Optional[str]
+    wrong_a: int
+    result_b: int
+    user_b: Optional[int]
+    username_b: Optional[str]
+    wrong_b: int
+    shared: int
+    expected: float
+    p_value: float
+
+class SimilarityReport(BaseModel):
+    test_id: int
+    submissions: int
+    questions: int
+    candidates: int
+    max_p: float
+    flagged: int
+    pairs: List[SimilarPair]
+
+class ProgressRebuildResponse(BaseModel):
+    rows: int
+
+class RelatedCourse(BaseModel):
+    course_id: int
+    title: str
+    score: float
+    count: int
+
+class RelatedCoursesRead(BaseModel):
+    course_id: int
+    similar: List[RelatedCourse]
+    also_took: List[RelatedCourse]
+    computed_at: Optional[datetime]
+
+class Prerequisite(BaseModel):
+    course_id: int
+    title: str
+    depth: int
+    completed: bool
+
+class CoursePrerequisitesRead(BaseModel):
+    course_id: int
+    can_take: bool
+    prerequisites: List[Prerequisite]
+
+class Suggestion(BaseModel):
+    kind: str
+    id: int
+    title: str
+
+class CodeRunResult(BaseModel):
+    resource_id: int
+    status: str
+    stdout: str
+    stderr: str
+    truncated: bool
+    duration_ms: float
+    cached: bool
+
+class ReviewCard(BaseModel):
+    resource_id: int
+    title: str
+    difficulty: str
+    question: Optional[str]
+    answer: Optional[str]
+    is_new: bool
+    due_at: Optional[datetime]
+    reps: int = 0
+    interval: float = 0
+    ease: float
+
+class ReviewNext(BaseModel):
+    card: Optional[ReviewCard]
+    next_due_at: Optional[datetime]
+
+class ReviewGrade(BaseModel):
+    grade: int
+
+class ReviewState(BaseModel):
+    resource_id: int
+    due_at: datetime
+    interval: float
+    ease: float
+    reps: int
+    lapses: int
+
+class JobRead(BaseModel):
+    id: int
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str]
+    result: Optional[dict]
+    error: Optional[str]
+    user_id: Optional[int]
+    created_at: Optional[datetime]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+class JobCreate(BaseModel):
+    kind: str
+    params: dict = {}
+
+class GradebookExportJob(BaseModel):
+    course_id: int
+    format: str = 'csv'
+    gzip: bool = False
+
+class ProfilerStart(BaseModel):
+    seconds: Optional[float] = None
+    requests: Optional[int] = None
+    route: Optional[str] = None
+    interval_ms: float = 10.0
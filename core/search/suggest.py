@@ -0,0 +1,211 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Iterable, Optional
+import numpy as np
+from core.database import db_func
+from core.database.db import async_session_maker
+
+KINDS = ('lesson', 'resource', 'course', 'test')
+SUGGEST_LIMIT = 10
+# Ключ - перші KEY_BYTES байтів UTF-8 назви від початку слова (довші запити перевіряються повністю)
+KEY_BYTES = 16
+# Скільки слів назви індексуються як початок збігу (обмежує пам'ять на довгих назвах)
+MAX_WORDS = 6
+# Після стількох нових ключів дельта вливається в основні масиви
+DELTA_LIMIT = 4096
+# Межа перебору діапазону, якщо фільтр kinds відкидає більшість збігів
+SCAN_LIMIT = 20_000
+
+_WORD = re.compile(r'\w+')
+_KEY = f'S{KEY_BYTES}'
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.casefold().split())
+
+
+def title_keys(title: str) -> list[tuple[bytes, int]]:
+    """Ключі назви: (перші KEY_BYTES байтів від початку слова, позиція слова в нормалізованій назві)."""
+    text = normalize(title)
+    starts = [m.start() for m in _WORD.finditer(text)][:MAX_WORDS]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    # символ UTF-8 займає щонайменше байт, тож KEY_BYTES символів вистачає на ключ
+    return [(text[start:start + KEY_BYTES].encode()[:KEY_BYTES], start) for start in starts]
+
+
+def _successor(prefix: bytes) -> Optional[bytes]:
+    """Найменший рядок, більший за всі рядки з цим префіксом (None - такого немає)."""
+    prefix = prefix.rstrip(b'\xff')
+    if not prefix:
+        return None
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+class SuggestIndex:
+    """
+    Префіксний індекс назв уроків, ресурсів, курсів і тестів (singleton).
+
+    Основна частина - відсортований масив ключів фіксованої довжини (numpy S16)
+    з паралельними масивами посилань на запис і позиції слова; пошук - два
+    searchsorted. Назви зберігаються одним UTF-8 блоком зі зміщеннями. Нові
+    назви з teacher-роутів потрапляють у невелику відсортовану дельту, яка
+    вливається в основні масиви пакетом по DELTA_LIMIT ключів, тому додавання
+    не перебудовує індекс. Назви, збережені іншими worker'ами, дочитує refresh()
+    за найбільшим прочитаним з БД id кожного типу. Збіги повертаються в лексикографічному порядку
+    (точна назва раніше за довші), по одному на запис.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.build([])
+        return cls._instance
+
+    @classmethod
+    async def init(cls):
+        """Побудувати індекс з усіх назв у БД."""
+        instance = cls()
+        async with async_session_maker() as session:
+            titles = await db_func.get_titles(session)
+        instance.build((kind, _id, title) for kind in KINDS for _id, title in titles[kind])
+        return instance
+
+    def build(self, items: Iterable[tuple[str, int, str]]):
+        """Перебудувати індекс з (kind, id, title); дельта очищується."""
+        kinds, ids, encoded, keys, refs, starts = [], [], [], [], [], []
+        for ref, (kind, _id, title) in enumerate(items):
+            kinds.append(KINDS.index(kind))
+            ids.append(_id)
+            encoded.append(title.encode())
+            for key, start in title_keys(title):
+                keys.append(key)
+                refs.append(ref)
+                starts.append(start)
+        self.kinds = np.array(kinds, dtype=np.uint8)
+        self.ids = np.array(ids, dtype=np.int64)
+        self.title_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in encoded], out=self.title_offsets[1:])
+        self.title_blob = b''.join(encoded)
+        del encoded
+        keys = np.array(keys, dtype=_KEY)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.refs = np.array(refs, dtype=np.int32)[order]
+        self.starts = np.array(starts, dtype=np.uint16)[order]
+        self.delta: list[tuple[bytes, int, int]] = []
+        self.new_items: list[tuple[int, int, str]] = []
+        # Найбільший id кожного типу, прочитаний з БД, і додані локально записи понад нього
+        self.high = {i: int(self.ids[self.kinds == i].max(initial=0)) for i in range(len(KINDS))}
+        self.added: set[tuple[int, int]] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.new_items)
+
+    def add(self, kind: str, _id: int, title: str):
+        """Додати назву (викликається teacher-роутами після збереження в БД)."""
+        kind = KINDS.index(kind)
+        if _id > self.high[kind]:
+            self.added.add((kind, _id))
+        self._add(kind, _id, title)
+
+    def _add(self, kind: int, _id: int, title: str):
+        ref = len(self)
+        self.new_items.append((kind, _id, title))
+        for key, start in title_keys(title):
+            insort(self.delta, (key, ref, start))
+        if len(self.delta) >= DELTA_LIMIT:
+            self._merge()
+
+    async def refresh(self):
+        """Додати назви, збережені іншими процесами після останнього читання з БД."""
+        async with async_session_maker() as session:
+            titles = await db_func.get_titles(session, after={KINDS[i]: high for i, high in self.high.items()})
+        for kind, rows in titles.items():
+            kind = KINDS.index(kind)
+            for _id, title in rows:
+                if (kind, _id) not in self.added:
+                    self._add(kind, _id, title)
+                self.high[kind] = max(self.high[kind], _id)
+        self.added = {(kind, _id) for kind, _id in self.added if _id > self.high[kind]}
+
+    def _merge(self):
+        """Влити дельту: вставка в позиції searchsorted, без повного сортування."""
+        keys = np.array([key for key, _, _ in self.delta], dtype=_KEY)
+        positions = np.searchsorted(self.keys, keys, side='right')
+        self.keys = np.insert(self.keys, positions, keys)
+        self.refs = np.insert(self.refs, positions, [ref for _, ref, _ in self.delta])
+        self.starts = np.insert(self.starts, positions, [start for _, _, start in self.delta])
+        encoded = [title.encode() for _, _, title in self.new_items]
+        self.kinds = np.concatenate([self.kinds, np.array([k for k, _, _ in self.new_items], dtype=np.uint8)])
+        self.ids = np.concatenate([self.ids, np.array([i for _, i, _ in self.new_items], dtype=np.int64)])
+        self.title_offsets = np.concatenate([
+            self.title_offsets, self.title_offsets[-1] + np.cumsum([len(t) for t in encoded], dtype=np.int64)
+        ])
+        self.title_blob += b''.join(encoded)
+        self.delta = []
+        self.new_items = []
+
+    def _item(self, ref: int) -> tuple[int, int, str]:
+        if ref < len(self.ids):
+            start, end = self.title_offsets[ref], self.title_offsets[ref + 1]
+            return int(self.kinds[ref]), int(self.ids[ref]), self.title_blob[start:end].decode()
+        return self.new_items[ref - len(self.ids)]
+
+    def _matches(self, head: bytes):
+        """(ключ, ref, позиція) з основного масиву та дельти з префіксом head, по порядку."""
+        upper = _successor(head)
+        lo = int(np.searchsorted(self.keys, head, side='left'))
+        hi = int(np.searchsorted(self.keys, upper, side='left')) if upper is not None else len(self.keys)
+        main = ((self.keys[i], int(self.refs[i]), int(self.starts[i])) for i in range(lo, hi))
+        d_lo = bisect_left(self.delta, (head,))
+        d_hi = bisect_left(self.delta, (upper,)) if upper is not None else len(self.delta)
+        return heapq.merge(main, self.delta[d_lo:d_hi])
+
+    def suggest(self, query: str, limit: int = SUGGEST_LIMIT, kinds: Optional[list[str]] = None) -> list[dict]:
+        """
+        До limit назв, в яких з query починається назва або одне з перших MAX_WORDS слів.
+
+        Args:
+            kinds: обмежити типами з KINDS (за замовчуванням - усі)
+        """
+        text = normalize(query)
+        if not text or limit <= 0:
+            return []
+        encoded = text.encode()
+        allowed = {KINDS.index(k) for k in kinds} if kinds else None
+        found, seen = [], set()
+        for scanned, (_, ref, start) in enumerate(self._matches(encoded[:KEY_BYTES])):
+            if scanned >= SCAN_LIMIT or len(found) >= limit:
+                break
+            if ref in seen:
+                continue
+            kind, _id, title = self._item(ref)
+            if allowed is not None and kind not in allowed:
+                continue
+            if len(encoded) > KEY_BYTES and not normalize(title)[start:].startswith(text):
+                continue
+            seen.add(ref)
+            found.append({'kind': KINDS[kind], 'id': _id, 'title': title})
+        return found
+
+    def stats(self) -> dict:
+        arrays = (self.keys, self.refs, self.starts, self.kinds, self.ids, self.title_offsets)
+        return {
+            'items': len(self),
+            'keys': len(self.keys) + len(self.delta),
+            'delta': len(self.delta),
+            'bytes': int(sum(a.nbytes for a in arrays) + len(self.title_blob)),
+        }
+
+
+suggest_index: Optional[SuggestIndex] = None
+
+
+async def get_suggest_index():
+    global suggest_index
+    if suggest_index is None:
+        suggest_index = await SuggestIndex.init()
+    return suggest_index
@@ -0,0 +1,364 @@
+from typing import Optional
+import numpy as np
+from sqlalchemy import select
+from core.database.db import async_session_maker
+from core.database.models import TestModel, QuestionModel, TestResultModel, TestAnswerModel, TestAttemptModel
+
+# Гістограма балів у відсотках від max_score з кроком 1% (0..100)
+HISTOGRAM_BINS = 101
+PERCENTILES = (25, 50, 75, 90)
+
+
+class TestItemStats:
+    """
+    Накопичувачі аналітики одного тесту.
+
+    Усі показники зберігаються як суми (кількість, Σx, Σx², правильні відповіді,
+    Σx серед тих, хто відповів правильно), тому нова спроба оновлює їх за O(питань)
+    без перерахунку всієї історії. x - бал спроби у відсотках.
+
+    Суми питань ведуться окремо для кожного питання лише по спробах, у яких воно
+    було: спроба тесту-банку містить sample_size питань, і решта не рахуються
+    ні правильними, ні неправильними.
+    """
+
+    def __init__(self, test_id: int, max_score: int, question_ids: list[int]):
+        self.test_id = test_id
+        self.max_score = max_score or 100
+        self.question_ids = np.array(question_ids, dtype=np.int64)
+        self.question_index = {qid: i for i, qid in enumerate(question_ids)}
+
+        self.histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+
+        # Статистика питань рахується лише по спробах з відповідями
+        # (старі результати без test_answers потрапляють тільки в гістограму):
+        # скільки разів питання було у спробі, Σx і Σx² цих спроб
+        self.presented = np.zeros(len(question_ids), dtype=np.int64)
+        self.presented_total = np.zeros(len(question_ids), dtype=np.float64)
+        self.presented_total_sq = np.zeros(len(question_ids), dtype=np.float64)
+        self.correct = np.zeros(len(question_ids), dtype=np.int64)
+        self.score_if_correct = np.zeros(len(question_ids), dtype=np.float64)
+
+    def ensure_questions(self, question_ids):
+        """Розширити масиви, якщо в тесті з'явились нові питання."""
+        new = [qid for qid in question_ids if qid not in self.question_index]
+        if not new:
+            return
+        for qid in new:
+            self.question_index[qid] = len(self.question_index)
+        self.question_ids = np.concatenate([self.question_ids, np.array(new, dtype=np.int64)])
+        self.presented = np.concatenate([self.presented, np.zeros(len(new), dtype=np.int64)])
+        self.presented_total = np.concatenate([self.presented_total, np.zeros(len(new))])
+        self.presented_total_sq = np.concatenate([self.presented_total_sq, np.zeros(len(new))])
+        self.correct = np.concatenate([self.correct, np.zeros(len(new), dtype=np.int64)])
+        self.score_if_correct = np.concatenate([self.score_if_correct, np.zeros(len(new))])
+
+    def to_percent(self, score) -> float:
+        return min(max(float(score) / self.max_score * 100, 0.0), 100.0)
+
+    def add(self, percent: float, correct_mask: Optional[np.ndarray] = None,
+            presented_mask: Optional[np.ndarray] = None):
+        """
+        Інкрементально врахувати одну спробу.
+
+        presented_mask - питання, що були у спробі (None - усі питання тесту).
+        """
+        self.histogram[int(round(percent))] += 1
+        self.count += 1
+        self.total += percent
+        if correct_mask is None:
+            return
+        presented = 1 if presented_mask is None else presented_mask
+        self.presented += presented
+        self.presented_total += presented * percent
+        self.presented_total_sq += presented * (percent * percent)
+        self.correct += correct_mask
+        self.score_if_correct += correct_mask * percent
+
+    def add_batch(self, percents: np.ndarray, correct_matrix: Optional[np.ndarray] = None,
+                  presented_matrix: Optional[np.ndarray] = None):
+        """
+        Врахувати пакет спроб векторно.
+
+        Args:
+            percents: (m,) бали спроб у відсотках
+            correct_matrix: (k, питань) bool-матриця правильності для спроб з відповідями;
+                перші k елементів percents мають відповідати її рядкам
+            presented_matrix: (k, питань) bool-матриця питань, що були у спробах
+                (None - кожна спроба містила всі питання)
+        """
+        if len(percents) == 0:
+            return
+        self.histogram += np.bincount(np.rint(percents).astype(np.int64), minlength=HISTOGRAM_BINS)
+        self.count += len(percents)
+        self.total += float(percents.sum())
+        if correct_matrix is None or len(correct_matrix) == 0:
+            return
+        item_percents = percents[:len(correct_matrix)]
+        if presented_matrix is None:
+            self.presented += len(correct_matrix)
+            self.presented_total += float(item_percents.sum())
+            self.presented_total_sq += float(np.dot(item_percents, item_percents))
+        else:
+            self.presented += presented_matrix.sum(axis=0)
+            self.presented_total += item_percents @ presented_matrix
+            self.presented_total_sq += (item_percents * item_percents) @ presented_matrix
+        self.correct += correct_matrix.sum(axis=0)
+        self.score_if_correct += item_percents @ correct_matrix
+
+    def add_sparse(self, percents: np.ndarray, answered: int, correct: tuple[np.ndarray, np.ndarray],
+                   presented: Optional[tuple[np.ndarray, np.ndarray]] = None,
+                   sampled: Optional[np.ndarray] = None):
+        """
+        Врахувати пакет спроб з пар (рядок спроби, індекс питання) замість матриць
+        спроби × питання: пам'ять - за кількістю відповідей, а не розміром банку.
+
+        Args:
+            percents: (m,) бали спроб у відсотках; перші answered - спроби з відповідями
+            correct: (рядки, індекси питань) правильних відповідей
+            presented: (рядки, індекси питань) питань спроб тестів-банків
+            sampled: (answered,) bool - спроби, чиї питання задані presented
+                (None - жодна); решта містили всі питання тесту
+        """
+        self.add_batch(percents)
+        if answered == 0:
+            return
+        size = len(self.question_ids)
+        item_percents = percents[:answered]
+        full = item_percents if sampled is None else item_percents[~sampled]
+        self.presented += len(full)
+        self.presented_total += float(full.sum())
+        self.presented_total_sq += float(np.dot(full, full))
+        if presented is not None:
+            rows, cols = presented
+            weights = item_percents[rows]
+            self.presented += np.bincount(cols, minlength=size)
+            self.presented_total += np.bincount(cols, weights=weights, minlength=size)
+            self.presented_total_sq += np.bincount(cols, weights=weights * weights, minlength=size)
+        rows, cols = correct
+        self.correct += np.bincount(cols, minlength=size)
+        self.score_if_correct += np.bincount(cols, weights=item_percents[rows], minlength=size)
+
+    def percentiles(self) -> dict:
+        if self.count == 0:
+            return {f'p{p}': None for p in PERCENTILES}
+        cumulative = np.cumsum(self.histogram)
+        ranks = np.ceil(np.array(PERCENTILES) / 100 * self.count)
+        positions = np.searchsorted(cumulative, ranks)
+        return {f'p{p}': float(pos) for p, pos in zip(PERCENTILES, positions)}
+
+    def item_indices(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Індекси складності (частка правильних) та дискримінації
+        (точково-бісеріальна кореляція правильності питання з балом спроби).
+        Знаменник кожного питання - спроби, у яких воно було.
+        """
+        n = self.presented.astype(np.float64)
+        n1 = self.correct.astype(np.float64)
+        n0 = n - n1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            difficulty = n1 / n
+            mean = self.presented_total / n
+            std = np.sqrt(np.maximum(self.presented_total_sq / n - mean * mean, 0.0))
+            mean_correct = self.score_if_correct / n1
+            mean_wrong = (self.presented_total - self.score_if_correct) / n0
+            discrimination = (mean_correct - mean_wrong) / std * np.sqrt(n1 * n0) / n
+        difficulty[n == 0] = np.nan
+        discrimination[(n1 == 0) | (n0 <= 0) | ~(std > 0)] = np.nan
+        return difficulty, discrimination
+
+    def report(self) -> dict:
+        difficulty, discrimination = self.item_indices()
+        return {
+            'test_id': self.test_id,
+            'submissions': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'percentiles': self.percentiles(),
+            # Гістограма по 10% (останній кошик включає 100%)
+            'histogram': [int(x) for x in np.add.reduceat(self.histogram, np.arange(0, 100, 10))],
+            'questions': [
+                {
+                    'question_id': int(qid),
+                    'difficulty': None if np.isnan(d) else round(float(d), 4),
+                    'discrimination': None if np.isnan(r) else round(float(r), 4),
+                }
+                for qid, d, r in zip(self.question_ids, difficulty, discrimination)
+            ]
+        }
+
+
+def recompute(test_id: int, max_score: int, question_ids: list[int],
+              scores: np.ndarray, correct_matrix: Optional[np.ndarray] = None,
+              presented_matrix: Optional[np.ndarray] = None) -> TestItemStats:
+    """Режим перерахунку з нуля: побудувати накопичувачі з усієї історії одним пакетом."""
+    item = TestItemStats(test_id, max_score, question_ids)
+    item.add_batch(_percents(item, scores), correct_matrix, presented_matrix)
+    return item
+
+
+def recompute_sparse(test_id: int, max_score: int, question_ids: list[int], scores: np.ndarray,
+                     answered: int, correct: tuple[np.ndarray, np.ndarray],
+                     presented: Optional[tuple[np.ndarray, np.ndarray]] = None,
+                     sampled: Optional[np.ndarray] = None) -> TestItemStats:
+    """Те саме, що recompute, але з розрідженого вигляду (див. TestItemStats.add_sparse)."""
+    item = TestItemStats(test_id, max_score, question_ids)
+    item.add_sparse(_percents(item, scores), answered, correct, presented, sampled)
+    return item
+
+
+def _percents(item: TestItemStats, scores) -> np.ndarray:
+    return np.clip(np.asarray(scores, dtype=np.float64) / item.max_score * 100, 0, 100)
+
+
+class TestAnalyticsEngine:
+    """Аналітика тестів, що оновлюється з кожним save_test_result (singleton)."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._tests = {}
+        return cls._instance
+
+    @classmethod
+    async def init(cls):
+        """Ініціалізація: одноразовий перерахунок з test_results та test_answers."""
+        instance = cls()
+        async with async_session_maker() as session:
+            instance._tests = await _load(session)
+        return instance
+
+    async def rebuild_test(self, test_id: int) -> Optional[TestItemStats]:
+        """Перерахувати аналітику одного тесту з нуля."""
+        async with async_session_maker() as session:
+            item = (await _load(session, test_id)).get(test_id)
+        if item is not None:
+            self._tests[test_id] = item
+        return item
+
+    async def rebuild_tests(self, test_ids: list[int]):
+        """Перерахувати аналітику тестів, повторно перевірених в іншому процесі."""
+        for test_id in test_ids:
+            await self.rebuild_test(test_id)
+
+    def record_result(self, test: TestModel, result: TestResultModel):
+        """
+        Врахувати щойно збережену спробу.
+
+        Для спроби тесту-банку test - SampledTest лише з питаннями спроби,
+        тому саме вони й позначаються як показані.
+        """
+        question_ids = [q.id for q in test.questions]
+        item = self._tests.get(test.id)
+        if item is None:
+            item = self._tests[test.id] = TestItemStats(test.id, test.max_score, question_ids)
+        else:
+            item.ensure_questions(question_ids)
+
+        mask = np.zeros(len(item.question_ids), dtype=np.int64)
+        for answer in result.answers:
+            idx = item.question_index.get(answer.question_id)
+            if idx is not None and answer.is_correct:
+                mask[idx] = 1
+        presented = np.zeros(len(item.question_ids), dtype=np.int64)
+        presented[[item.question_index[qid] for qid in question_ids]] = 1
+        item.add(item.to_percent(result.score), mask, presented)
+
+    def report(self, test_id: int) -> Optional[dict]:
+        item = self._tests.get(test_id)
+        return item.report() if item else None
+
+
+async def _load(session, test_id: Optional[int] = None) -> dict[int, TestItemStats]:
+    """
+    Зчитати історію колонками (без ORM-об'єктів) та перерахувати векторно.
+
+    Args:
+        session: сесія основної БД (результати доступні через неї навіть в окремому файлі)
+        test_id: обмежити одним тестом; None - усі тести
+    """
+    def only(query, column):
+        return query if test_id is None else query.filter(column == test_id)
+
+    tests = (await session.execute(
+        only(select(TestModel.id, TestModel.max_score), TestModel.id)
+    )).all()
+    questions = (await session.execute(
+        only(select(QuestionModel.test_id, QuestionModel.id), QuestionModel.test_id)
+        .order_by(QuestionModel.id)
+    )).all()
+    results = (await session.execute(
+        only(select(TestResultModel.test_id, TestResultModel.id, TestResultModel.score),
+             TestResultModel.test_id)
+    )).all()
+    answers = (await session.execute(
+        only(select(TestAnswerModel.result_id, TestAnswerModel.question_id, TestAnswerModel.is_correct)
+             .join(TestResultModel, TestResultModel.id == TestAnswerModel.result_id),
+             TestResultModel.test_id)
+    )).all()
+    # Питання спроб тестів-банків; результат без спроби містив усі питання тесту
+    attempts = (await session.execute(
+        only(select(TestAttemptModel.result_id, TestAttemptModel.question_ids)
+             .filter(TestAttemptModel.result_id.is_not(None)), TestAttemptModel.test_id)
+    )).all()
+
+    question_ids = {}
+    for t_id, q_id in questions:
+        question_ids.setdefault(t_id, []).append(q_id)
+    results_by_test = {}
+    for t_id, r_id, score in results:
+        results_by_test.setdefault(t_id, []).append((r_id, float(score or 0)))
+    answered = set()
+    correct_by_result = {}
+    for r_id, q_id, is_correct in answers:
+        answered.add(r_id)
+        if is_correct:
+            correct_by_result.setdefault(r_id, []).append(q_id)
+    presented_by_result = {r_id: [int(q) for q in ids.split(',')] for r_id, ids in attempts}
+
+    loaded = {}
+    for t_id, max_score in tests:
+        qids = question_ids.get(t_id, [])
+        column_of = {qid: j for j, qid in enumerate(qids)}
+        # Спроби з відповідями йдуть першими - вони відповідають рядкам матриці
+        rows = sorted(results_by_test.get(t_id, []), key=lambda r: r[0] not in answered)
+        with_answers = sum(1 for r_id, _ in rows if r_id in answered)
+
+        # Пари (рядок спроби, індекс питання) замість матриць спроби × питання
+        correct, presented = ([], []), ([], [])
+        sampled = np.zeros(with_answers, dtype=bool)
+        for i in range(with_answers):
+            for q_id in correct_by_result.get(rows[i][0], ()):
+                j = column_of.get(q_id)
+                if j is not None:
+                    correct[0].append(i)
+                    correct[1].append(j)
+            shown = presented_by_result.get(rows[i][0])
+            if shown is not None:
+                sampled[i] = True
+                for q_id in shown:
+                    j = column_of.get(q_id)
+                    if j is not None:
+                        presented[0].append(i)
+                        presented[1].append(j)
+
+        scores = np.array([score for _, score in rows], dtype=np.float64)
+        loaded[t_id] = recompute_sparse(
+            t_id, max_score, qids, scores, with_answers,
+            tuple(np.array(part, dtype=np.int64) for part in correct),
+            tuple(np.array(part, dtype=np.int64) for part in presented) if sampled.any() else None,
+            sampled if sampled.any() else None
+        )
+    return loaded
+
+
+analytics: Optional[TestAnalyticsEngine] = None
+
+
+async def get_analytics():
+    global analytics
+    if analytics is None:
+        analytics = await TestAnalyticsEngine.init()
+    return analytics
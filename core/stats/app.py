@@ -48,6 +48,33 @@ def get_stats_sync():
         }
 
 
+def db_metrics_section():
+    """Метрики engine з цього ж процесу (при STATS_DASHBOARD=off їх тут немає)."""
+    from core.database.metrics import report as db_report
+    engines = {name: m for name, m in db_report().items() if m['checkout_wait']['count']}
+    if not engines:
+        return html.Div([html.H3('Database'), html.P('No database metrics in this process')], style={'margin': '20px'})
+
+    kinds = ['checkout_wait', 'thread_hop', 'thread_exec', 'transaction', 'write_lock_wait', 'write_lock_held']
+    fig = go.Figure(data=[
+        go.Bar(name=name, x=kinds, y=[m[k]['p95_ms'] for k in kinds]) for name, m in engines.items()
+    ])
+    fig.update_layout(title='Database latency p95 (ms)', yaxis_type='log', template='plotly_white', barmode='group')
+
+    items = []
+    for name, m in engines.items():
+        pool = m['pool']
+        items.append(html.Li(
+            f"{name}: in use {pool['in_use']}/{pool['size']} (peak {pool['peak_in_use']}), "
+            f"waiting {pool['waiting']} (peak {pool['peak_waiting']}), busy waits {m['busy_waits']}, "
+            f"busy errors {m['busy_errors']}, slow writes {m['slow_writes']} (> {m['slow_write_threshold_ms']:.0f} ms)"
+        ))
+        for slow in m['recent_slow_writes'][-5:]:
+            items.append(html.Li(f"⚠ {name}: writer lock held {slow['held_ms']} ms - {slow['statement']}",
+                                 style={'color': 'crimson'}))
+    return html.Div([html.H3('Database'), dcc.Graph(figure=fig), html.Ul(items)], style={'margin': '20px'})
+
+
 def serve_layout():
     report = get_stats_sync()
 
@@ -80,6 +107,7 @@ def serve_layout():
                 html.Li(f"Registered users: {report['registered_users']}")
             ])
         ], style={'margin': '20px'}),
+        db_metrics_section(),
         dcc.Interval(
             id='interval-component',
             interval=5 * 1000,
@@ -88,4 +116,17 @@ def serve_layout():
     ])
 
 
-dash_app.layout = serve_layout
\ No newline at end of file
+dash_app.layout = serve_layout
+
+if __name__ == '__main__':
+    # Окремий процес для дашборду (STATS_DASHBOARD=off в основному API)
+    import uvicorn
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    uvicorn.run(
+        Starlette(routes=[Mount('/stats', WSGIMiddleware(dash_app.server))]),
+        host='127.0.0.1',
+        port=8050
+    )
@@ -0,0 +1,94 @@
+from typing import Optional
+from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload
+from core.database.db import async_session_maker
+from core.database.models import TestModel, TestResultModel
+
+
+class ResultsFeed:
+    """
+    Єдина точка, через яку нові результати тестів потрапляють у кеші в пам'яті.
+
+    Підписники (аналітика, рейтинги) мають метод record_result(test, result).
+    Результати свого worker'а публікуються одразу з submit; результати інших
+    worker'ів підтягуються через catch_up() за high-water mark по test_results.id
+    (SQLite видає id під writer-lock'ом, тому порядок id збігається з порядком commit).
+    Облік власних id ведеться тільки в режимі shared (кілька worker'ів).
+
+    Повторна перевірка змінює вже враховані бали, тому підписники мають і
+    rebuild_tests(test_ids); тести, перевірені в інших worker'ах, знаходить
+    catch_up_regrades() за tests.regrade_epoch.
+    """
+
+    def __init__(self, subscribers: list, shared: bool = False):
+        self.subscribers = subscribers
+        self.shared = shared
+        self.high_water_mark = 0
+        self.regrade_epoch = 0
+        self._local: set[int] = set()
+
+    @classmethod
+    async def init(cls, subscribers: list, shared: bool = False):
+        feed = cls(subscribers, shared)
+        async with async_session_maker() as session:
+            feed.high_water_mark = (await session.execute(
+                select(func.max(TestResultModel.id))
+            )).scalar() or 0
+            feed.regrade_epoch = (await session.execute(
+                select(func.max(TestModel.regrade_epoch))
+            )).scalar() or 0
+        return feed
+
+    def publish(self, test: TestModel, result: TestResultModel):
+        """Передати щойно збережений результат усім підписникам."""
+        if self.shared and result.id <= self.high_water_mark:
+            return  # вже застосований через catch_up, поки submit чекав refresh
+        for subscriber in self.subscribers:
+            subscriber.record_result(test, result)
+        if self.shared:
+            self._local.add(result.id)
+
+    async def catch_up(self):
+        """Дочитати результати, збережені іншими процесами."""
+        async with async_session_maker() as session:
+            results = (await session.execute(
+                select(TestResultModel)
+                .options(selectinload(TestResultModel.test).selectinload(TestModel.questions))
+                .filter(TestResultModel.id > self.high_water_mark)
+                .order_by(TestResultModel.id)
+            )).scalars().all()
+
+        for result in results:
+            self.high_water_mark = max(self.high_water_mark, result.id)
+            if result.id in self._local:
+                self._local.discard(result.id)
+                continue
+            if result.test is None:
+                continue
+            for subscriber in self.subscribers:
+                subscriber.record_result(result.test, result)
+        self._local = {result_id for result_id in self._local if result_id > self.high_water_mark}
+
+    async def catch_up_regrades(self):
+        """Перебудувати кеші тестів, повторно перевірених іншими процесами."""
+        async with async_session_maker() as session:
+            rows = (await session.execute(
+                select(TestModel.id, TestModel.regrade_epoch)
+                .filter(TestModel.regrade_epoch > self.regrade_epoch)
+            )).all()
+        if not rows:
+            return
+        self.regrade_epoch = max(epoch for _, epoch in rows)
+        test_ids = sorted(test_id for test_id, _ in rows)
+        for subscriber in self.subscribers:
+            await subscriber.rebuild_tests(test_ids)
+
+
+feed: Optional[ResultsFeed] = None
+
+
+async def get_results_feed(subscribers: list, shared: bool = False):
+    global feed
+    if feed is None:
+        feed = await ResultsFeed.init(subscribers, shared)
+    return feed
@@ -0,0 +1,182 @@
+import heapq
+from typing import Optional
+import numpy as np
+from sqlalchemy import select, func
+from core.database.db import async_session_maker
+from core.database.models import TestModel, TestResultModel
+
+# Скільки найкращих студентів тримати в купі кожного тесту/курсу
+LEADERBOARD_SIZE = 50
+
+
+class Board:
+    """
+    Рейтинг за найкращим результатом кожного студента.
+
+    Найкращий бал студента може тільки зростати, тому top-K підтримується
+    min-купою розміру K: витіснений студент повертається в неї лише покращивши
+    результат, а це знову проходить через update(). Кумулятивна гістограма балів
+    (крок 1 бал) дає перцентиль і місце без сортування всіх студентів.
+    """
+
+    def __init__(self, size: int = LEADERBOARD_SIZE):
+        self.size = size
+        self.best: dict[int, float] = {}
+        self.heap: list[tuple[float, int]] = []
+        self.histogram = np.zeros(101, dtype=np.int64)
+
+    def _bin(self, score: float) -> int:
+        index = max(int(score), 0)
+        if index >= len(self.histogram):
+            grown = np.zeros(max(index + 1, len(self.histogram) * 2), dtype=np.int64)
+            grown[:len(self.histogram)] = self.histogram
+            self.histogram = grown
+        return index
+
+    def update(self, user_id: int, score: float) -> Optional[float]:
+        """
+        Врахувати новий бал студента.
+
+        Returns:
+            float | None: На скільки зріс найкращий бал студента
+                          (None, якщо результат не покращився)
+        """
+        old = self.best.get(user_id)
+        if old is not None and score <= old:
+            return None
+        self.best[user_id] = score
+        if old is not None:
+            self.histogram[self._bin(old)] -= 1
+        index = self._bin(score)  # може замінити self.histogram більшим масивом
+        self.histogram[index] += 1
+
+        if any(uid == user_id for _, uid in self.heap):
+            self.heap = [(score if uid == user_id else s, uid) for s, uid in self.heap]
+            heapq.heapify(self.heap)
+        elif len(self.heap) < self.size:
+            heapq.heappush(self.heap, (score, user_id))
+        elif score > self.heap[0][0]:
+            heapq.heapreplace(self.heap, (score, user_id))
+        return score - (old or 0.0)
+
+    def top(self, limit: int) -> list[tuple[int, float]]:
+        return [(uid, s) for s, uid in heapq.nlargest(limit, self.heap)]
+
+    def standing(self, user_id: int) -> Optional[dict]:
+        """Найкращий бал, місце та перцентиль студента (частка студентів з нижчим балом)."""
+        score = self.best.get(user_id)
+        if score is None:
+            return None
+        index = self._bin(score)
+        cumulative = np.cumsum(self.histogram)
+        total = int(cumulative[-1])
+        below = int(cumulative[index - 1]) if index else 0
+        same = int(self.histogram[index])
+        return {
+            'score': round(score, 2),
+            'rank': total - int(cumulative[index]) + 1,
+            'percentile': round((below + 0.5 * same) / total * 100, 2),
+            'participants': total,
+        }
+
+
+class LeaderboardManager:
+    """Рейтинги тестів і курсів у пам'яті (singleton)."""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._tests = {}
+            cls._instance._courses = {}
+            cls._instance._test_course = {}
+            cls._instance._course_tests = {}
+        return cls._instance
+
+    @classmethod
+    async def init(cls):
+        """Побудувати рейтинги з test_results одним агрегатним запитом."""
+        instance = cls()
+        await instance._fill()
+        return instance
+
+    async def rebuild(self):
+        """
+        Перебудувати рейтинги з нуля (бали в історії змінились, напр. після повторної перевірки).
+
+        Нові рейтинги збираються окремо і підміняють поточні одним присвоєнням,
+        тому запити під час перебудови бачать старі дані, а не порожні.
+        """
+        staged = object.__new__(LeaderboardManager)
+        staged._tests, staged._courses, staged._test_course, staged._course_tests = {}, {}, {}, {}
+        await staged._fill()
+        self._tests, self._courses = staged._tests, staged._courses
+        self._test_course, self._course_tests = staged._test_course, staged._course_tests
+
+    async def rebuild_tests(self, test_ids: list[int]):
+        """Тести повторно перевірені в іншому процесі - рейтинги курсів залежать від них, тому повна перебудова."""
+        await self.rebuild()
+
+    async def _fill(self):
+        async with async_session_maker() as session:
+            tests = (await session.execute(
+                select(TestModel.id, TestModel.course_id, TestModel.max_score)
+            )).all()
+            best = (await session.execute(
+                select(TestResultModel.user_id, TestResultModel.test_id, func.max(TestResultModel.score))
+                .group_by(TestResultModel.user_id, TestResultModel.test_id)
+            )).all()
+
+        max_scores = {}
+        for test_id, course_id, max_score in tests:
+            self._link(test_id, course_id)
+            max_scores[test_id] = max_score or 100
+        for user_id, test_id, score in best:
+            if test_id in max_scores and user_id is not None:
+                self._record(user_id, test_id, float(score or 0) / max_scores[test_id] * 100)
+
+    def _link(self, test_id: int, course_id: int):
+        self._test_course[test_id] = course_id
+        self._course_tests.setdefault(course_id, set()).add(test_id)
+
+    def _record(self, user_id: int, test_id: int, points: float):
+        gained = self._tests.setdefault(test_id, Board()).update(user_id, points)
+        course_id = self._test_course.get(test_id)
+        if gained is not None and course_id is not None:
+            course = self._courses.setdefault(course_id, Board())
+            course.update(user_id, course.best.get(user_id, 0.0) + gained)
+
+    def record_result(self, test: TestModel, result: TestResultModel):
+        """Врахувати щойно збережену спробу (бал у відсотках від max_score)."""
+        if test.id not in self._test_course:
+            self._link(test.id, test.course_id)
+        self._record(result.user_id, test.id, float(result.score) / (test.max_score or 100) * 100)
+
+    def course_top(self, course_id: int, limit: int) -> list[tuple[int, float]]:
+        board = self._courses.get(course_id)
+        return board.top(limit) if board else []
+
+    def course_standing(self, course_id: int, user_id: int) -> Optional[dict]:
+        board = self._courses.get(course_id)
+        return board.standing(user_id) if board else None
+
+    def test_standings(self, course_id: int, user_id: int) -> list[dict]:
+        standings = []
+        for test_id in sorted(self._course_tests.get(course_id, ())):
+            board = self._tests.get(test_id)
+            if board is None:
+                continue
+            standing = board.standing(user_id)
+            if standing:
+                standings.append({'test_id': test_id, **standing})
+        return standings
+
+
+leaderboards: Optional[LeaderboardManager] = None
+
+
+async def get_leaderboards():
+    global leaderboards
+    if leaderboards is None:
+        leaderboards = await LeaderboardManager.init()
+    return leaderboards
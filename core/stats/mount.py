@@ -0,0 +1,34 @@
+import asyncio
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+def _load_dashboard() -> ASGIApp:
+    """Імпорт Dash/Plotly та WSGI-моста - важкий, тому виконується лише на вимогу."""
+    from a2wsgi import WSGIMiddleware
+    from core.stats.app import dash_app
+    return WSGIMiddleware(dash_app.server)
+
+
+class LazyDashboard:
+    """
+    ASGI-обгортка для /stats, яка завантажує Dash при першому зверненні.
+
+    Завдяки цьому `import main` не тягне dash, plotly та a2wsgi, і API
+    готовий обслуговувати запити одразу після старту worker'а.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._app is not None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._app is None:
+            async with self._lock:
+                if self._app is None:
+                    # Імпорт у потоці, щоб не блокувати event loop на секунду+
+                    self._app = await asyncio.to_thread(_load_dashboard)
+        await self._app(scope, receive, send)
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+import numpy as np
+from core.database import db_func
+from core.database.db import async_session_maker
+
+logger = logging.getLogger('uvicorn.error')
+
+# Скільки сусідів зберігається для кожного курсу в кожному списку
+RELATED_SIZE = int(os.getenv('RELATED_SIZE', '10'))
+# Як часто рекомендації перераховуються фоновим завданням related_recompute, секунди
+RELATED_REFRESH_INTERVAL = float(os.getenv('RELATED_REFRESH_INTERVAL', '3600'))
+# Курс вважається пройденим, якщо середній найкращий бал його тестів - щонайменше ця частка max_score
+RELATED_PASS_SCORE = float(os.getenv('RELATED_PASS_SCORE', '0.6'))
+# Групи більші за це (ресурс майже в усіх курсах, студент з тисячами курсів) не дають пар:
+# вони майже нічого не кажуть про схожість, а пар у них квадратично багато
+MAX_GROUP = 1000
+
+
+def cross_pairs(left_groups: np.ndarray, left_items: np.ndarray,
+                right_groups: np.ndarray, right_items: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Усі пари (left_item, right_item) з однаковою групою - ненульові доданки Lᵀ·R
+    для бінарних матриць група×елемент, заданих списками (група, елемент).
+
+    Returns:
+        tuple: (left, right) - по одному рядку на пару
+    """
+    order = np.argsort(right_groups, kind='stable')
+    groups, starts, counts = np.unique(right_groups[order], return_index=True, return_counts=True)
+    items = right_items[order]
+    if not len(groups):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(groups, left_groups), len(groups) - 1)
+    sizes = np.where((groups[pos] == left_groups) & (counts[pos] <= MAX_GROUP), counts[pos], 0)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.repeat(left_items, sizes), items[np.repeat(starts[pos], sizes) + offsets]
+
+
+def count_pairs(left: np.ndarray, right: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Розріджена матриця співпадінь: (рядок, стовпець, кількість) без діагоналі."""
+    keep = left != right
+    keys, counts = np.unique(left[keep].astype(np.int64) * n + right[keep], return_counts=True)
+    return keys // n, keys % n, counts
+
+
+def top_k(rows: np.ndarray, cols: np.ndarray, scores: np.ndarray, counts: np.ndarray,
+          n: int, k: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    k найкращих стовпців кожного рядка: за score, далі за count, далі за меншим індексом.
+
+    Returns:
+        tuple: (сусіди n×k, -1 - порожньо; score n×k; count n×k)
+    """
+    order = np.lexsort((cols, -counts, -scores, rows))
+    rows, cols, scores, counts = rows[order], cols[order], scores[order], counts[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < k
+    neighbours = np.full((n, k), -1, dtype=np.int32)
+    top_scores = np.zeros((n, k), dtype=np.float32)
+    top_counts = np.zeros((n, k), dtype=np.int32)
+    neighbours[rows[keep], rank[keep]] = cols[keep]
+    top_scores[rows[keep], rank[keep]] = scores[keep]
+    top_counts[rows[keep], rank[keep]] = counts[keep]
+    return neighbours, top_scores, top_counts
+
+
+def compute_related(n: int, resource_courses: np.ndarray, resource_ids: np.ndarray,
+                    enrol_courses: np.ndarray, enrol_users: np.ndarray, enrol_passed: np.ndarray, k: int):
+    """
+    Обчислити обидва списки рекомендацій (виконується в пулі процесів).
+
+    Args:
+        n: кількість курсів; курси задані рядками 0..n-1
+        resource_courses, resource_ids: пари course_resources без повторів
+        enrol_courses, enrol_users, enrol_passed: курси з прогресом студентів і чи пройдено курс
+
+    Returns:
+        tuple: (similar, also_took) у форматі top_k. similar - косинусна подібність
+            наборів ресурсів (count - спільні ресурси); also_took - частка студентів,
+            що пройшли курс, які мають прогрес в іншому курсі (count - кількість студентів)
+    """
+    rows, cols, shared = count_pairs(*cross_pairs(resource_ids, resource_courses, resource_ids, resource_courses), n)
+    degree = np.bincount(resource_courses, minlength=n).astype(np.float64)
+    similar = top_k(rows, cols, shared / np.sqrt(degree[rows] * degree[cols]), shared, n, k)
+
+    passed = enrol_passed.astype(bool)
+    rows, cols, students = count_pairs(
+        *cross_pairs(enrol_users[passed], enrol_courses[passed], enrol_users, enrol_courses), n
+    )
+    passed_count = np.bincount(enrol_courses[passed], minlength=n)
+    also_took = top_k(rows, cols, students / passed_count[rows], students, n, k)
+    return similar, also_took
+
+
+class CourseRecommender:
+    """
+    Рекомендації курсів (singleton): "схожі курси" та "ті, хто пройшов цей курс, також проходили".
+
+    Обидва списки - розріджені матриці співпадінь (курс×курс через спільні
+    ресурси та через спільних студентів), з яких для кожного курсу зберігається
+    лише top-K сусідів у масивах n×K. Перерахунок - фонове завдання
+    related_recompute раз на RELATED_REFRESH_INTERVAL; запит лише читає рядок
+    масиву за індексом курсу.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.course_ids = np.empty(0, dtype=np.int64)
+            cls._instance.titles = []
+            cls._instance.rows = {}
+            cls._instance.similar = None
+            cls._instance.also_took = None
+            cls._instance.computed_at = None
+            cls._instance.compute_ms = None
+            cls._instance.refreshes = 0
+            cls._instance._task = None
+        return cls._instance
+
+    @classmethod
+    async def init(cls):
+        instance = cls()
+        await instance.refresh()
+        return instance
+
+    async def refresh(self, run_cpu=None) -> dict:
+        """
+        Перерахувати рекомендації з course_resources та student_progress.
+
+        Args:
+            run_cpu: виконавець обчислення (JobContext.run_cpu); None - у поточному процесі
+        """
+        async with async_session_maker() as db:
+            columns = await db_func.get_related_columns(db)
+        course_ids = np.array([c[0] for c in columns['courses']], dtype=np.int64)
+        pairs = np.array(columns['course_resources'], dtype=np.int64).reshape(-1, 2)
+        pairs = np.unique(pairs[np.isin(pairs[:, 0], course_ids)], axis=0)
+        enrolments = np.array([(u, c, (s or 0) >= RELATED_PASS_SCORE) for u, c, s in columns['enrolments']],
+                              dtype=np.int64).reshape(-1, 3)
+        enrolments = enrolments[np.isin(enrolments[:, 1], course_ids)]
+        args = (len(course_ids), np.searchsorted(course_ids, pairs[:, 0]), pairs[:, 1],
+                np.searchsorted(course_ids, enrolments[:, 1]), enrolments[:, 0], enrolments[:, 2], RELATED_SIZE)
+
+        started = time.perf_counter()
+        similar, also_took = await run_cpu(compute_related, *args) if run_cpu else compute_related(*args)
+        self.compute_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.course_ids = course_ids
+        self.titles = [c[1] for c in columns['courses']]
+        self.rows = {int(course_id): row for row, course_id in enumerate(course_ids)}
+        self.similar, self.also_took = similar, also_took
+        self.computed_at = datetime.now(timezone.utc)
+        self.refreshes += 1
+        return {
+            'courses': len(course_ids),
+            'course_resources': len(pairs),
+            'enrolments': len(enrolments),
+            'compute_ms': self.compute_ms,
+        }
+
+    def _neighbours(self, table, row: int) -> list[dict]:
+        neighbours, scores, counts = table
+        return [
+            {'course_id': int(self.course_ids[j]), 'title': self.titles[j], 'score': round(float(s), 4), 'count': int(c)}
+            for j, s, c in zip(neighbours[row].tolist(), scores[row].tolist(), counts[row].tolist()) if j >= 0
+        ]
+
+    def get(self, course_id: int) -> Optional[dict]:
+        """Обидва списки для курсу; None - курс з'явився після останнього перерахунку."""
+        row = self.rows.get(course_id)
+        if row is None:
+            return None
+        return {
+            'course_id': course_id,
+            'similar': self._neighbours(self.similar, row),
+            'also_took': self._neighbours(self.also_took, row),
+            'computed_at': self.computed_at,
+        }
+
+    async def _run(self, interval: float):
+        from core.jobs.runner import get_job_runner
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await get_job_runner().submit('related_recompute', {}, None)
+            except Exception:
+                logger.exception('Related courses refresh was not scheduled')
+
+    def start(self, interval: float = RELATED_REFRESH_INTERVAL):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        tables = [t for t in (self.similar, self.also_took) if t is not None]
+        return {
+            'courses': len(self.course_ids),
+            'size': RELATED_SIZE,
+            'refresh_interval': RELATED_REFRESH_INTERVAL,
+            'computed_at': self.computed_at,
+            'compute_ms': self.compute_ms,
+            'refreshes': self.refreshes,
+            'bytes': int(sum(a.nbytes for t in tables for a in t)),
+        }
+
+
+recommender: Optional[CourseRecommender] = None
+
+
+async def get_recommender():
+    global recommender
+    if recommender is None:
+        recommender = await CourseRecommender.init()
+    return recommender
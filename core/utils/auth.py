@@ -41,6 +41,15 @@ async def get_default_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     Returns:
         UserModel: Об'єкт користувача
 
+    Raises:
+        HTTPException 401: Якщо токен невалідний або користувач не знайдений
+    """
+    return await get_user_by_token(db, token)
+
+async def get_user_by_token(db: AsyncSession, token: str):
+    """
+    Декодувати JWT та знайти користувача (поза HTTP dependency, напр. для WebSocket)
+
     Raises:
         HTTPException 401: Якщо токен невалідний або користувач не знайдений
     """
@@ -56,13 +65,12 @@ async def get_default_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         raise HTTPException(status_code=401, detail='User not found')
     return user
 
-async def get_teacher_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(db_func.get_db)):
+async def get_teacher_user(user=Depends(get_default_user)):
     """
     Dependency: доступ тільки для teacher та admin
 
     Args:
-        token: JWT токен
-        db: Async сесія БД
+        user: Користувач з get_default_user (FastAPI кешує його в межах запиту)
 
     Returns:
         UserModel: Об'єкт користувача з роллю teacher або admin
@@ -70,19 +78,17 @@ async def get_teacher_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     Raises:
         HTTPException 403: Якщо користувач не має прав доступу
     """
-    user = await get_default_user(token, db)
     if user.role == 'student':
         raise HTTPException(status_code=401, detail='Access denied')
     return user
 
-async def get_admin_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(db_func.get_db)):
+async def get_admin_user(user=Depends(get_default_user)):
     """
     Dependency: доступ тільки для admin
 
     Raises:
         HTTPException 403: Якщо користувач не admin
     """
-    user = await get_default_user(token, db)
     if user.role != 'admin':
         raise HTTPException(status_code=401, detail='Access denied')
     return user
\ No newline at end of file
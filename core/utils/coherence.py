@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import sqlite3
+from typing import Awaitable, Callable
+from core.database.db import DATABASE_PATH, RESULTS_DATABASE_PATH, RESULTS_SCHEMA, SEPARATE_RESULTS_DB
+
+logger = logging.getLogger('uvicorn.error')
+
+MAIN_SCHEMA = 'main'
+
+
+class DataVersionWatcher:
+    """
+    Відстеження змін БД іншими процесами через PRAGMA data_version.
+
+    data_version на окремому з'єднанні змінюється щоразу, коли будь-яке інше
+    з'єднання (в тому числі з інших worker'ів uvicorn) фіксує транзакцію у файлі.
+    Опитування коштує мікросекунди і не потребує зовнішнього брокера, тому кожен
+    worker сам дізнається, що його кеші в пам'яті застаріли.
+
+    Example:
+        watcher = DataVersionWatcher(interval=0.5)
+        watcher.subscribe(RESULTS_SCHEMA, feed.catch_up)
+        watcher.start()
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._callbacks: dict[str, list[Callable[[], Awaitable[None]]]] = {MAIN_SCHEMA: [], RESULTS_SCHEMA: []}
+        self._versions: dict[str, int] = {}
+        self._connection = None
+        self._task = None
+
+    def subscribe(self, schema: str, callback: Callable[[], Awaitable[None]]):
+        """Зареєструвати async-callback на зміну схеми 'main' або RESULTS_SCHEMA."""
+        self._callbacks[schema].append(callback)
+
+    def _poll(self) -> dict[str, int]:
+        versions = {MAIN_SCHEMA: self._connection.execute('PRAGMA main.data_version').fetchone()[0]}
+        if SEPARATE_RESULTS_DB:
+            versions[RESULTS_SCHEMA] = self._connection.execute(
+                f'PRAGMA {RESULTS_SCHEMA}.data_version'
+            ).fetchone()[0]
+        else:
+            versions[RESULTS_SCHEMA] = versions[MAIN_SCHEMA]
+        return versions
+
+    def start(self):
+        self._connection = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+        if SEPARATE_RESULTS_DB:
+            self._connection.execute(f'ATTACH DATABASE ? AS {RESULTS_SCHEMA}', (RESULTS_DATABASE_PATH,))
+        self._versions = self._poll()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._connection:
+            self._connection.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            versions = self._poll()
+            for schema, version in versions.items():
+                if version == self._versions.get(schema):
+                    continue
+                self._versions[schema] = version
+                for callback in self._callbacks[schema]:
+                    try:
+                        await callback()
+                    except Exception:
+                        logger.exception('Data version callback failed for %s', schema)
@@ -0,0 +1,82 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Callable
+from fastapi.responses import StreamingResponse
+from core.database.db import async_session_maker
+
+MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+async def csv_chunks(header: list[str], batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """Кожна пачка строк - один шматок CSV (перший з заголовком)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # порожній експорт - лише заголовок
+        yield buffer.getvalue().encode()
+
+
+async def ndjson_chunks(header: list[str], batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """Кожна строка - JSON-об'єкт з ключами header, пачка - один шматок."""
+    async for rows in batches:
+        yield ''.join(json.dumps(dict(zip(header, row)), default=str) + '\n' for row in rows).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Стиснути потік на льоту (формат gzip, без буферизації всього файлу)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def in_session(stream: Callable, *args) -> AsyncIterator[list[tuple]]:
+    """
+    Виконати потокову функцію db_func у власній сесії.
+
+    Відповідь віддається вже після виходу з обробника, тому сесія з get_db
+    не підходить - курсор має жити, поки клієнт читає файл.
+    """
+    async with async_session_maker() as db:
+        async for rows in stream(db, *args):
+            yield rows
+
+
+def export_chunks(fmt: str, header: list[str], batches: AsyncIterator[list[tuple]],
+                  compress: bool = False) -> AsyncIterator[bytes]:
+    """Потік байтів експорту: CSV або NDJSON, за потреби стиснутий gzip."""
+    chunks = (csv_chunks if fmt == 'csv' else ndjson_chunks)(header, batches)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(name: str, fmt: str, compress: bool = False) -> str:
+    return f'{name}.{fmt}' + ('.gz' if compress else '')
+
+
+def export_response(filename: str, fmt: str, header: list[str],
+                    batches: AsyncIterator[list[tuple]], compress: bool = False) -> StreamingResponse:
+    """
+    StreamingResponse з CSV або NDJSON, за потреби стиснутим gzip.
+
+    Args:
+        filename: ім'я файлу без розширення
+        fmt: 'csv' або 'ndjson'
+        header: назви колонок
+        batches: асинхронний ітератор пачок строк
+        compress: віддати .gz (application/gzip)
+    """
+    media_type = 'application/gzip' if compress else MEDIA_TYPES[fmt]
+    return StreamingResponse(
+        export_chunks(fmt, header, batches, compress),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(filename, fmt, compress)}"'}
+    )
@@ -0,0 +1,294 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from starlette.routing import Match
+
+# Верхня межа профілювання: режим requests теж завершується, якщо запити не прийшли
+PROFILE_MAX_SECONDS = 300.0
+
+# Псевдо-кадри на вершині стеку задачі, що не виконується: очікує aiosqlite або інше
+AWAIT = ('[await]', '', 0)
+AWAIT_DB = ('[await aiosqlite]', '', 0)
+
+_ROOT = os.getcwd() + os.sep
+
+
+def _key(code) -> tuple:
+    return code.co_qualname, code.co_filename, code.co_firstlineno
+
+
+def _short(filename: str) -> str:
+    if filename.startswith(_ROOT):
+        return filename[len(_ROOT):]
+    _, sep, tail = filename.rpartition('site-packages' + os.sep)
+    return tail if sep else os.path.basename(filename)
+
+
+def _label(frame: tuple) -> str:
+    name, filename, line = frame
+    label = f'{name} ({_short(filename)}:{line})' if filename else name
+    return label.replace(';', ',')
+
+
+def _greenlet_frames(frame) -> list:
+    """Синхронні кадри SQLAlchemy (ORM), призупинені в greenlet всередині greenlet_spawn."""
+    context = frame.f_locals.get('context')
+    current = getattr(context, 'gr_frame', None)
+    frames = []
+    while current is not None:
+        frames.append(current)
+        current = current.f_back
+    return frames[::-1]
+
+
+def _await_chain(coro, entry) -> list:
+    """Кадри ланцюжка cr_await від entry (кадр middleware) до найглибшої корутини."""
+    frames = []
+    started = False
+    while coro is not None:
+        frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'ag_frame', None) or getattr(coro, 'gi_frame', None)
+        if frame is None:
+            break
+        if started:
+            frames.append(frame)
+            if frame.f_code.co_name == 'greenlet_spawn':
+                frames.extend(_greenlet_frames(frame))
+        started = started or frame is entry
+        coro = getattr(coro, 'cr_await', None) or getattr(coro, 'ag_await', None) or getattr(coro, 'gi_yieldfrom', None)
+    return frames
+
+
+def _route_template(scope) -> Optional[str]:
+    for route in scope['app'].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+
+class ProfileSession:
+    """Одне профілювання: N секунд або наступні N запитів (за бажанням - лише маршрут route)."""
+
+    def __init__(self, seconds: Optional[float], requests: Optional[int], route: Optional[str], interval: float):
+        self.seconds = seconds
+        self.requests_left = requests
+        self.route = route
+        self.interval = interval
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.deadline = self.started + min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.finished: Optional[float] = None
+        self.tasks: dict[asyncio.Task, tuple] = {}
+        self.stacks: Counter = Counter()
+        self.kinds: Counter = Counter()
+        self.routes: Counter = Counter()
+        self.ticks = 0
+
+    def admit(self, scope) -> Optional[str]:
+        """Назва маршруту ('GET /path/{id}'), якщо запит треба профілювати, інакше None."""
+        if self.finished is not None:
+            return None
+        template = _route_template(scope)
+        if self.route and self.route not in (template, scope['path']):
+            return None
+        if self.requests_left is not None:
+            if self.requests_left <= 0:
+                return None
+            self.requests_left -= 1
+        name = f"{scope['method']} {template or scope['path']}"
+        self.routes[name] += 1
+        return name
+
+    @property
+    def done(self) -> bool:
+        if time.monotonic() >= self.deadline:
+            return True
+        return self.requests_left == 0 and not self.tasks
+
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+
+class SamplingProfiler:
+    """
+    Семплювальний профілювальник запитів.
+
+    ProfilerMiddleware реєструє задачу кожного відібраного запиту, а окремий
+    потік раз на interval знімає стек кожної такої задачі. Якщо задача зараз
+    виконується в event loop, стек береться з потоку (sys._current_frames), інакше -
+    з ланцюжка cr_await корутин (включно з ORM-кадрами в greenlet SQLAlchemy), а
+    на вершину додається [await aiosqlite] або [await]. Стеки агрегуються між
+    запитами і віддаються у форматі collapsed stacks (flamegraph.pl) або speedscope.
+
+    Коли профілювання не запущене, потоку немає, а middleware лише перевіряє
+    profiler.session is None.
+    """
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+        self.last: Optional[ProfileSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, seconds: Optional[float] = None, requests: Optional[int] = None,
+              route: Optional[str] = None, interval_ms: float = 10.0) -> dict:
+        """
+        Почати профілювання (викликається з event loop).
+
+        Raises:
+            RuntimeError: профілювання вже триває
+        """
+        if self.session is not None:
+            raise RuntimeError('Profiler is already running')
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.session = ProfileSession(seconds, requests, route, max(interval_ms, 1.0) / 1000)
+        self._thread = threading.Thread(target=self._run, args=(self.session,), name='profiler', daemon=True)
+        self._thread.start()
+        return self.status()
+
+    def stop(self) -> dict:
+        session = self.session
+        if session is not None:
+            self._finish(session)
+        return self.status()
+
+    def _finish(self, session: ProfileSession):
+        if session.finished is None:
+            session.finished = time.monotonic()
+        if self.session is session:
+            self.last = session
+            self.session = None
+
+    def _run(self, session: ProfileSession):
+        while session.finished is None and not session.done:
+            time.sleep(session.interval)
+            self._sample(session)
+        self._finish(session)
+
+    def _sample(self, session: ProfileSession):
+        session.ticks += 1
+        current = asyncio.current_task(self._loop)
+        thread_frame = sys._current_frames().get(self._loop_thread)
+        for task, (entry, root) in list(session.tasks.items()):
+            try:
+                chain = _await_chain(task.get_coro(), entry)
+                stack, kind = None, 'cpu'
+                if task is current and thread_frame is not None:
+                    stack = self._running_stack(thread_frame, entry, chain)
+                if stack is None:
+                    db = any('aiosqlite' in frame.f_code.co_filename for frame in chain[-3:])
+                    kind = 'aiosqlite' if db else 'await'
+                    stack = [_key(frame.f_code) for frame in chain] + [AWAIT_DB if db else AWAIT]
+            except Exception:
+                continue  # кадри змінились під час читання - пропускаємо семпл
+            session.stacks[(root, *stack)] += 1
+            session.kinds[kind] += 1
+
+    @staticmethod
+    def _running_stack(thread_frame, entry, chain: list) -> Optional[list]:
+        """Стек задачі, що виконується: ланцюжок корутин + кадри потоку над ним."""
+        index = {id(frame): i for i, frame in enumerate(chain)}
+        index[id(entry)] = -1
+        above = []
+        frame = thread_frame
+        while frame is not None and id(frame) not in index:
+            above.append(frame)
+            frame = frame.f_back
+        if frame is not None:
+            base = chain[:index[id(frame)] + 1]
+        elif chain and chain[-1].f_code.co_name == 'greenlet_spawn':
+            base = chain  # кадри greenlet не пов'язані f_back з корутиною, що його запустила
+        else:
+            return None  # знімок потоку вже не відповідає задачі
+        return [_key(f.f_code) for f in base] + [_key(f.f_code) for f in reversed(above)]
+
+    def status(self) -> dict:
+        session = self.session or self.last
+        if session is None:
+            return {'active': False}
+        samples = sum(session.kinds.values())
+        return {
+            'active': session is self.session,
+            'mode': 'requests' if session.requests_left is not None else 'seconds',
+            'seconds': session.seconds,
+            'requests_left': session.requests_left,
+            'route': session.route,
+            'interval_ms': session.interval * 1000,
+            'started_at': session.started_at,
+            'elapsed': round(session.elapsed(), 3),
+            'requests': dict(session.routes),
+            'in_flight': len(session.tasks),
+            'samples': samples,
+            'stacks': len(session.stacks),
+            'breakdown': {kind: round(count / samples, 4) for kind, count in session.kinds.most_common()},
+        }
+
+    def profile(self) -> Optional[ProfileSession]:
+        return self.session or self.last
+
+    @staticmethod
+    def collapsed(session: ProfileSession) -> str:
+        """Формат collapsed stacks: 'root;frame;frame count' на рядок."""
+        lines = [';'.join(map(_label, stack)) + f' {count}' for stack, count in session.stacks.most_common()]
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def speedscope(session: ProfileSession) -> dict:
+        """Профіль у форматі speedscope (тип sampled, вага семплу - середній інтервал у мс)."""
+        frames, index = [], {}
+        samples, weights = [], []
+        # Реальний інтервал більший за заданий, коли event loop тримає GIL
+        interval_ms = session.elapsed() * 1000 / max(session.ticks, 1)
+        for stack, count in session.stacks.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({'name': name, 'file': _short(filename), 'line': line} if filename else {'name': name})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(round(count * interval_ms, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': session.route or 'requests',
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': samples,
+                'weights': weights,
+            }],
+            'name': f'profile {time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(session.started_at))}',
+            'exporter': 'core.utils.profiler',
+        }
+
+
+profiler = SamplingProfiler()
+
+
+class ProfilerMiddleware:
+    """ASGI middleware: реєструє задачі запитів, поки профілювання запущене."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        name = session.admit(scope) if session is not None and scope['type'] == 'http' else None
+        if name is None:
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        session.tasks[task] = (sys._getframe(), (name, '', 0))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.tasks.pop(task, None)
@@ -0,0 +1,104 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Depends, HTTPException, Request
+from core.utils.auth import get_default_user
+
+# Методи, що пишуть у БД - лише вони проходять через ліміт
+WRITE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+MAX_BUCKETS = 100_000
+
+# Ліміти всіх роутерів за scope (для /admin/ratelimits)
+limits: dict = {}
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket на кожного користувача.
+
+    Відро ємністю burst поповнюється зі швидкістю rate токенів/с, кожен запит
+    забирає один токен. Відра зберігаються в OrderedDict у порядку останнього
+    звернення: відро, що простояло довше burst / rate секунд, вже повне і нічим
+    не відрізняється від нового, тому видаляється з голови без втрати стану.
+    Кількість відер обмежена max_buckets (найстаріші витісняються першими).
+    Ліміт діє в межах одного процесу - при WORKERS > 1 сумарний ліміт більший.
+    """
+
+    def __init__(self, rate: float, burst: int, max_buckets: int = MAX_BUCKETS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self.idle = burst / rate
+        self.clock = clock
+        self.buckets: OrderedDict[int, tuple[float, float]] = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: int) -> float:
+        """
+        Забрати токен з відра key.
+
+        Returns:
+            float: 0.0, якщо запит дозволено, інакше через скільки секунд з'явиться токен
+        """
+        now = self.clock()
+        bucket = self.buckets.pop(key, None)
+        tokens = self.burst if bucket is None else min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+            self.allowed += 1
+        else:
+            wait = (1 - tokens) / self.rate
+            self.rejected += 1
+        self.buckets[key] = (tokens, now)
+        self._evict(now)
+        return wait
+
+    def _evict(self, now: float):
+        buckets = self.buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if len(buckets) <= self.max_buckets and now - updated < self.idle:
+                break
+            del buckets[key]
+
+    def stats(self) -> dict:
+        return {'rate': self.rate, 'burst': self.burst, 'buckets': len(self.buckets),
+                'allowed': self.allowed, 'rejected': self.rejected}
+
+
+def parse_limit(value: str) -> Optional[tuple[float, int]]:
+    """'rate/burst' (напр. '1/10') -> (1.0, 10); 'off' -> None."""
+    if value.strip().lower() in ('off', '0', ''):
+        return None
+    rate, _, burst = value.partition('/')
+    return float(rate), int(burst or max(math.ceil(float(rate)), 1))
+
+
+class WriteRateLimit:
+    """
+    Dependency рівня роутера: ліміт запитів на запис для кожного користувача.
+
+    Налаштовується змінною середовища RATE_LIMIT_<SCOPE> у форматі 'rate/burst'
+    (або 'off'). Перевищення ліміту - 429 з заголовком Retry-After.
+
+    Example:
+        >>> router = APIRouter(dependencies=[Depends(get_default_user), Depends(WriteRateLimit('learn', '1/10'))])
+    """
+
+    def __init__(self, scope: str, default: str):
+        self.scope = scope
+        limit = parse_limit(os.getenv(f'RATE_LIMIT_{scope.upper()}', default))
+        self.limiter = TokenBucketLimiter(*limit) if limit else None
+        limits[scope] = self
+
+    async def __call__(self, request: Request, user=Depends(get_default_user)):
+        if self.limiter is None or request.method not in WRITE_METHODS:
+            return
+        wait = self.limiter.acquire(user.id)
+        if wait:
+            raise HTTPException(status_code=429, detail='Too many requests',
+                                headers={'Retry-After': str(math.ceil(wait))})
@@ -0,0 +1,82 @@
+import asyncio
+import functools
+
+
+class SingleFlight:
+    """
+    Об'єднання однакових паралельних запитів (singleflight).
+
+    Поки запит з ключем key виконується, всі інші виклики з тим самим ключем
+    чекають на нього замість того, щоб йти в БД. Після завершення ключ
+    звільняється - це не кеш, наступний виклик знову виконує запит.
+    """
+
+    def __init__(self):
+        self._flights: dict[tuple, asyncio.Future] = {}
+        self._stats: dict[str, list[int]] = {}
+
+    async def do(self, name: str, key: tuple, fn):
+        stats = self._stats.setdefault(name, [0, 0])
+        stats[0] += 1
+        while (flight := self._flights.get(key)) is not None:
+            try:
+                # shield: скасування очікувача не скасовує спільний запит
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                # Скасовано ініціатора запиту, а не нас - повторити (хтось стане новим ініціатором)
+                if flight.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+        stats[1] += 1
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as exc:
+            flight.set_exception(exc)
+            flight.exception()  # очікувачі отримають помилку; без них - не логувати "never retrieved"
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        """Кількість викликів, реальних запитів та частка об'єднаних по кожній функції."""
+        return {
+            name: {
+                'calls': calls,
+                'executions': executions,
+                'coalesced': calls - executions,
+                'ratio': round((calls - executions) / calls, 4) if calls else 0.0,
+            }
+            for name, (calls, executions) in self._stats.items()
+        }
+
+
+flights = SingleFlight()
+
+
+def coalesce(fn):
+    """
+    Декоратор для функцій читання db_func виду fn(db, *args).
+
+    Запит виконується в сесії першого викликача, а результат отримують і інші
+    запити, тому функція має повертати значення, незалежне від сесії
+    (pydantic-схему, примітив), а не ORM-об'єкт.
+
+    Example:
+        >>> @coalesce
+        ... async def get_test_for_student_by_id(db, _id): ...
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(db, *args):
+        return await flights.do(name, (name, *args), lambda: fn(db, *args))
+    return wrapper
@@ -0,0 +1,37 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger('uvicorn.error')
+
+
+class StartupPhases:
+    """
+    Явні фази старту застосунку з виміром тривалості кожної.
+
+    Example:
+        phases = StartupPhases()
+        async with phases.phase('schema_check'):
+            await init_db()
+        print(phases.report())
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: dict[str, float] = {}
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+            logger.info('Startup phase %s: %.1f ms', name, self.timings[name] * 1000)
+
+    def report(self) -> dict:
+        """Тривалості фаз у мілісекундах та загальний час старту."""
+        return {
+            'phases_ms': {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()},
+            'total_ms': round(sum(self.timings.values()) * 1000, 2)
+        }
@@ -1,29 +1,114 @@
-import uvicorn
+import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from a2wsgi import WSGIMiddleware
-from starlette.types import ASGIApp
-from typing import cast
-from core.routers import learn_router, auth_router, teacher_router, admin_router
-from core.stats.app import dash_app
+from core.routers import learn_router, exam_router, auth_router, teacher_router, admin_router
+from core.stats.mount import LazyDashboard
+from core.utils.startup import StartupPhases
+from core.utils.profiler import ProfilerMiddleware
+
+# 'lazy' - /stats монтується і завантажує Dash при першому запиті;
+# 'off' - дашборд запускається окремо: python -m core.stats.app
+STATS_DASHBOARD = os.getenv('STATS_DASHBOARD', 'lazy')
+
+# Кількість worker-процесів uvicorn. При WORKERS > 1 кожен worker стежить за
+# PRAGMA data_version і дочитує результати, збережені іншими worker'ами.
+WORKERS = int(os.getenv('WORKERS', '1'))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    from core.database.db import init_db, RESULTS_SCHEMA, engine, results_engine
+    from core.database.backend import close_backend
+    from core.database.backup import get_backup_scheduler
     from core.patterns.stats_manager import get_stats
-    stats = await get_stats()
-    app.state.stats = stats
-    yield
+    from core.stats.analytics import get_analytics
+    from core.stats.leaderboard import get_leaderboards
+    from core.stats.feed import get_results_feed
+    from core.stats.related import get_recommender
+    from core.exam.sessions import get_exam_sessions
+    from core.exam.bank import get_question_banks
+    from core.exam.review import get_review_scheduler
+    from core.jobs.runner import get_job_runner
+    from core.sandbox.pool import get_sandbox
+    from core.search.suggest import get_suggest_index
+    from core.utils.coherence import DataVersionWatcher, MAIN_SCHEMA
+
+    phases = StartupPhases()
+    watcher = None
+    try:
+        async with phases.phase('schema_check'):
+            await init_db()
+        async with phases.phase('stats_init'):
+            app.state.stats = await get_stats()
+            app.state.exam_sessions = get_exam_sessions(shared=WORKERS > 1)
+            app.state.question_banks = get_question_banks()
+            app.state.jobs = get_job_runner()
+            app.state.sandbox = get_sandbox()
+            app.state.backups = get_backup_scheduler()
+        async with phases.phase('cache_warmup'):
+            app.state.analytics = await get_analytics()
+            app.state.leaderboards = await get_leaderboards()
+            app.state.results_feed = await get_results_feed(
+                [app.state.analytics, app.state.leaderboards],
+                shared=WORKERS > 1
+            )
+            app.state.suggest = await get_suggest_index()
+            app.state.related = await get_recommender()
+            app.state.reviews = await get_review_scheduler(shared=WORKERS > 1)
+        app.state.startup = phases
+        app.state.exam_sessions.start()
+        app.state.reviews.start()
+        await app.state.jobs.start()
+        app.state.related.start()
+        app.state.sandbox.start()
+        app.state.backups.start()
+
+        if WORKERS > 1:
+            watcher = DataVersionWatcher()
+            watcher.subscribe(RESULTS_SCHEMA, app.state.results_feed.catch_up)
+            watcher.subscribe(MAIN_SCHEMA, app.state.results_feed.catch_up_regrades)
+            watcher.subscribe(MAIN_SCHEMA, app.state.reviews.refresh_quizzes)
+            watcher.subscribe(MAIN_SCHEMA, app.state.question_banks.refresh)
+            watcher.subscribe(MAIN_SCHEMA, app.state.suggest.refresh)
+            watcher.start()
+        yield
+    finally:
+        # Потоки aiosqlite у пулі не є daemon - без dispose процес не завершиться
+        if watcher:
+            await watcher.stop()
+        if getattr(app.state, 'backups', None):
+            await app.state.backups.stop()
+        if getattr(app.state, 'sandbox', None):
+            await app.state.sandbox.stop()
+        if getattr(app.state, 'related', None):
+            await app.state.related.stop()
+        if getattr(app.state, 'jobs', None):
+            await app.state.jobs.stop()
+        if getattr(app.state, 'reviews', None):
+            await app.state.reviews.stop()  # дописати незбережені картки
+        if getattr(app.state, 'exam_sessions', None):
+            await app.state.exam_sessions.stop()  # дописати незбережені чернетки
+        close_backend()
+        await results_engine.dispose()
+        await engine.dispose()
 
 app = FastAPI(title='Python Learning API with Patterns', lifespan=lifespan)
+# Поки профілювання не запущене (POST /admin/profiler/start), лише пропускає запит далі
+app.add_middleware(ProfilerMiddleware)
 
 
-app.mount('/stats', cast(ASGIApp, WSGIMiddleware(dash_app.server)), name='Stats')
+if STATS_DASHBOARD == 'lazy':
+    app.mount('/stats', LazyDashboard(), name='Stats')
 
 app.include_router(auth_router)
 app.include_router(learn_router)
+app.include_router(exam_router)
 app.include_router(teacher_router)
 app.include_router(admin_router)
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    import uvicorn
+    if WORKERS > 1:
+        uvicorn.run("main:app", host="127.0.0.1", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)